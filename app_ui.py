@@ -70,6 +70,11 @@ class MainApplication(ctk.CTk):
         self.event_callbacks = {}
         self._register_events()
 
+        # Coordenadas dos contatos salvos chegam pela fila de geocodificação de fundo
+        self.geo_queue = self.repos.get("geo_queue")
+        if self.geo_queue:
+            self.geo_queue.add_listener(self._on_geocode_job_done)
+
         self._configure_global_styles()
         self._build_main_interface()
         self._setup_status_bar_logging()
@@ -83,8 +88,10 @@ class MainApplication(ctk.CTk):
         self.register_event("navigate", self._handle_navigation)
         self.register_event("open_form", self._handle_open_form)
         self.register_event("open_dashboard", self.open_dashboard_window)
+        self.register_event("data_changed", self._invalidate_caches)
         self.register_event("data_changed", self.on_data_changed)
         self.register_event("navigate_with_filter", self._handle_navigation_with_filter) # <-- ADICIONA ESTA LINHA
+        self.register_event("entity_geocoded", self._on_entity_geocoded)
 
     def _handle_navigation_with_filter(self, module_name: str, initial_filters: dict):
         """Manipulador para o novo evento que carrega um módulo com filtros iniciais."""
@@ -106,6 +113,12 @@ class MainApplication(ctk.CTk):
         else:
             logging.warning(f"Evento não registrado: {event_name}")
 
+    def _invalidate_caches(self, **kwargs):
+        """Descarta as contagens e os dados de referência em cache antes de a view atual recarregar os dados."""
+        for cache_name in ("count_cache", "reference"):
+            cache = self.repos.get(cache_name)
+            if cache: cache.invalidate()
+
     def on_data_changed(self, source="unknown", **kwargs):
         # ... (código inalterado)
         logging.info(f"Evento 'data_changed' recebido de '{source}'. Atualizando view atual...")
@@ -113,6 +126,19 @@ class MainApplication(ctk.CTk):
             self._current_module_frame.on_data_updated()
 
 
+    def _on_geocode_job_done(self, tipo, id_entidade, latitude, longitude, precisao):
+        # Chamado na thread da fila: repassa o evento para a thread da interface
+        try:
+            self.after(0, lambda: self.dispatch("entity_geocoded", tipo=tipo, id_entidade=id_entidade, latitude=latitude, longitude=longitude, precisao=precisao))
+        except (RuntimeError, tk.TclError):
+            pass # Janela já encerrada
+
+    def _on_entity_geocoded(self, **kwargs):
+        """Atualização pontual: só as views abertas que exibem coordenadas (on_entity_geocoded) tratam o contato geocodificado."""
+        for view_instance in self.view_cache.values():
+            if hasattr(view_instance, 'on_entity_geocoded'):
+                view_instance.on_entity_geocoded(**kwargs)
+
     def _handle_navigation(self, module_name: str):
         self._load_module(module_name)
 
@@ -268,6 +294,8 @@ class MainApplication(ctk.CTk):
 
     def destroy(self):
         logging.info("Iniciando processo de encerramento controlado...")
+        if self.geo_queue:
+            self.geo_queue.remove_listener(self._on_geocode_job_done)
         # Itera sobre todos os módulos que foram abertos e guardados no cache
         for view_name, view_instance in self.view_cache.items():
             # Se o módulo tiver um método de limpeza, chama-o
@@ -40,6 +40,18 @@ FONT_SIZE_HEADER = 16
 # -- Database Path --
 DB_PATH_CONFIG = os.path.join(BASE_PATH, 'dados.db')
 
+# -- Importação --
+# Processos usados para agregar o CSV de votação (None = um por núcleo). Pode ser sobrescrito pela
+# configuração 'import_workers' salva no banco.
+IMPORT_WORKERS = None
+
+# -- Geocodificação em massa --
+# Threads de consulta e requisições por segundo, de acordo com a cota da chave da API do Google (o padrão
+# do Geocoding API é 50 por segundo). Podem ser sobrescritos pelas configurações 'geocode_workers' e
+# 'geocode_rate' salvas no banco.
+GEOCODE_WORKERS = 8
+GEOCODE_REQUESTS_PER_SECOND = 40
+
 # --- Códigos de Eleição do TSE ---
 ELECTION_CODES = {
     2024: "2045202024",  # Eleições Municipais 2024
@@ -0,0 +1,168 @@
+"""
+Importação de vários arquivos do TSE de uma vez (uma pasta inteira ou uma lista de arquivos).
+
+O tipo de cada arquivo é reconhecido pelo cabeçalho (detect_file_type). A leitura e a agregação, que
+só usam CPU e não dependem do banco, rodam em paralelo num pool de processos (ParsePool): o hash de
+cada arquivo, as faixas de bytes dos arquivos de votação, os blocos do cadastral e a soma do
+eleitorado. Tudo o que os processos produzem volta por uma única fila, limitada para que a leitura não
+passe muito à frente da gravação, e é gravado por quem consome a fila, a única thread que escreve no
+SQLite (ImportService.importar_lote).
+"""
+import os
+import queue
+import logging
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from functions import csv_stream, zip_source
+from . import votacao_aggregator, eleitorado_aggregator, cadastral_reader, import_ledger_repository
+
+TIPO_CADASTRAL = "importar_dados_cadastrais"
+TIPO_VOTACAO = "importar_csv_eleicao"
+TIPO_ELEITORADO = "eleitorado"
+TIPO_PREFEITURAS = "prefeituras"
+
+# Tipo -> colunas que o cabeçalho precisa ter, na ordem de verificação (o CSV de votação também tem NM_CANDIDATO e SQ_CANDIDATO)
+FILE_TYPES = (
+    (TIPO_VOTACAO, set(votacao_aggregator.VOTACAO_COLUMNS)),
+    (TIPO_CADASTRAL, {'SQ_CANDIDATO', 'NM_CANDIDATO', 'DT_NASCIMENTO'}),
+    (TIPO_ELEITORADO, set(eleitorado_aggregator.PERFIL_COLUMNS)),
+    (TIPO_ELEITORADO, set(eleitorado_aggregator.LEGACY_COLUMNS)),
+    (TIPO_PREFEITURAS, {'CIDADE', 'COD.IBGE'}),
+)
+TYPE_LABELS = {TIPO_CADASTRAL: "candidatos", TIPO_VOTACAO: "votação", TIPO_ELEITORADO: "eleitorado", TIPO_PREFEITURAS: "prefeituras"}
+
+# Mensagens (blocos do cadastral e resultados) que podem esperar na fila pela gravação
+QUEUE_SIZE = 8
+
+def detect_file_type(filepath: str) -> str | None:
+    """Tipo do arquivo (uma das constantes TIPO_*) pelo cabeçalho, ou None se não for reconhecido."""
+    try:
+        with csv_stream.open_binary(filepath) as f:
+            header = set(csv_stream.read_header(f))
+    except (OSError, UnicodeDecodeError, ValueError, zipfile.BadZipFile) as e:
+        logging.warning(f"Não foi possível ler o cabeçalho de '{filepath}': {e}")
+        return None
+    return next((tipo for tipo, columns in FILE_TYPES if columns <= header), None)
+
+def list_import_files(paths, ufs=None) -> list[str]:
+    """
+    Arquivos .csv e .zip de `paths` (arquivos ou pastas, percorridas com as subpastas), sem repetição e em
+    ordem. Cada ZIP vira uma origem (functions.zip_source) com as `ufs` escolhidas.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(('.csv', '.zip')))
+        elif os.path.isfile(path):
+            files.append(path)
+    files = dict.fromkeys(os.path.abspath(f) for f in files)
+    return [zip_source.make_source(f, ufs) if zip_source.is_zip_source(f) else f for f in files]
+
+# --- Estado de cada processo de trabalho (definido pelo initializer do pool) ---
+_queue = None
+_cancel_event = None
+_bytes_counter = None
+
+def _init_worker(message_queue, cancel_event, bytes_counter):
+    global _queue, _cancel_event, _bytes_counter
+    _queue = message_queue
+    _cancel_event = cancel_event
+    _bytes_counter = bytes_counter
+
+def _count_bytes(bytes_read: int) -> bool:
+    with _bytes_counter.get_lock():
+        _bytes_counter.value += bytes_read
+    return not _cancel_event.is_set()
+
+def _parse_hash(key, filepath: str):
+    return import_ledger_repository.file_hash(filepath, _count_bytes)
+
+def _parse_votacao(key, filepath: str, start: int, end: int):
+    return votacao_aggregator.aggregate_range(filepath, start, end, _count_bytes)
+
+def _parse_cadastral(key, filepath: str, columns, start: int | None):
+    """Envia cada bloco pela fila como ('lote', (registros, posição, linhas)); o resultado final é só o fim da leitura."""
+    last_position = start or 0
+    for records, position, linhas in cadastral_reader.iter_records(filepath, columns, start):
+        if not _count_bytes(position - last_position): return None
+        last_position = position
+        _queue.put((key, 'lote', (records, position, linhas)))
+    return True
+
+def _parse_eleitorado(key, filepath: str, municipios: dict, default_ano: int):
+    last_position = 0
+    def on_progress(position, total_bytes):
+        nonlocal last_position
+        _count_bytes(position - last_position)
+        last_position = position
+    return eleitorado_aggregator.aggregate_eleitorado(filepath, municipios, default_ano, _cancel_event, on_progress)
+
+PARSERS = {'hash': _parse_hash, TIPO_VOTACAO: _parse_votacao, TIPO_CADASTRAL: _parse_cadastral, TIPO_ELEITORADO: _parse_eleitorado}
+
+def _run_task(key, parser: str, args: tuple):
+    # O resultado vai pela fila (e não pelo Future) para chegar depois dos blocos já enviados pela mesma tarefa
+    try:
+        _queue.put((key, 'fim', PARSERS[parser](key, *args)))
+    except Exception as e:
+        logging.error(f"Erro ao ler '{args[0]}' ({parser}): {e}", exc_info=True)
+        _queue.put((key, 'erro', str(e)))
+
+class ParsePool:
+    """
+    Pool de processos de leitura da importação em lote. `submit(chave, tipo, *args)` agenda uma tarefa de
+    PARSERS; `messages()` gera, na thread de quem chamou, (chave, evento, dados) com evento 'lote' (bloco
+    do cadastral), 'fim' (resultado da tarefa; None se ela foi cancelada) ou 'erro' (mensagem), e
+    (None, 'progresso', None) quando a fila fica parada, até que todas as tarefas agendadas terminem.
+    Novas tarefas podem ser agendadas enquanto as mensagens são consumidas.
+    """
+    def __init__(self, workers: int, stop_event):
+        self.workers = max(1, workers)
+        self.stop_event = stop_event
+        self._pending = {}
+
+    def __enter__(self):
+        # 'spawn' em todas as plataformas: fork a partir de um processo com threads (Tk, pool de conexões) não é seguro
+        ctx = multiprocessing.get_context('spawn')
+        self._queue = ctx.Queue(QUEUE_SIZE)
+        self._cancel_event = ctx.Event()
+        self._bytes_counter = ctx.Value('q', 0)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_worker,
+                                             initargs=(self._queue, self._cancel_event, self._bytes_counter))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._pending:
+            self._cancel_event.set()
+            # Esvazia a fila até as tarefas terminarem, para que nenhum processo fique preso num put()
+            while any(not future.done() for future in self._pending.values()):
+                try: self._queue.get(timeout=0.1)
+                except queue.Empty: pass
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        return False
+
+    @property
+    def bytes_read(self) -> int:
+        return self._bytes_counter.value
+
+    def submit(self, key, parser: str, *args):
+        self._pending[key] = self._executor.submit(_run_task, key, parser, args)
+
+    def messages(self):
+        while self._pending:
+            if self.stop_event.is_set(): self._cancel_event.set()
+            try:
+                key, evento, dados = self._queue.get(timeout=0.25)
+            except queue.Empty:
+                # Processo que caiu sem enviar o resultado (BrokenProcessPool): a tarefa termina com erro
+                for key, future in list(self._pending.items()):
+                    if future.done() and future.exception():
+                        del self._pending[key]
+                        yield key, 'erro', str(future.exception())
+                yield None, 'progresso', None
+                continue
+            if evento != 'lote': self._pending.pop(key, None)
+            yield key, evento, dados
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Motor da geocodificação em massa: consulta vários endereços em paralelo num pool de threads limitado,
+respeitando a cota da API com um functions.rate_limit.TokenBucket compartilhado.
+
+Falhas transitórias (RetryableGeocodeError: timeout, serviço indisponível, limite de taxa) voltam para
+uma fila de novas tentativas com espera exponencial (com variação aleatória, para que as threads não
+tentem todas ao mesmo tempo) até MAX_RETRIES vezes; um pedido explícito de espera da API pausa o
+limitador para todas as threads. Qualquer outra exceção de `fetch` (ex.: cota diária esgotada) para o
+motor e é relançada para quem chamou. Os resultados são entregues na thread de quem chamou, que é quem
+grava no banco (em lotes).
+"""
+import time
+import heapq
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from functions.rate_limit import TokenBucket
+
+MAX_RETRIES = 4
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+class RetryableGeocodeError(Exception):
+    """Falha transitória de uma consulta; `retry_after` é a espera pedida pela API, se houver."""
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class BulkGeocoder:
+    """
+    `fetch(endereço)` faz uma consulta e retorna o resultado (o que for, repassado a `on_result`), ou
+    None se ela falhou de forma definitiva e o endereço deve ser deixado de lado.
+    """
+    def __init__(self, fetch, limiter: TokenBucket, workers: int, max_retries: int = MAX_RETRIES):
+        self.fetch = fetch
+        self.limiter = limiter
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.retries = 0
+        self.failed = 0
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        if retry_after: return retry_after
+        return min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _call(self, address: str, halt: threading.Event):
+        if not self.limiter.acquire(halt): return None
+        return self.fetch(address)
+
+    def run(self, addresses: dict, stop_event: threading.Event, on_result, on_progress=None) -> bool:
+        """
+        Consulta cada endereço de `addresses` ({chave: endereço}). `on_result(chave, resultado)` e
+        `on_progress(concluídos, total)` são chamados na thread de quem chamou. Retorna False se
+        `stop_event` foi sinalizado antes do fim; as consultas em andamento terminam antes do retorno.
+        """
+        total = len(addresses)
+        pending = list(addresses.items())
+        pending.reverse()  # consumida pelo fim, na ordem original
+        retry_heap = []    # (instante, seq, chave, endereço, tentativa)
+        in_flight = {}
+        done = 0
+        halt = threading.Event()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="geocoder") as executor:
+            try:
+                while pending or retry_heap or in_flight:
+                    if stop_event.is_set(): return False
+
+                    now = time.monotonic()
+                    while retry_heap and retry_heap[0][0] <= now and len(in_flight) < self.workers * 2:
+                        _, _, key, address, attempt = heapq.heappop(retry_heap)
+                        in_flight[executor.submit(self._call, address, halt)] = (key, address, attempt)
+                    while pending and len(in_flight) < self.workers * 2:
+                        key, address = pending.pop()
+                        in_flight[executor.submit(self._call, address, halt)] = (key, address, 0)
+
+                    if in_flight:
+                        finished, _ = wait(in_flight, timeout=0.25, return_when=FIRST_COMPLETED)
+                    else:
+                        # Só há novas tentativas agendadas: espera a próxima (ou o cancelamento)
+                        finished = set()
+                        stop_event.wait(min(0.25, max(0.0, retry_heap[0][0] - now)))
+
+                    for future in finished:
+                        key, address, attempt = in_flight.pop(future)
+                        try:
+                            result = future.result()
+                        except RetryableGeocodeError as e:
+                            if attempt < self.max_retries:
+                                delay = self._backoff(attempt, e.retry_after)
+                                if e.retry_after: self.limiter.pause(e.retry_after)
+                                self.retries += 1
+                                logging.warning(f"Falha transitória ao geocodificar '{address}' ({e}); nova tentativa em {delay:.1f}s.")
+                                heapq.heappush(retry_heap, (time.monotonic() + delay, self.retries, key, address, attempt + 1))
+                                continue
+                            logging.error(f"Geocodificação de '{address}' abandonada após {attempt + 1} tentativas: {e}")
+                            result = None
+                        done += 1
+                        if result is None: self.failed += 1
+                        else: on_result(key, result)
+                    if finished and on_progress: on_progress(done, total)
+                return True
+            finally:
+                # Libera as threads presas no limitador e descarta o que ainda não começou
+                halt.set()
+                for future in in_flight: future.cancel()
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+Leitura em fluxo do CSV cadastral de candidatos do TSE (consulta_cand), usada tanto pela importação de
+um arquivo quanto pela importação em lote, em que roda num processo separado.
+
+Cada bloco lido vira uma lista de registros (chave, digest, linha): `chave` é a chave natural da
+candidatura (sq|ano|cidade) no registro de importação, `digest` o resumo da linha inteira e `linha` um
+dicionário só com as colunas usadas na gravação. Quem grava compara o digest com o da última importação
+do arquivo e descarta as linhas inalteradas.
+"""
+from functions import data_helpers, csv_stream
+from . import import_ledger_repository
+
+KEY_COLUMNS = ('SQ_CANDIDATO', 'ANO_ELEICAO', 'NM_UE')
+
+def iter_records(filepath: str, used_columns, start: int | None = None):
+    """
+    Gera (registros, posição_em_bytes, linhas_lidas) para cada bloco do arquivo, a partir de `start`.
+    Linhas sem SQ_CANDIDATO (ou arquivos sem as colunas da chave) vêm com chave e digest None.
+    """
+    with csv_stream.open_binary(filepath) as f:
+        header = csv_stream.read_header(f)
+    key_indices = [header.index(c) for c in KEY_COLUMNS] if all(c in header for c in KEY_COLUMNS) else None
+    used = [(c, header.index(c)) for c in used_columns if c in header]
+    city_keys = {}
+
+    for rows, position in csv_stream.iter_row_chunks(filepath, header, start=start):
+        records = []
+        for row in rows:
+            chave = digest = None
+            if key_indices and (sq_cand := row[key_indices[0]].strip()):
+                cidade = row[key_indices[2]].strip()
+                if cidade not in city_keys: city_keys[cidade] = data_helpers.normalize_city_key(cidade)
+                chave = import_ledger_repository.make_key(sq_cand, data_helpers.safe_int(row[key_indices[1]].strip()), city_keys[cidade])
+                digest = import_ledger_repository.row_digest(row)
+            records.append((chave, digest, {c: row[i].strip() for c, i in used}))
+        yield records, position, len(rows)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+class ConnectionPool:
+    """
+    Gerencia as conexões SQLite da aplicação.
+    Cada thread recebe sua própria conexão de leitura e todas as escritas passam por uma única
+    conexão dedicada, serializada por um lock. Com o journal em modo WAL, as leituras enxergam
+    o último estado confirmado e nunca esperam por uma transação de importação em andamento.
+    """
+    def __init__(self, db_path: str, busy_timeout: float = 30.0):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._readers: dict[threading.Thread, sqlite3.Connection] = {}
+        self._readers_lock = threading.Lock()
+
+        self._write_lock = threading.RLock()
+        self._write_owner: threading.Thread | None = None
+        self._write_depth = 0
+        self._write_conn = self._connect()
+
+        journal_mode = self._write_conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if str(journal_mode).lower() != "wal":
+            logging.warning(f"Não foi possível ativar o modo WAL no banco de dados (modo atual: {journal_mode}).")
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _prune_dead_readers(self):
+        # Chamado com _readers_lock adquirido. Fecha conexões de threads que já terminaram.
+        dead_threads = [t for t in self._readers if not t.is_alive()]
+        for thread in dead_threads:
+            try:
+                self._readers.pop(thread).close()
+            except sqlite3.Error as e:
+                logging.warning(f"Erro ao fechar conexão de leitura da thread '{thread.name}': {e}")
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        Retorna a conexão de leitura da thread atual, criando-a na primeira chamada.
+        Se a thread atual estiver dentro de um `writer()`, retorna a conexão de escrita,
+        para que as consultas enxerguem as alterações ainda não confirmadas da transação.
+        """
+        if self._write_owner is threading.current_thread():
+            return self._write_conn
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect(read_only=True)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._prune_dead_readers()
+                self._readers[threading.current_thread()] = conn
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """
+        Obtém a conexão de escrita exclusiva dentro de uma transação.
+        Blocos aninhados na mesma thread reutilizam a transação externa; apenas o bloco
+        mais externo faz commit (ou rollback em caso de exceção).
+        """
+        with self._write_lock:
+            self._write_owner = threading.current_thread()
+            self._write_depth += 1
+            try:
+                if self._write_depth == 1:
+                    with self._write_conn:
+                        yield self._write_conn
+                else:
+                    yield self._write_conn
+            finally:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._write_owner = None
+
+    @contextmanager
+    def foreign_keys_disabled(self):
+        """
+        Desliga a verificação de chaves estrangeiras da conexão de escrita durante o bloco, que pode conter
+        vários `writer()` (cada um com o seu commit). Necessário em cargas que gravam em 'candidaturas', cuja
+        chave referenciada por 'votos_por_municipio' (sq_candidato) não é única. O PRAGMA não tem efeito
+        dentro de uma transação, por isso este bloco não pode ser aberto dentro de um `writer()`.
+        """
+        with self._write_lock:
+            if self._write_depth:
+                raise RuntimeError("foreign_keys_disabled() não pode ser usado dentro de writer().")
+            self._write_conn.execute("PRAGMA foreign_keys = OFF")
+            try:
+                yield
+            finally:
+                if self._write_conn.in_transaction:
+                    self._write_conn.rollback()
+                self._write_conn.execute("PRAGMA foreign_keys = ON")
+
+    def close_all(self):
+        with self._readers_lock:
+            for conn in self._readers.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._readers.clear()
+        with self._write_lock:
+            try:
+                self._write_conn.close()
+            except sqlite3.Error:
+                pass
\ No newline at end of file
@@ -10,13 +10,14 @@ import config
 from dto.pessoa import Pessoa
 from dto.organizacao import Organizacao
 from functions import ui_helpers, formatters, data_helpers
+from .geocode_queue import TIPO_PESSOA, TIPO_ORGANIZACAO
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .person_repository import PersonRepository
     from .organization_repository import OrganizationRepository
-    from .misc_repository import MiscRepository
-    from .geo_service import GeoService
+    from .reference_cache import ReferenceDataCache
+    from .geocode_queue import GeocodeJobQueue
 
 class ContactService:
     def __init__(self, repos: dict):
@@ -27,14 +28,14 @@ class ContactService:
         Recebe dados brutos do formulário, processa-os, converte nomes em IDs e orquestra o salvamento.
         """
         try:
-            misc_repo: 'MiscRepository' = self.repos.get("misc")
-            if not misc_repo:
-                logging.error("MiscRepository não encontrado no ContactService.")
+            reference_cache: 'ReferenceDataCache' = self.repos.get("reference")
+            if not reference_cache:
+                logging.error("ReferenceDataCache não encontrado no ContactService.")
                 return None
             
-            tratamento_map = {item['nome']: item['id'] for item in misc_repo.get_lookup_table_data("tratamentos")}
-            profissao_map = {item['nome']: item['id'] for item in misc_repo.get_lookup_table_data("profissoes")}
-            escolaridade_map = {item['nome']: item['id'] for item in misc_repo.get_lookup_table_data("escolaridades")}
+            tratamento_map = reference_cache.name_to_id("tratamentos")
+            profissao_map = reference_cache.name_to_id("profissoes")
+            escolaridade_map = reference_cache.name_to_id("escolaridades")
             
             pessoa_obj = raw_data.get('pessoa_obj', Pessoa())
 
@@ -56,10 +57,8 @@ class ContactService:
             
             saved_pessoa = self._save_person_contact_internal(pessoa_obj, list_ids, new_photo_path)
             
-            # --- REMOVIDA LÓGICA ASSÍNCRONA AQUI ---
-            # A geocodificação para salvamento de contato individual agora ocorre
-            # DE FORMA SÍNCRONA dentro de _save_person_contact_internal.
-            # O código assíncrono só é mantido para geocodificação EM MASSA.
+            # A geocodificação do contato salvo é agendada na fila persistente (geocode_queue)
+            # dentro de _save_person_contact_internal; as coordenadas chegam depois pelo evento 'entity_geocoded'.
             
             return saved_pessoa
             
@@ -96,14 +95,12 @@ class ContactService:
                     person_repo.update_pessoa_photo_path(saved_pessoa.id_pessoa, photo_db_path)
                     saved_pessoa.caminho_foto = photo_db_path
         
-        # --- LÓGICA SÍNCRONA DE GEOCÓDIGO APLICADA AQUI ---
-        # Se a geolocalização está ativa e as coordenadas não estão preenchidas, busca e salva.
-        geo_service: 'GeoService' = self.repos.get("geo")
-        if saved_pessoa.geo_visivel == 1 and (saved_pessoa.latitude is None or saved_pessoa.longitude is None) and geo_service:
-            logging.info(f"Geocodificando PESSOA ID {saved_pessoa.id_pessoa} de forma síncrona...")
-            # Chama o método de geocodificação. Este método salva NO BANCO DE DADOS
-            # e atualiza o OBJETO saved_pessoa EM MEMÓRIA com as coordenadas ou NULL.
-            geo_service.geocode_and_save_entity(saved_pessoa)
+        # Se a geolocalização está ativa e as coordenadas não estão preenchidas, agenda a geocodificação
+        # na fila de fundo (o salvamento não espera pela API).
+        geo_queue: 'GeocodeJobQueue' = self.repos.get("geo_queue")
+        if saved_pessoa.geo_visivel == 1 and (saved_pessoa.latitude is None or saved_pessoa.longitude is None) and geo_queue:
+            logging.info(f"Agendando geocodificação da PESSOA ID {saved_pessoa.id_pessoa}...")
+            geo_queue.enqueue(TIPO_PESSOA, saved_pessoa.id_pessoa)
         
         # Finalmente, associa as listas
         person_repo.update_list_associations_for_pessoa(saved_pessoa.id_pessoa, list_ids)
@@ -120,14 +117,11 @@ class ContactService:
                 logging.error(f"Falha ao salvar a organização: {org_dto.nome_fantasia}")
                 return None
                 
-            # --- LÓGICA SÍNCRONA DE GEOCÓDIGO APLICADA AQUI PARA ORGANIZAÇÕES ---
-            # Se a geolocalização está ativa e as coordenadas não estão preenchidas, busca e salva.
-            geo_service: 'GeoService' = self.repos.get("geo")
-            if saved_org.geo_visivel == 1 and (saved_org.latitude is None or saved_org.longitude is None) and geo_service:
-                 logging.info(f"Geocodificando ORGANIZAÇÃO ID {saved_org.id_organizacao} de forma síncrona...")
-                 # Chama o método de geocodificação. Este método salva NO BANCO DE DADOS
-                 # e atualiza o OBJETO saved_org EM MEMÓRIA com as coordenadas ou NULL.
-                 geo_service.geocode_and_save_entity(saved_org)
+            # Se a geolocalização está ativa e as coordenadas não estão preenchidas, agenda a geocodificação na fila de fundo.
+            geo_queue: 'GeocodeJobQueue' = self.repos.get("geo_queue")
+            if saved_org.geo_visivel == 1 and (saved_org.latitude is None or saved_org.longitude is None) and geo_queue:
+                 logging.info(f"Agendando geocodificação da ORGANIZAÇÃO ID {saved_org.id_organizacao}...")
+                 geo_queue.enqueue(TIPO_ORGANIZACAO, saved_org.id_organizacao)
 
             return saved_org
         except Exception as e:
@@ -0,0 +1,116 @@
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from functions import data_helpers
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+    from .person_repository import PersonRepository
+    from .organization_repository import OrganizationRepository
+
+class CountCache:
+    """
+    Cache das contagens usadas na paginação das listas de pessoas e organizações.
+
+    As entradas são indexadas pelo filtro normalizado e guardam os contadores de alteração
+    (tabela 'table_change_counters') das tabelas envolvidas no momento da contagem: se algum
+    contador mudou, a entrada é descartada. O evento 'data_changed' limpa o cache inteiro.
+    Quando não há contagem em cache, `count_*` devolve primeiro uma contagem limitada a
+    APPROXIMATE_LIMIT; a interface exibe "10.000+" e pede a contagem exata com `refine_*` em segundo plano.
+    """
+    APPROXIMATE_LIMIT = 10000
+    MAX_ENTRIES = 256
+    TABLES = {"pessoas": ("pessoas", "candidaturas"), "organizacoes": ("organizacoes",)}
+
+    def __init__(self, pool: 'ConnectionPool', person_repo: 'PersonRepository', org_repo: 'OrganizationRepository'):
+        self.pool = pool
+        self.person_repo = person_repo
+        self.org_repo = org_repo
+        self._entries: OrderedDict[tuple, tuple[tuple, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_active(value) -> bool:
+        return bool(value) and str(value).upper() not in ("TODOS", "TODAS")
+
+    def _pessoas_key(self, filters: dict) -> tuple:
+        search_term = (filters.get('search_term') or "").strip()
+        return (
+            "pessoas",
+            data_helpers.build_fts_query(search_term) or search_term,
+            data_helpers.normalize_city_key(filters['cidade']) if self._is_active(filters.get('cidade')) else None,
+            str(filters['ano_eleicao']) if self._is_active(filters.get('ano_eleicao')) else None,
+            filters['cargo'] if self._is_active(filters.get('cargo')) else None,
+            bool(filters.get('only_candidates')),
+        )
+
+    def _table_versions(self, kind: str) -> tuple:
+        tables = self.TABLES[kind]
+        try:
+            cursor = self.pool.reader().cursor()
+            cursor.execute(f"SELECT table_name, counter FROM table_change_counters WHERE table_name IN ({','.join(['?'] * len(tables))})", tables)
+            counters = {row['table_name']: row['counter'] for row in cursor.fetchall()}
+            return tuple(counters.get(t) for t in tables)
+        except sqlite3.Error as e:
+            logging.warning(f"Não foi possível ler os contadores de alteração: {e}")
+            return (None,)
+
+    def _get(self, key: tuple, versions: tuple) -> int | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None: return None
+            if entry[0] != versions or None in versions:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key: tuple, versions: tuple, value: int):
+        with self._lock:
+            self._entries[key] = (versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def _count(self, key: tuple, bounded_count) -> tuple[int, bool]:
+        versions = self._table_versions(key[0])
+        cached = self._get(key, versions)
+        if cached is not None:
+            return cached, True
+        bounded = bounded_count(self.APPROXIMATE_LIMIT)
+        if bounded <= self.APPROXIMATE_LIMIT:
+            self._put(key, versions, bounded)
+            return bounded, True
+        return self.APPROXIMATE_LIMIT, False
+
+    def _refine(self, key: tuple, exact_count) -> int:
+        versions = self._table_versions(key[0])
+        cached = self._get(key, versions)
+        if cached is not None:
+            return cached
+        value = exact_count()
+        self._put(key, versions, value)
+        return value
+
+    def count_pessoas(self, **filters) -> tuple[int, bool]:
+        """Retorna (contagem, é_exata). Se não for exata, a contagem real é maior que APPROXIMATE_LIMIT."""
+        return self._count(self._pessoas_key(filters), lambda limit: self.person_repo.count_pessoas_bounded(limit, **filters))
+
+    def refine_count_pessoas(self, **filters) -> int:
+        """Calcula (ou reaproveita) a contagem exata e a guarda no cache."""
+        return self._refine(self._pessoas_key(filters), lambda: self.person_repo.count_pessoas(**filters))
+
+    def count_organizacoes(self, search_term: str = "") -> tuple[int, bool]:
+        key = ("organizacoes", search_term.strip().lower())
+        return self._count(key, lambda limit: self.org_repo.count_organizacoes_bounded(limit, search_term))
+
+    def refine_count_organizacoes(self, search_term: str = "") -> int:
+        return self._refine(("organizacoes", search_term.strip().lower()), lambda: self.org_repo.count_organizacoes(search_term))
+
+    def invalidate(self, **kwargs):
+        """Limpa todas as contagens. Registrado como ouvinte do evento 'data_changed'."""
+        with self._lock:
+            self._entries.clear()
\ No newline at end of file
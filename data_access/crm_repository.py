@@ -1,15 +1,19 @@
 import sqlite3
 import logging
 
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
 class CrmRepository:
-    def __init__(self, conn: sqlite3.Connection):
-        self.conn = conn
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
 
     # --- Métodos de Atendimento ---
 
     def get_atendimentos_for_pessoa(self, id_pessoa: int) -> list[dict]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT id_atendimento, titulo, data_abertura, status FROM atendimentos WHERE id_pessoa = ? ORDER BY data_abertura DESC"
             cursor.execute(query, (id_pessoa,))
             return [dict(row) for row in cursor.fetchall()]
@@ -19,7 +23,7 @@ class CrmRepository:
 
     def get_urgent_atendimentos(self, limit: int = 5) -> list[dict]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = """
                 SELECT a.*, COALESCE(p.nome, org.nome_fantasia) as nome_solicitante 
                 FROM atendimentos a 
@@ -43,7 +47,7 @@ class CrmRepository:
 
     def get_all_atendimentos(self) -> list[dict]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = """
                 SELECT a.*, COALESCE(p.nome, org.nome_fantasia) as nome_solicitante 
                 FROM atendimentos a 
@@ -58,7 +62,7 @@ class CrmRepository:
 
     def get_atendimento_by_id(self, atendimento_id: int) -> dict | None:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = """
                 SELECT a.*, COALESCE(p.nome, org.nome_fantasia) as nome_solicitante 
                 FROM atendimentos a 
@@ -74,8 +78,8 @@ class CrmRepository:
 
     def save_atendimento(self, atendimento_data: dict, atendimento_id: int = 0) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 if atendimento_id == 0:
                     columns = ', '.join(atendimento_data.keys())
                     placeholders = ', '.join(['?'] * len(atendimento_data))
@@ -92,7 +96,7 @@ class CrmRepository:
 
     def get_updates_for_atendimento(self, atendimento_id: int) -> list[dict]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT * FROM atendimento_updates WHERE id_atendimento = ? ORDER BY data_update DESC"
             cursor.execute(query, (atendimento_id,))
             return [dict(row) for row in cursor.fetchall()]
@@ -101,8 +105,8 @@ class CrmRepository:
 
     def save_atendimento_update(self, update_data: dict) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 columns = ', '.join(update_data.keys())
                 placeholders = ', '.join(['?'] * len(update_data))
                 sql = f"INSERT INTO atendimento_updates ({columns}) VALUES ({placeholders})"
@@ -116,7 +120,7 @@ class CrmRepository:
 
     def get_all_proposicoes(self) -> list[dict]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT * FROM proposicoes ORDER BY data_proposicao DESC"
             cursor.execute(query)
             return [dict(row) for row in cursor.fetchall()]
@@ -125,7 +129,7 @@ class CrmRepository:
 
     def get_proposicao_by_id(self, proposicao_id: int) -> dict | None:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT * FROM proposicoes WHERE id_proposicao = ?", (proposicao_id,))
             proposicao_data = cursor.fetchone()
             if not proposicao_data: return None
@@ -139,8 +143,8 @@ class CrmRepository:
 
     def save_proposicao(self, proposicao_data: dict, temas_ids: list[int], proposicao_id: int = 0) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 effective_id = proposicao_id
                 if effective_id == 0:
                     sql = "INSERT INTO proposicoes (titulo, tipo, autor, data_proposicao, status, descricao) VALUES (?, ?, ?, ?, ?, ?)"
@@ -164,8 +168,8 @@ class CrmRepository:
 
     def delete_proposicao(self, proposicao_id: int) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("DELETE FROM proposicoes WHERE id_proposicao = ?", (proposicao_id,))
                 return cursor.rowcount > 0
         except sqlite3.Error:
@@ -177,7 +181,7 @@ class CrmRepository:
         start_date = f"{year}-{month:02d}-01"
         end_date = f"{year}-{month:02d}-31"
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT * FROM eventos WHERE data_evento BETWEEN ? AND ?"
             cursor.execute(query, (start_date, end_date))
             return [dict(row) for row in cursor.fetchall()]
@@ -189,7 +193,7 @@ class CrmRepository:
         today = datetime.now().strftime("%Y-%m-%d")
         end_date = (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT * FROM eventos WHERE data_evento BETWEEN ? AND ? ORDER BY data_evento ASC"
             cursor.execute(query, (today, end_date))
             return [dict(row) for row in cursor.fetchall()]
@@ -199,7 +203,7 @@ class CrmRepository:
     def get_events_for_day(self, target_date) -> list[dict]:
         try:
             date_str = target_date.strftime("%Y-%m-%d")
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT * FROM eventos WHERE data_evento = ? ORDER BY hora_inicio ASC"
             cursor.execute(query, (date_str,))
             return [dict(row) for row in cursor.fetchall()]
@@ -209,7 +213,7 @@ class CrmRepository:
 
     def get_evento_by_id(self, evento_id: int) -> dict | None:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT * FROM eventos WHERE id_evento = ?", (evento_id,))
             row = cursor.fetchone()
             return dict(row) if row else None
@@ -219,8 +223,8 @@ class CrmRepository:
 
     def save_evento(self, evento_data: dict, evento_id: int = 0) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 if evento_id == 0:
                     cols = ', '.join(evento_data.keys())
                     placeholders = ', '.join(['?'] * len(evento_data))
@@ -238,8 +242,8 @@ class CrmRepository:
 
     def delete_evento(self, evento_id: int) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("DELETE FROM eventos WHERE id_evento = ?", (evento_id,))
                 return cursor.rowcount > 0
         except sqlite3.Error as e:
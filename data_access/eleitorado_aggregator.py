@@ -0,0 +1,96 @@
+"""
+Agregação do eleitorado por município a partir dos arquivos do TSE, lidos em fluxo (csv_stream).
+
+Dois formatos são aceitos:
+- perfil_eleitorado do TSE (um ou vários anos, dezenas de milhões de linhas): cada linha é uma combinação
+  de município, zona, gênero, faixa etária, escolaridade etc., com a quantidade em QT_ELEITORES_PERFIL;
+- eleitorado_ANO.csv (formato anterior do sistema): colunas CIDADE, GENERO e VOTOS, com o ano no nome do arquivo.
+Cada linha é somada na hora aos totais por (município, ano) e às distribuições por faixa etária e
+escolaridade, então a memória usada depende só do número de municípios e anos, e não do tamanho do arquivo.
+Linhas de municípios que não estão na tabela 'municipios' (ou de outra UF) são ignoradas.
+"""
+import os
+import re
+
+from functions import data_helpers, csv_stream
+
+PERFIL_COLUMNS = ['ANO_ELEICAO', 'SG_UF', 'NM_MUNICIPIO', 'DS_GENERO', 'DS_FAIXA_ETARIA', 'DS_GRAU_ESCOLARIDADE', 'QT_ELEITORES_PERFIL']
+LEGACY_COLUMNS = ['CIDADE', 'GENERO', 'VOTOS']
+# Posição do gênero em [masculino, feminino, nao_informado]
+GENERO_SLOTS = {'MASCULINO': 0, 'FEMININO': 1}
+DIMENSOES = ('faixa_etaria', 'escolaridade')
+
+def is_perfil_file(filepath: str) -> bool:
+    """True para o perfil_eleitorado do TSE (tem QT_ELEITORES_PERFIL), False para o formato CIDADE/GENERO/VOTOS."""
+    with csv_stream.open_binary(filepath) as f:
+        return 'QT_ELEITORES_PERFIL' in csv_stream.read_header(f)
+
+def year_from_filename(filepath: str, default: int) -> int:
+    match = re.search(r'\d{4}', os.path.basename(filepath))
+    return data_helpers.safe_int(match.group(), default) if match else default
+
+def aggregate_eleitorado(filepath: str, municipios: dict[str, tuple[int, str | None]], default_ano: int, stop_event=None, on_progress=None):
+    """
+    Soma o eleitorado do arquivo. `municipios` é {cidade_key: (id_municipio, uf)}. `on_progress(bytes_lidos,
+    total_bytes)` é chamado a cada bloco. Retorna None se `stop_event` for sinalizado; senão (totais, perfis):
+    totais[(id_municipio, ano)] = [masculino, feminino, nao_informado] e
+    perfis[(id_municipio, ano, dimensao, categoria)] = eleitores (vazio no formato antigo).
+    """
+    perfil = is_perfil_file(filepath)
+    columns = PERFIL_COLUMNS if perfil else LEGACY_COLUMNS
+    total_bytes = csv_stream.source_size(filepath) or 1
+    totais = {}
+    perfis = {}
+    # Chaves como lidas do arquivo -> id_municipio (0 se não importado); ano e gênero também são resolvidos uma vez por valor
+    cidades = {}
+    anos = {}
+    generos = {}
+
+    def resolve_city(uf: str, nome: str) -> int:
+        found = municipios.get(data_helpers.normalize_city_key(nome))
+        if not found: return 0
+        id_municipio, uf_municipio = found
+        return id_municipio if not uf or not uf_municipio or uf.strip().upper() == uf_municipio.upper() else 0
+
+    for rows, position in csv_stream.iter_row_chunks(filepath, columns):
+        if stop_event is not None and stop_event.is_set(): return None
+        if perfil:
+            for ano, uf, nome, genero, faixa, escolaridade, quantidade in rows:
+                city = (uf, nome)
+                id_municipio = cidades.get(city)
+                if id_municipio is None: id_municipio = cidades[city] = resolve_city(uf, nome)
+                if not id_municipio: continue
+                ano_int = anos.get(ano)
+                if ano_int is None: ano_int = anos[ano] = data_helpers.safe_int(ano.strip(), default_ano)
+                slot = generos.get(genero)
+                if slot is None: slot = generos[genero] = GENERO_SLOTS.get(genero.strip().upper(), 2)
+                qtd = int(quantidade) if quantidade.isdigit() else data_helpers.safe_int(quantidade.strip())
+
+                key = (id_municipio, ano_int)
+                contagem = totais.get(key)
+                if contagem is None: contagem = totais[key] = [0, 0, 0]
+                contagem[slot] += qtd
+                # Categorias como lidas; espaços e capitalização são normalizados no fim (_normalize_perfis)
+                key = (id_municipio, ano_int, 'faixa_etaria', faixa)
+                perfis[key] = perfis.get(key, 0) + qtd
+                key = (id_municipio, ano_int, 'escolaridade', escolaridade)
+                perfis[key] = perfis.get(key, 0) + qtd
+        else:
+            for nome, genero, votos in rows:
+                id_municipio = cidades.get(nome)
+                if id_municipio is None: id_municipio = cidades[nome] = resolve_city("", nome)
+                if not id_municipio: continue
+                key = (id_municipio, default_ano)
+                contagem = totais.get(key)
+                if contagem is None: contagem = totais[key] = [0, 0, 0]
+                contagem[GENERO_SLOTS.get(genero.strip().upper(), 2)] += data_helpers.safe_int(votos.strip())
+        if on_progress: on_progress(position, total_bytes)
+
+    return totais, _normalize_perfis(perfis)
+
+def _normalize_perfis(perfis: dict) -> dict:
+    normalized = {}
+    for (id_municipio, ano, dimensao, categoria), qtd in perfis.items():
+        key = (id_municipio, ano, dimensao, categoria.strip().upper() or "NÃO INFORMADO")
+        normalized[key] = normalized.get(key, 0) + qtd
+    return normalized
\ No newline at end of file
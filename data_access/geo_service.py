@@ -5,105 +5,161 @@ import threading
 from tkinter import messagebox
 
 from geopy.geocoders import GoogleV3
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable, GeocoderQuotaExceeded
+from geopy.exc import GeocoderTimedOut, GeocoderUnavailable, GeocoderQuotaExceeded, GeocoderRateLimited
 
+import config
 from dto.pessoa import Pessoa
 from dto.organizacao import Organizacao
+from functions import data_helpers
+from functions.rate_limit import TokenBucket
+from .geocode_cache_repository import GeocodeCacheRepository, normalize_address
+from .bulk_geocoder import BulkGeocoder, RetryableGeocodeError
+from .offline_geocoder import OfflineGeocoder, PRECISAO_CIDADE, precision_from_location_type
 
 # Para Type Hinting
 from typing import TYPE_CHECKING, Callable
 if TYPE_CHECKING:
     from ..modules.person_form_window import PersonFormWindow
+    from .connection_pool import ConnectionPool
+    from .reference_cache import ReferenceDataCache
+
+# Geocodificação em massa: resultados acumulados antes de cada transação de gravação
+GEOCODE_WRITE_BATCH = 200
+GEOCODE_WRITE_INTERVAL_SECONDS = 2.0
 
 class GeoService:
-    def __init__(self, conn: sqlite3.Connection, api_key: str):
-        self.conn = conn
+    def __init__(self, pool: 'ConnectionPool', api_key: str, reference_cache: 'ReferenceDataCache' = None):
+        self.pool = pool
+        self.reference_cache = reference_cache
         if not api_key:
             raise ValueError("A chave de API do Google não foi fornecida na inicialização do GeoService.")
         
         self.geolocator = GoogleV3(api_key=api_key)
         self.api_key = api_key
+        self.cache = GeocodeCacheRepository(pool)
+        self.offline = OfflineGeocoder(pool)
 
-    def _geocode_address(self, address_to_search: str) -> tuple[float | None, float | None]:
-        if not address_to_search or len(address_to_search.split(',')) < 2:
-            logging.warning(f"Endereço inválido ou insuficiente para geocodificação: '{address_to_search}'")
-            return None, None
+    def _setting(self, key: str, default):
+        value = self.reference_cache.get_app_setting(key) if self.reference_cache else None
+        return data_helpers.safe_int(value) or default
+
+    def _fetch_address(self, address_to_search: str, retry_errors: bool = False) -> tuple[float | None, float | None, str | None] | None:
+        """
+        Consulta a API do Google. Retorna (latitude, longitude, precisão), (None, None, None) se o endereço não
+        foi encontrado, ou None em erro de serviço (que não deve ir para o cache). Com `retry_errors`, os erros
+        transitórios são levantados como RetryableGeocodeError, para a fila de novas tentativas do BulkGeocoder.
+        """
         try:
             # time.sleep(0.01) 
             location = self.geolocator.geocode(address_to_search, timeout=1, language='pt-BR')
             
             if location:
                 logging.info(f"Endereço '{address_to_search}' geocodificado para: ({location.latitude}, {location.longitude})")
-                return location.latitude, location.longitude
+                precisao = (location.raw or {}).get('geometry', {}).get('location_type')
+                return location.latitude, location.longitude, precisao
             else:
                 logging.warning(f"Nenhum resultado para o endereço: '{address_to_search}'")
+                return None, None, None
+        except GeocoderRateLimited as e:
+            # Subclasse de GeocoderQuotaExceeded: é o limite por segundo, não a cota, e passa esperando
+            if retry_errors: raise RetryableGeocodeError(str(e), e.retry_after) from e
+            logging.error(f"Limite de requisições da API do Google atingido para '{address_to_search}': {e}")
         except GeocoderQuotaExceeded:
             logging.error(f"Cota da API do Google excedida. Verifique seu painel do Google Cloud.")
             raise
         except (GeocoderTimedOut, GeocoderUnavailable) as e:
+            if retry_errors: raise RetryableGeocodeError(str(e)) from e
             logging.error(f"Erro de serviço no geocoding para '{address_to_search}': {e}")
             time.sleep(2)
         except Exception as e:
             logging.error(f"Erro inesperado durante geocoding para '{address_to_search}': {e}")
-        return None, None
+        return None
+
+    def _geocode_address(self, address_to_search: str, retry_errors: bool = False) -> tuple[float | None, float | None, str | None]:
+        """Retorna (latitude, longitude, location_type do Google), pelo cache ou pela API."""
+        if not address_to_search or len(address_to_search.split(',')) < 2:
+            logging.warning(f"Endereço inválido ou insuficiente para geocodificação: '{address_to_search}'")
+            return None, None, None
+        key = normalize_address(address_to_search)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = self._fetch_address(address_to_search, retry_errors)
+        if result is None:
+            return None, None, None
+        self.cache.save_many([(key, *result)])
+        return result
+
+    def _locate(self, entity: Pessoa | Organizacao, address_str: str, city_level: bool, retry_errors: bool = False) -> tuple[float | None, float | None, str | None]:
+        """
+        Retorna (latitude, longitude, precisão). Endereços só com cidade/UF são resolvidos pelo centro do município
+        (OfflineGeocoder), sem chamar a API; se a cidade não estiver na tabela, o ponto da API é aprendido para a próxima vez.
+        """
+        if city_level:
+            centroid = self.offline.lookup(entity.cidade, entity.uf)
+            if centroid: return (*centroid, PRECISAO_CIDADE)
+        lat, lon, location_type = self._geocode_address(address_str, retry_errors)
+        if lat is None or lon is None:
+            return None, None, None
+        if city_level:
+            self.offline.learn([(entity.cidade, entity.uf, lat, lon)])
+            return lat, lon, PRECISAO_CIDADE
+        return lat, lon, precision_from_location_type(location_type)
+
+    @staticmethod
+    def _entity_address(entity: Pessoa | Organizacao) -> tuple[str, bool]:
+        """
+        Endereço completo da entidade ou, se ele não tiver ao menos duas partes, "CIDADE, UF" (UF padrão SP).
+        O segundo valor indica se o endereço é só de cidade (sem rua, número, complemento ou bairro).
+        """
+        address_parts_priority = [part for part in (entity.endereco, entity.numero, entity.complemento, entity.bairro, entity.cidade, entity.uf) if part and part.strip()]
+        address_parts_fallback = []
+        if entity.cidade and entity.cidade.strip(): address_parts_fallback.append(entity.cidade)
+        if entity.uf and entity.uf.strip(): address_parts_fallback.append(entity.uf)
+        else: address_parts_fallback.append("SP")
+
+        address_str = ", ".join(address_parts_priority)
+        if not address_str or len(address_str.split(',')) < 2:
+            return ", ".join(address_parts_fallback), True
+        city_level = not any(part and part.strip() for part in (entity.endereco, entity.numero, entity.complemento, entity.bairro))
+        return address_str, city_level
+
+    @staticmethod
+    def _entity_table(entity: Pessoa | Organizacao) -> tuple[str, str, int | None]:
+        if isinstance(entity, Pessoa):
+            return "pessoas", "id_pessoa", entity.id_pessoa
+        return "organizacoes", "id_organizacao", entity.id_organizacao
         
     def geocode_and_save_entity_threaded(self, entity: Pessoa | Organizacao, ui_callback: Callable = None):
         threading.Thread(target=self.geocode_and_save_entity, args=(entity, ui_callback), daemon=True).start()
 
-    def geocode_and_save_entity(self, entity: Pessoa | Organizacao, ui_callback: Callable = None) -> bool:
+    def geocode_and_save_entity(self, entity: Pessoa | Organizacao, ui_callback: Callable = None, retry_errors: bool = False) -> bool:
         """
         Geocodifica e salva as coordenadas para uma única Pessoa ou Organização.
         Pode receber um ui_callback para atualizar a interface (ex: preencher lat/lon).
+        Com `retry_errors` (fila de geocodificação), erros transitórios da API levantam RetryableGeocodeError
+        sem apagar as coordenadas, para que o trabalho seja tentado de novo.
         """
-        address_parts_priority = []
-        address_parts_fallback = []
-
-        if isinstance(entity, Pessoa):
-            if entity.endereco and entity.endereco.strip(): address_parts_priority.append(entity.endereco)
-            if entity.numero and entity.numero.strip(): address_parts_priority.append(entity.numero)
-            if entity.complemento and entity.complemento.strip(): address_parts_priority.append(entity.complemento)
-            if entity.bairro and entity.bairro.strip(): address_parts_priority.append(entity.bairro)
-            if entity.cidade and entity.cidade.strip(): address_parts_priority.append(entity.cidade)
-            if entity.uf and entity.uf.strip(): address_parts_priority.append(entity.uf)
-            
-            if entity.cidade and entity.cidade.strip(): address_parts_fallback.append(entity.cidade)
-            if entity.uf and entity.uf.strip(): address_parts_fallback.append(entity.uf)
-            else: address_parts_fallback.append("SP")
-
-        elif isinstance(entity, Organizacao):
-            if entity.endereco and entity.endereco.strip(): address_parts_priority.append(entity.endereco)
-            if entity.numero and entity.numero.strip(): address_parts_priority.append(entity.numero)
-            if entity.complemento and entity.complemento.strip(): address_parts_priority.append(entity.complemento)
-            if entity.bairro and entity.bairro.strip(): address_parts_priority.append(entity.bairro)
-            if entity.cidade and entity.cidade.strip(): address_parts_priority.append(entity.cidade)
-            if entity.uf and entity.uf.strip(): address_parts_priority.append(entity.uf)
-
-            if entity.cidade and entity.cidade.strip(): address_parts_fallback.append(entity.cidade)
-            if entity.uf and entity.uf.strip(): address_parts_fallback.append(entity.uf)
-            else: address_parts_fallback.append("SP")
+        address_str, city_level = self._entity_address(entity)
 
-        address_str = ", ".join(address_parts_priority)
-        if not address_str or len(address_str.split(',')) < 2:
-            address_str = ", ".join(address_parts_fallback)
-            
         if not address_str or len(address_str.split(',')) < 1: 
             logging.warning(f"Não há informações de endereço suficientes para geocodificar a entidade ID {getattr(entity, 'id_pessoa', getattr(entity, 'id_organizacao', 'N/A'))}.")
             if ui_callback:
                  ui_callback(None, None)
             return False
 
-        lat, lon = self._geocode_address(address_str)
+        lat, lon, precisao = self._locate(entity, address_str, city_level, retry_errors)
 
         if lat is not None and lon is not None:
-            entity.latitude, entity.longitude = lat, lon
+            entity.latitude, entity.longitude, entity.geo_precisao = lat, lon, precisao
 
             try:
-                with self.conn:
+                with self.pool.writer() as conn:
                     id_to_update = getattr(entity, 'id_pessoa', getattr(entity, 'id_organizacao', None))
                     table_name = "pessoas" if isinstance(entity, Pessoa) else "organizacoes"
                     id_column = "id_pessoa" if isinstance(entity, Pessoa) else "id_organizacao"
                     
-                    self.conn.execute(f"UPDATE {table_name} SET latitude = ?, longitude = ? WHERE {id_column} = ?", (lat, lon, id_to_update))
+                    conn.execute(f"UPDATE {table_name} SET latitude = ?, longitude = ?, geo_precisao = ? WHERE {id_column} = ?", (lat, lon, precisao, id_to_update))
                 
                 if ui_callback:
                     ui_callback(lat, lon)
@@ -115,12 +171,12 @@ class GeoService:
                 return False
         else: # Se a geocodificação falhou ou retornou None (não encontrado)
             try:
-                with self.conn:
+                with self.pool.writer() as conn:
                     id_to_update = getattr(entity, 'id_pessoa', getattr(entity, 'id_organizacao', None))
                     table_name = "pessoas" if isinstance(entity, Pessoa) else "organizacoes"
                     id_column = "id_pessoa" if isinstance(entity, Pessoa) else "id_organizacao"
                     
-                    self.conn.execute(f"UPDATE {table_name} SET latitude = NULL, longitude = NULL WHERE {id_column} = ?", (id_to_update,))
+                    conn.execute(f"UPDATE {table_name} SET latitude = NULL, longitude = NULL, geo_precisao = NULL WHERE {id_column} = ?", (id_to_update,))
                 
                 if ui_callback:
                     ui_callback(None, None)
@@ -131,11 +187,113 @@ class GeoService:
                     ui_callback(None, None)
                 return False
 
+    def _geocode_entities(self, entities: list, progress_win, interrupted_error) -> int:
+        """
+        Geocodifica em massa: agrupa as entidades pelo endereço normalizado, resolve pelo centro do município os
+        endereços só de cidade (OfflineGeocoder) e pelo cache os já consultados, e consulta os demais uma única vez cada, em paralelo (BulkGeocoder), no limite de
+        requisições por segundo da cota da API (app_settings 'geocode_workers' e 'geocode_rate', ou config).
+        Os resultados são gravados no cache e nas entidades em lotes, numa transação por lote; o que já foi
+        consultado é gravado também ao cancelar. Retorna quantas entidades receberam coordenadas.
+        """
+        grupos = {}
+        for entity in entities:
+            address_str, city_level = self._entity_address(entity)
+            if not address_str or len(address_str.split(',')) < 2: continue
+            grupos.setdefault(normalize_address(address_str), (address_str, city_level, []))[2].append(entity)
+
+        resolvidos = {}
+        for key, (_, city_level, grupo) in grupos.items():
+            centroid = self.offline.lookup(grupo[0].cidade, grupo[0].uf) if city_level else None
+            if centroid: resolvidos[key] = (*centroid, None)
+        offline_count = len(resolvidos)
+        cached = self.cache.get_many(key for key in grupos if key not in resolvidos)
+        # Cidades já consultadas na API antes de estarem na tabela de centroides passam a ser resolvidas offline
+        self.offline.learn((grupos[key][2][0].cidade, grupos[key][2][0].uf, lat, lon) for key, (lat, lon, _) in cached.items() if grupos[key][1] and lat is not None)
+        resolvidos.update(cached)
+        try:
+            with self.pool.writer() as conn:
+                success_count = self._save_entity_coordinates(conn, grupos, resolvidos)
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao salvar as coordenadas já conhecidas da geocodificação em massa: {e}", exc_info=True)
+            success_count = 0
+        pendentes = {key: address_str for key, (address_str, _, _) in grupos.items() if key not in resolvidos}
+        workers = self._setting("geocode_workers", config.GEOCODE_WORKERS)
+        rate = self._setting("geocode_rate", config.GEOCODE_REQUESTS_PER_SECOND)
+        logging.info(f"Geocodificação em massa: {len(entities)} entidades, {len(grupos)} endereços distintos, "
+                     f"{offline_count} pelo centro do município, {len(resolvidos) - offline_count} no cache e {len(pendentes)} a consultar ({workers} threads, {rate} req/s).")
+
+        lote = {}
+        last_flush = time.monotonic()
+
+        def flush():
+            nonlocal success_count, last_flush
+            if lote:
+                # Um erro desfaz o lote inteiro (cache, centroides e coordenadas), que não entra na contagem
+                try:
+                    with self.pool.writer() as conn:
+                        self.cache.save_many((key, *result) for key, result in lote.items())
+                        self.offline.learn((grupos[key][2][0].cidade, grupos[key][2][0].uf, lat, lon)
+                                           for key, (lat, lon, _) in lote.items() if grupos[key][1] and lat is not None)
+                        success_count += self._save_entity_coordinates(conn, grupos, lote)
+                except sqlite3.Error as e:
+                    logging.error(f"Erro ao gravar um lote de {len(lote)} endereços da geocodificação em massa: {e}", exc_info=True)
+                lote.clear()
+            last_flush = time.monotonic()
+
+        def on_result(key, result):
+            lote[key] = result
+            if len(lote) >= GEOCODE_WRITE_BATCH or time.monotonic() - last_flush >= GEOCODE_WRITE_INTERVAL_SECONDS:
+                flush()
+
+        geocoder = BulkGeocoder(lambda address: self._fetch_address(address, retry_errors=True), TokenBucket(rate), workers)
+
+        def on_progress(done, total):
+            progress_win.after(0, lambda d=done, t=total, r=geocoder.retries, c=len(resolvidos): progress_win.update_progress(
+                f"Geocodificando endereços ({d}/{t})...", d / t, f"{c} resolvidos sem consulta, {r} novas tentativas"))
+
+        try:
+            completed = geocoder.run(pendentes, progress_win.stop_event, on_result, on_progress)
+        finally:
+            flush()
+        if geocoder.failed:
+            logging.warning(f"Geocodificação em massa: {geocoder.failed} endereços não puderam ser consultados.")
+        if not completed: raise interrupted_error
+        return success_count
+
+    def _save_entity_coordinates(self, conn, grupos: dict, resolvidos: dict) -> int:
+        """
+        Grava as coordenadas (e a precisão) encontradas nas entidades de cada endereço de `resolvidos`, na transação
+        de `conn` (a de quem chamou, que trata o erro). Retorna quantas entidades foram atualizadas.
+        """
+        updates = {}
+        for key, (lat, lon, location_type) in resolvidos.items():
+            if lat is None or lon is None: continue
+            _, city_level, grupo = grupos[key]
+            precisao = PRECISAO_CIDADE if city_level else precision_from_location_type(location_type)
+            for entity in grupo:
+                table_name, id_column, id_to_update = self._entity_table(entity)
+                entity.latitude, entity.longitude, entity.geo_precisao = lat, lon, precisao
+                updates.setdefault((table_name, id_column), []).append((lat, lon, precisao, id_to_update))
+        for (table_name, id_column), rows in updates.items():
+            conn.executemany(f"UPDATE {table_name} SET latitude = ?, longitude = ?, geo_precisao = ? WHERE {id_column} = ?", rows)
+        return sum(len(rows) for rows in updates.values())
+
+    def importar_centroides_csv(self, filepath: str, progress_win):
+        """Importa o arquivo de municípios do IBGE (latitude/longitude de cada município) para a geocodificação offline."""
+        try:
+            progress_win.after(0, lambda: progress_win.update_progress("Lendo os municípios...", 0.1))
+            count = self.offline.import_csv(filepath)
+            progress_win.after(0, lambda: progress_win.operation_finished(
+                f"{count} municípios importados.\nEndereços só com cidade/UF passam a ser geocodificados sem consultar a API."))
+        except Exception as e:
+            logging.error(f"Erro ao importar os centroides dos municípios: {e}", exc_info=True)
+            progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro: {e}"))
+
     def geocode_all_contacts(self, progress_win):
         try:
             class InterruptedError(Exception): pass
 
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             # --- MUDANÇA AQUI: Adicionado a condição `geo_visivel = 1` ---
             cursor.execute("SELECT * FROM pessoas WHERE geo_visivel = 1 AND (latitude IS NULL OR longitude IS NULL) AND (cidade IS NOT NULL AND cidade != '' OR uf IS NOT NULL AND uf != '')")
             people_to_geocode = [Pessoa.from_dict(dict(row)) for row in cursor.fetchall()]
@@ -145,15 +303,7 @@ class GeoService:
                 progress_win.after(0, lambda: progress_win.operation_finished("Todos os contatos visíveis com endereço já possuem coordenadas."))
                 return
 
-            success_count = 0
-            for i, pessoa in enumerate(people_to_geocode):
-                if progress_win.stop_event.is_set(): raise InterruptedError
-
-                progress = (i + 1) / total
-                progress_win.after(0, lambda p=pessoa.nome, pr=progress, i=i, t=total: progress_win.update_progress(f"Geocodificando: {p}", pr, f"Pessoa {i+1}/{t}"))
-                
-                if self.geocode_and_save_entity(pessoa): 
-                    success_count += 1
+            success_count = self._geocode_entities(people_to_geocode, progress_win, InterruptedError)
             
             final_message = f"Geocodificação de Pessoas concluída!\n{success_count} de {total} contatos visíveis foram atualizados."
             progress_win.after(0, lambda msg=final_message: progress_win.operation_finished(msg))
@@ -171,7 +321,7 @@ class GeoService:
         try:
             class InterruptedError(Exception): pass
             
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             # --- MUDANÇA AQUI: Adicionado a condição `geo_visivel = 1` ---
             cursor.execute("SELECT * FROM organizacoes WHERE geo_visivel = 1 AND (latitude IS NULL OR longitude IS NULL) AND (cidade IS NOT NULL AND cidade != '' OR uf IS NOT NULL AND uf != '')")
             orgs_to_geocode = [Organizacao.from_dict(dict(row)) for row in cursor.fetchall()]
@@ -181,15 +331,7 @@ class GeoService:
                 progress_win.after(0, lambda: progress_win.operation_finished("Todas as organizações visíveis com endereço já possuem coordenadas."))
                 return
 
-            success_count = 0
-            for i, org in enumerate(orgs_to_geocode):
-                if progress_win.stop_event.is_set(): raise InterruptedError
-
-                progress = (i + 1) / total
-                progress_win.after(0, lambda o=org.nome_fantasia, p=progress, i=i, t=total: progress_win.update_progress(f"Geocodificando: {o}", p, f"Organização {i+1}/{t}"))
-                
-                if self.geocode_and_save_entity(org): 
-                    success_count += 1
+            success_count = self._geocode_entities(orgs_to_geocode, progress_win, InterruptedError)
 
             final_message = f"Geocodificação de Organizações concluída!\n{success_count} de {total} organizações visíveis foram atualizadas."
             progress_win.after(0, lambda msg=final_message: progress_win.operation_finished(msg))
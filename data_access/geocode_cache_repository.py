@@ -0,0 +1,64 @@
+import re
+import sqlite3
+import logging
+
+from functions import data_helpers
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
+# Endereços não encontrados são consultados de novo depois desse prazo (o Google passa a conhecer ruas novas)
+NEGATIVE_TTL_DAYS = 30
+# Chaves por consulta IN (...), abaixo do limite de variáveis do SQLite
+LOOKUP_BATCH = 500
+
+def normalize_address(address: str) -> str:
+    """Chave do cache: 'Rua  São João , 10, Campinas, sp' -> 'RUA SAO JOAO, 10, CAMPINAS, SP'."""
+    parts = (re.sub(r'\s+', ' ', part).strip(' .') for part in data_helpers.normalize_city_key(address).split(','))
+    return ", ".join(part for part in parts if part)
+
+class GeocodeCacheRepository:
+    """
+    Cache persistente das geocodificações (tabela geocode_cache), pela chave normalizada do endereço.
+
+    Guarda também os endereços que a API não encontrou (latitude/longitude NULL), para que não sejam
+    consultados de novo a cada salvamento ou geocodificação em massa; essas entradas expiram depois de
+    NEGATIVE_TTL_DAYS. Erros de serviço (timeout, indisponibilidade) não são gravados. Como é só um
+    cache, falhas de leitura ou gravação são registradas no log e tratadas como ausência de resultado.
+    """
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
+
+    def get_many(self, keys) -> dict[str, tuple[float | None, float | None, str | None]]:
+        """Retorna {chave: (latitude, longitude, precisão)} das chaves em cache; não encontrados vêm com (None, None, None)."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        try:
+            cursor = self.pool.reader().cursor()
+            for i in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[i:i + LOOKUP_BATCH]
+                cursor.execute(
+                    f"""SELECT endereco_key, latitude, longitude, precisao FROM geocode_cache
+                        WHERE endereco_key IN ({','.join('?' * len(batch))})
+                          AND (latitude IS NOT NULL OR data_consulta >= datetime('now', ?))""",
+                    (*batch, f"-{NEGATIVE_TTL_DAYS} days"))
+                found.update((key, (lat, lon, precisao)) for key, lat, lon, precisao in cursor)
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao consultar o cache de geocodificação: {e}", exc_info=True)
+        return found
+
+    def get(self, key: str) -> tuple[float | None, float | None, str | None] | None:
+        return self.get_many([key]).get(key)
+
+    def save_many(self, entries):
+        """Grava (chave, latitude, longitude, precisão) de cada consulta feita à API; latitude None = não encontrado."""
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany(
+                    """INSERT INTO geocode_cache (endereco_key, latitude, longitude, precisao, data_consulta) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                       ON CONFLICT (endereco_key) DO UPDATE SET latitude = excluded.latitude, longitude = excluded.longitude,
+                       precisao = excluded.precisao, data_consulta = excluded.data_consulta""",
+                    entries)
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao gravar no cache de geocodificação: {e}", exc_info=True)
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Fila persistente de geocodificação dos contatos salvos individualmente.
+
+Salvar uma pessoa ou organização só grava um trabalho na tabela geocode_jobs (enqueue); uma thread de
+fundo consome a fila, geocodifica com o GeoService e avisa os ouvintes (add_listener) quando as
+coordenadas chegam, sem travar a interface durante a consulta à API. Como a fila fica no banco, os
+trabalhos pendentes sobrevivem ao fechamento do aplicativo: ao iniciar (start), os que estavam em
+andamento voltam a 'pendente' e são retomados.
+
+Erros transitórios (RetryableGeocodeError) adiam o trabalho com espera exponencial; qualquer outro erro
+(ex.: cota da API esgotada) adia por ERROR_DELAY_SECONDS. Depois de MAX_ATTEMPTS tentativas o trabalho
+fica como 'falhou' até o contato ser salvo de novo.
+"""
+import sqlite3
+import logging
+import threading
+
+from dto.pessoa import Pessoa
+from dto.organizacao import Organizacao
+from .bulk_geocoder import RetryableGeocodeError
+
+from typing import TYPE_CHECKING, Callable
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+    from .geo_service import GeoService
+
+TIPO_PESSOA = "pessoa"
+TIPO_ORGANIZACAO = "organizacao"
+
+MAX_ATTEMPTS = 8
+BASE_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+ERROR_DELAY_SECONDS = 900
+# Espera máxima da thread sem trabalho a fazer (enqueue a acorda antes)
+IDLE_WAIT_SECONDS = 300
+
+_ENTITIES = {
+    TIPO_PESSOA: ("pessoas", "id_pessoa", Pessoa),
+    TIPO_ORGANIZACAO: ("organizacoes", "id_organizacao", Organizacao),
+}
+
+class GeocodeJobQueue:
+    def __init__(self, pool: 'ConnectionPool', geo_service: 'GeoService'):
+        self.pool = pool
+        self.geo_service = geo_service
+        self._listeners: list[Callable] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_listener(self, callback: Callable):
+        """
+        `callback(tipo, id_entidade, latitude, longitude, precisao)` é chamado, NA THREAD DA FILA, a cada
+        trabalho concluído (latitude/longitude None se o endereço não foi encontrado).
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def enqueue(self, tipo: str, id_entidade: int) -> bool:
+        """Agenda (ou reagenda, zerando as tentativas) a geocodificação da entidade e acorda a thread da fila."""
+        try:
+            with self.pool.writer() as conn:
+                conn.execute("""
+                    INSERT INTO geocode_jobs (tipo, id_entidade) VALUES (?, ?)
+                    ON CONFLICT (tipo, id_entidade) DO UPDATE SET estado = 'pendente', tentativas = 0, erro = NULL, proximo_em = CURRENT_TIMESTAMP
+                """, (tipo, id_entidade))
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao agendar a geocodificação de {tipo} ID {id_entidade}: {e}")
+            return False
+        self._wake.set()
+        return True
+
+    def pending_count(self) -> int:
+        try:
+            cursor = self.pool.reader().cursor()
+            cursor.execute("SELECT COUNT(*) FROM geocode_jobs WHERE estado IN ('pendente', 'em_andamento')")
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao contar a fila de geocodificação: {e}")
+            return 0
+
+    def seconds_until_next(self) -> float | None:
+        """Segundos até o próximo trabalho pendente ficar pronto (0 se já está), ou None se a fila está vazia."""
+        cursor = self.pool.reader().cursor()
+        cursor.execute("SELECT (julianday(MIN(proximo_em)) - julianday('now')) * 86400 FROM geocode_jobs WHERE estado = 'pendente'")
+        seconds = cursor.fetchone()[0]
+        return None if seconds is None else max(0.0, seconds)
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        try:
+            with self.pool.writer() as conn:
+                # Trabalhos interrompidos pelo fechamento do aplicativo são retomados
+                recovered = conn.execute("UPDATE geocode_jobs SET estado = 'pendente' WHERE estado = 'em_andamento'").rowcount
+            if recovered:
+                logging.info(f"Fila de geocodificação: {recovered} trabalho(s) interrompido(s) retomado(s).")
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao recuperar a fila de geocodificação: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="GeocodeJobQueue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim_next()
+                if job:
+                    self._process(*job)
+                    continue
+                wait = self.seconds_until_next()
+            except sqlite3.Error as e:
+                logging.error(f"Erro na fila de geocodificação: {e}")
+                wait = IDLE_WAIT_SECONDS
+            self._wake.wait(IDLE_WAIT_SECONDS if wait is None else min(wait, IDLE_WAIT_SECONDS))
+            self._wake.clear()
+
+    def _claim_next(self) -> tuple[int, str, int, int] | None:
+        with self.pool.writer() as conn:
+            row = conn.execute("""
+                SELECT id_job, tipo, id_entidade, tentativas FROM geocode_jobs
+                WHERE estado = 'pendente' AND proximo_em <= CURRENT_TIMESTAMP
+                ORDER BY proximo_em, id_job LIMIT 1
+            """).fetchone()
+            if row is None: return None
+            conn.execute("UPDATE geocode_jobs SET estado = 'em_andamento' WHERE id_job = ?", (row[0],))
+        return row[0], row[1], row[2], row[3]
+
+    def _load_entity(self, tipo: str, id_entidade: int) -> Pessoa | Organizacao | None:
+        table_name, id_column, dto_class = _ENTITIES[tipo]
+        cursor = self.pool.reader().cursor()
+        cursor.execute(f"SELECT * FROM {table_name} WHERE {id_column} = ?", (id_entidade,))
+        row = cursor.fetchone()
+        return dto_class.from_dict(dict(row)) if row else None
+
+    def _process(self, id_job: int, tipo: str, id_entidade: int, tentativas: int):
+        entity = self._load_entity(tipo, id_entidade)
+        # Contato excluído, com a geolocalização desligada ou já com coordenadas (digitadas no formulário): nada a fazer
+        if entity is None or entity.geo_visivel != 1 or (entity.latitude is not None and entity.longitude is not None):
+            self._finish(id_job)
+            return
+
+        try:
+            self.geo_service.geocode_and_save_entity(entity, retry_errors=True)
+        except RetryableGeocodeError as e:
+            delay = e.retry_after or min(BASE_BACKOFF_SECONDS * 2 ** tentativas, MAX_BACKOFF_SECONDS)
+            self._reschedule(id_job, tentativas + 1, delay, str(e))
+            return
+        except Exception as e:
+            logging.error(f"Erro ao geocodificar {tipo} ID {id_entidade} pela fila: {e}", exc_info=True)
+            self._reschedule(id_job, tentativas + 1, ERROR_DELAY_SECONDS, str(e))
+            return
+
+        self._finish(id_job)
+        logging.info(f"Fila de geocodificação: {tipo} ID {id_entidade} -> ({entity.latitude}, {entity.longitude}).")
+        for callback in list(self._listeners):
+            try:
+                callback(tipo, id_entidade, entity.latitude, entity.longitude, entity.geo_precisao)
+            except Exception as e:
+                logging.error(f"Erro no ouvinte da fila de geocodificação: {e}", exc_info=True)
+
+    def _finish(self, id_job: int):
+        # Se o contato foi salvo de novo durante a consulta, o trabalho voltou a 'pendente' e fica para a próxima volta
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM geocode_jobs WHERE id_job = ? AND estado = 'em_andamento'", (id_job,))
+
+    def _reschedule(self, id_job: int, tentativas: int, delay: float, erro: str):
+        estado = 'falhou' if tentativas >= MAX_ATTEMPTS else 'pendente'
+        if estado == 'falhou':
+            logging.warning(f"Fila de geocodificação: trabalho {id_job} desistido após {tentativas} tentativas ({erro}).")
+        with self.pool.writer() as conn:
+            conn.execute("""
+                UPDATE geocode_jobs SET estado = ?, tentativas = ?, erro = ?, proximo_em = datetime('now', ?)
+                WHERE id_job = ? AND estado = 'em_andamento'
+            """, (estado, tentativas, erro, f"+{max(1, round(delay))} seconds", id_job))
\ No newline at end of file
@@ -0,0 +1,94 @@
+import sqlite3
+import logging
+import json
+import os
+import hashlib
+
+from functions import zip_source
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
+FINGERPRINT_SAMPLE_BYTES = 1024 * 1024
+
+def file_fingerprint(filepath: str) -> str:
+    """
+    Identifica o conteúdo de um arquivo sem lê-lo inteiro: tamanho + SHA-1 do primeiro e do último MB.
+    Não depende do caminho nem da data de modificação, então uma cópia do mesmo arquivo é reconhecida.
+    Numa origem ZIP (functions.zip_source), é a do próprio ZIP mais as UFs escolhidas.
+    """
+    path, ufs = zip_source.split_source(filepath)
+    size = os.path.getsize(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(FINGERPRINT_SAMPLE_BYTES, size - FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    fingerprint = f"{size}:{digest.hexdigest()}"
+    return f"{fingerprint}:{','.join(ufs)}" if ufs else fingerprint
+
+class ImportJobRepository:
+    """
+    Controle das importações retomáveis (tabela import_jobs).
+
+    Cada importação grava o seu progresso em blocos: o bloco de dados e o `checkpoint` do job são
+    gravados na mesma transação (os métodos de escrita usam `pool.writer()`, que reaproveita a transação
+    de quem chamou), então um cancelamento ou uma queda nunca deixa dados sem o checkpoint
+    correspondente. `complete_job` deve ser chamado dentro da transação de finalização da importação.
+    `checkpoint` e `complete_job` não tratam sqlite3.Error: a falha precisa desfazer o bloco inteiro.
+    """
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job = dict(row)
+        job['checkpoint'] = json.loads(job['checkpoint']) if job.get('checkpoint') else {}
+        job['progresso'] = (job['byte_offset'] / job['total_bytes']) if job.get('total_bytes') else 0.0
+        return job
+
+    def find_open_job(self, tipo: str, fingerprint: str) -> dict | None:
+        """Retorna a importação em andamento mais recente deste tipo para o mesmo arquivo, se houver."""
+        try:
+            cursor = self.pool.reader().cursor()
+            cursor.execute("SELECT * FROM import_jobs WHERE tipo = ? AND fingerprint = ? AND estado = 'em_andamento' ORDER BY id_job DESC LIMIT 1", (tipo, fingerprint))
+            row = cursor.fetchone()
+            return self._row_to_job(row) if row else None
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao buscar importação em andamento ({tipo}): {e}", exc_info=True)
+            return None
+
+    def create_job(self, tipo: str, arquivo: str, fingerprint: str, fase: str, total_bytes: int, checkpoint: dict | None = None) -> int:
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO import_jobs (tipo, arquivo, fingerprint, fase, total_bytes, checkpoint) VALUES (?, ?, ?, ?, ?, ?)",
+                (tipo, arquivo, fingerprint, fase, total_bytes, json.dumps(checkpoint or {}))
+            )
+            logging.info(f"Importação '{tipo}' iniciada (job {cursor.lastrowid}) para '{os.path.basename(arquivo)}'.")
+            return cursor.lastrowid
+
+    def checkpoint(self, id_job: int, fase: str, byte_offset: int, checkpoint: dict):
+        with self.pool.writer() as conn:
+            conn.execute(
+                "UPDATE import_jobs SET fase = ?, byte_offset = ?, checkpoint = ?, data_atualizacao = CURRENT_TIMESTAMP WHERE id_job = ?",
+                (fase, byte_offset, json.dumps(checkpoint), id_job)
+            )
+
+    def complete_job(self, id_job: int):
+        """Marca a importação como concluída e descarta os dados intermediários. Pode ser repetido sem efeito."""
+        with self.pool.writer() as conn:
+            conn.execute("UPDATE import_jobs SET estado = 'concluido', fase = 'concluido', byte_offset = total_bytes, data_atualizacao = CURRENT_TIMESTAMP WHERE id_job = ?", (id_job,))
+            conn.execute("DELETE FROM import_votos_parciais WHERE id_job = ?", (id_job,))
+
+    def discard_job(self, id_job: int) -> bool:
+        """Abandona uma importação interrompida: a próxima importação do mesmo arquivo recomeça do início."""
+        try:
+            with self.pool.writer() as conn:
+                conn.execute("UPDATE import_jobs SET estado = 'descartado', data_atualizacao = CURRENT_TIMESTAMP WHERE id_job = ? AND estado = 'em_andamento'", (id_job,))
+                conn.execute("DELETE FROM import_votos_parciais WHERE id_job = ?", (id_job,))
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao descartar a importação {id_job}: {e}", exc_info=True)
+            return False
\ No newline at end of file
@@ -0,0 +1,120 @@
+import sqlite3
+import logging
+import hashlib
+
+from functions import zip_source
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+KEY_SEPARATOR = "|"
+
+def file_hash(filepath: str, on_block=None) -> str | None:
+    """
+    SHA-1 do arquivo inteiro, lido em blocos (numa origem ZIP, o do ZIP mais as UFs escolhidas).
+    `on_block(bytes_lidos)` é chamado a cada bloco e pode retornar False para interromper (retorna None).
+    """
+    path, ufs = zip_source.split_source(filepath)
+    digest = hashlib.sha1(','.join(ufs).encode()) if ufs else hashlib.sha1()
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+            if on_block and on_block(len(block)) is False: return None
+    return digest.hexdigest()
+
+def row_digest(values) -> int:
+    """Resumo de 64 bits (com sinal, como o INTEGER do SQLite) dos valores de uma linha."""
+    data = "\x1f".join(str(v) for v in values).encode('utf-8', 'surrogatepass')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big', signed=True)
+
+def make_key(*parts) -> str:
+    return KEY_SEPARATOR.join(str(p) for p in parts)
+
+def split_key(chave: str, parts: int) -> list[str]:
+    return chave.split(KEY_SEPARATOR, parts - 1)
+
+def key_scope(chave: str, scope_from: int) -> str:
+    """Partes da chave a partir da posição `scope_from` (ex.: 'ano|cidade' de 'sq|ano|cidade' com scope_from=1)."""
+    return chave.split(KEY_SEPARATOR, scope_from)[-1]
+
+class ImportLedgerRepository:
+    """
+    Registro do conteúdo já importado de cada arquivo do TSE (tabelas import_ledger_*), usado nas
+    importações incrementais.
+
+    Cada arquivo de origem é identificado por (tipo, fonte), em que `fonte` é o nome do arquivo: o TSE
+    republica as correções com o mesmo nome. Um arquivo com o mesmo hash do último importado é ignorado;
+    nos demais, só as linhas cujo digest mudou (ou cuja chave natural é nova) são processadas, e as
+    chaves que sumiram do arquivo são removidas. Os métodos de escrita usam `pool.writer()` e não
+    tratam sqlite3.Error, para que a falha desfaça o bloco de dados gravado na mesma transação.
+    """
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
+
+    def get_file(self, tipo: str, fonte: str) -> dict | None:
+        try:
+            cursor = self.pool.reader().cursor()
+            cursor.execute("SELECT * FROM import_ledger_arquivos WHERE tipo = ? AND fonte = ?", (tipo, fonte))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao consultar o registro de importação de '{fonte}': {e}", exc_info=True)
+            return None
+
+    def load_digests(self, tipo: str, fonte: str) -> dict[str, int]:
+        """Retorna {chave: digest} da última importação do arquivo (vazio na primeira importação)."""
+        cursor = self.pool.reader().cursor()
+        cursor.execute("SELECT chave, digest FROM import_ledger_linhas WHERE tipo = ? AND fonte = ?", (tipo, fonte))
+        return {chave: digest for chave, digest in cursor}
+
+    def record_rows(self, tipo: str, fonte: str, id_job: int, rows):
+        """Grava (chave, digest) das linhas vistas nesta importação, marcando-as com `id_job`."""
+        with self.pool.writer() as conn:
+            conn.executemany(
+                """INSERT INTO import_ledger_linhas (tipo, fonte, chave, digest, id_job) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (tipo, fonte, chave) DO UPDATE SET digest = excluded.digest, id_job = excluded.id_job""",
+                ((tipo, fonte, chave, digest, id_job) for chave, digest in rows)
+            )
+
+    def stale_keys(self, tipo: str, fonte: str, id_job: int, scope_from: int | None = None) -> list[str]:
+        """
+        Chaves registradas que não apareceram na importação `id_job` (lidas pela conexão de escrita, dentro da transação).
+        Com `scope_from`, só contam as chaves cujo escopo (key_scope, ex.: ano|cidade) aparece em alguma chave desta
+        importação: como a fonte é só o nome do arquivo, outro arquivo com o mesmo nome (de outro ano ou município)
+        não remove o que não traz.
+        """
+        with self.pool.writer() as conn:
+            if scope_from is None:
+                cursor = conn.execute("SELECT chave FROM import_ledger_linhas WHERE tipo = ? AND fonte = ? AND id_job IS NOT ?", (tipo, fonte, id_job))
+                return [row[0] for row in cursor.fetchall()]
+            cursor = conn.execute("SELECT chave, id_job FROM import_ledger_linhas WHERE tipo = ? AND fonte = ?", (tipo, fonte))
+            rows = cursor.fetchall()
+        escopos = {key_scope(chave, scope_from) for chave, job in rows if job == id_job}
+        return [chave for chave, job in rows if job != id_job and key_scope(chave, scope_from) in escopos]
+
+    def drop_rows(self, tipo: str, fonte: str, chaves: list[str]):
+        with self.pool.writer() as conn:
+            conn.executemany("DELETE FROM import_ledger_linhas WHERE tipo = ? AND fonte = ? AND chave = ?", ((tipo, fonte, c) for c in chaves))
+
+    def complete_file(self, tipo: str, fonte: str, file_hash: str, fingerprint: str, linhas: int):
+        with self.pool.writer() as conn:
+            conn.execute(
+                """INSERT INTO import_ledger_arquivos (tipo, fonte, file_hash, fingerprint, linhas, data_importacao) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                   ON CONFLICT (tipo, fonte) DO UPDATE SET file_hash = excluded.file_hash, fingerprint = excluded.fingerprint,
+                   linhas = excluded.linhas, data_importacao = excluded.data_importacao""",
+                (tipo, fonte, file_hash, fingerprint, linhas)
+            )
+
+    def forget(self, tipo: str, fonte: str) -> bool:
+        """Esquece o arquivo: a próxima importação processa todas as linhas (e não remove nada)."""
+        try:
+            with self.pool.writer() as conn:
+                conn.execute("DELETE FROM import_ledger_linhas WHERE tipo = ? AND fonte = ?", (tipo, fonte))
+                conn.execute("DELETE FROM import_ledger_arquivos WHERE tipo = ? AND fonte = ?", (tipo, fonte))
+            logging.info(f"Registro de importação de '{fonte}' ({tipo}) descartado; a próxima importação será completa.")
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao descartar o registro de importação de '{fonte}': {e}", exc_info=True)
+            return False
\ No newline at end of file
@@ -5,149 +5,280 @@ from collections import defaultdict
 import re
 import os
 
-from functions import data_helpers
+import config
+from functions import data_helpers, csv_stream, zip_source, dedup_engine, fuzzy_dedup
+from dto.merge_plan import MergePlan
+from . import votacao_aggregator, eleitorado_aggregator, cadastral_reader, batch_import, import_job_repository, import_ledger_repository, merge_executor
+from .import_job_repository import ImportJobRepository
+from .import_ledger_repository import ImportLedgerRepository
+from .reference_cache import ReferenceDataCache
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .person_repository import PersonRepository
     from .misc_repository import MiscRepository
+    from .connection_pool import ConnectionPool
 
 class ImportService:
-    def __init__(self, conn: sqlite3.Connection, person_repo: 'PersonRepository', misc_repo: 'MiscRepository'):
-        self.conn = conn
+    def __init__(self, pool: 'ConnectionPool', person_repo: 'PersonRepository', misc_repo: 'MiscRepository', reference_cache: ReferenceDataCache | None = None):
+        self.pool = pool
         self.person_repo = person_repo
         self.misc_repo = misc_repo
+        self.reference_cache = reference_cache or ReferenceDataCache(pool, misc_repo)
+        self.job_repo = ImportJobRepository(pool)
+        self.ledger_repo = ImportLedgerRepository(pool)
 
-    def _get_or_create_lookup_id(self, cursor, table_name, value_name, cache: dict):
-        if not value_name: return None
-        if value_name in cache:
-            return cache[value_name]
-        
-        cursor.execute(f"INSERT OR IGNORE INTO {table_name} (nome) VALUES (?)", (value_name,))
-        if cursor.rowcount > 0:
-            new_id = cursor.lastrowid
-            cache[value_name] = new_id
-            return new_id
-        else:
-            cursor.execute(f"SELECT id FROM {table_name} WHERE nome = ?", (value_name,))
-            res = cursor.fetchone()
-            if res:
-                cache[value_name] = res['id']
-                return res['id']
-        return None
-
-    def importar_csv_eleicao(self, filepath: str, progress_win):
-        try:
-            class InterruptedError(Exception): pass
-
-            progress_win.after(0, lambda: progress_win.update_progress("Fase 1/3: Lendo e agregando votos do arquivo CSV...", 0.0))
-            
-            with open(filepath, 'r', encoding='latin-1', buffering=1024*1024) as f:
-                total_rows = sum(1 for _ in f) - 1
+    def _import_workers(self) -> int:
+        """Número de processos da agregação do CSV de votação: app_settings 'import_workers' > config.IMPORT_WORKERS > núcleos."""
+        setting = self.misc_repo.get_app_setting("import_workers") if self.misc_repo else None
+        return data_helpers.safe_int(setting) or config.IMPORT_WORKERS or os.cpu_count() or 1
 
-            if progress_win.stop_event.is_set(): raise InterruptedError
+    # --- Importações retomáveis ---
+    CANCEL_RESUMABLE_MSG = "Importação interrompida. O progresso foi salvo e será retomado ao importar o mesmo arquivo novamente."
 
-            votos_agregados = defaultdict(lambda: defaultdict(int))
-            candidato_info_cache_csv = {}
-            ano_eleicao_arquivo = None
-
-            with open(filepath, 'r', encoding='latin-1', buffering=1024*1024) as f:
-                reader = csv.DictReader(f, delimiter=';')
-                header = [h.strip().upper().replace('"', '') for h in reader.fieldnames]
-                reader.fieldnames = header
-                col_keys = [k.replace('"', '') for k in header]
-
-                for i, row in enumerate(reader):
-                    if i > 0 and i % 50000 == 0:
-                        if progress_win.stop_event.is_set(): raise InterruptedError
-                        progress = (i / total_rows) * 0.4 if total_rows > 0 else 0
-                        progress_win.after(0, lambda r=i, t=total_rows, p=progress: progress_win.update_progress(f"Lendo linha {r:,} de {t:,}", p))
-
-                    values = [v.strip().replace('"', '') if v else '' for v in row.values()]
-                    norm_row = dict(zip(col_keys, values))
-
-                    sq_cand = norm_row.get('SQ_CANDIDATO')
-                    cidade_original = norm_row.get('NM_MUNICIPIO')
-                    cidade_key = data_helpers.normalize_city_key(cidade_original) if cidade_original else ''
-                    if not ano_eleicao_arquivo: ano_eleicao_arquivo = data_helpers.safe_int(norm_row.get('ANO_ELEICAO'))
-                    if not sq_cand or not cidade_key: continue
-
-                    if sq_cand not in candidato_info_cache_csv:
-                        candidato_info_cache_csv[sq_cand] = {'cargo': norm_row.get('DS_CARGO'),'ano': ano_eleicao_arquivo}
-                    votos_agregados[sq_cand][cidade_key] += data_helpers.safe_int(norm_row.get('QT_VOTOS_NOMINAIS'))
-
-            with self.conn:
-                cursor = self.conn.cursor()
-                cursor.execute("PRAGMA foreign_keys = OFF")
-                
-                progress_win.after(0, lambda: progress_win.update_progress("Fase 2/3: Processando e salvando dados no banco...", 0.4))
-                
-                cursor.execute("SELECT sq_candidato, cargo FROM candidaturas WHERE ano_eleicao = ?", (ano_eleicao_arquivo,))
-                cargos_cache = {row['sq_candidato']: row['cargo'] for row in cursor.fetchall()}
-                total_candidatos = len(votos_agregados)
-
-                insert_votos_municipio_buffer = []
-                update_votos_candidatura_municipal_buffer = []
-                # --- NOVO: Guarda os candidatos que precisam da atualização final ---
-                federal_state_sq_cands = set()
-
-                for idx, (sq_cand, cidades_votos_map) in enumerate(votos_agregados.items()):
-                    if idx > 0 and idx % 1000 == 0:
-                        if progress_win.stop_event.is_set(): raise InterruptedError
-                        progress = 0.4 + (idx / total_candidatos) * 0.4
-                        progress_win.after(0, lambda i=idx, t=total_candidatos, p=progress: progress_win.update_progress(f"Processando candidato {i}/{t}", p))
+    def get_resumable_job(self, tipo: str, filepath: str) -> dict | None:
+        """Retorna a importação interrompida de `tipo` (nome do método) para este arquivo, se houver."""
+        try:
+            return self.job_repo.find_open_job(tipo, import_job_repository.file_fingerprint(filepath))
+        except OSError as e:
+            logging.warning(f"Não foi possível ler o arquivo '{filepath}' para verificar importações pendentes: {e}")
+            return None
+
+    def discard_import_job(self, id_job: int) -> bool:
+        return self.job_repo.discard_job(id_job)
+
+    def _open_job(self, tipo: str, filepath: str, fase: str, initial_checkpoint) -> dict:
+        """Retoma a importação em andamento deste arquivo ou cria uma nova. `initial_checkpoint` só é chamado para jobs novos."""
+        fingerprint = import_job_repository.file_fingerprint(filepath)
+        job = self.job_repo.find_open_job(tipo, fingerprint)
+        if job:
+            logging.info(f"Retomando a importação '{tipo}' (job {job['id_job']}) na fase '{job['fase']}', {job['progresso']:.0%} concluída.")
+            return job
+        checkpoint = initial_checkpoint()
+        id_job = self.job_repo.create_job(tipo, filepath, fingerprint, fase, csv_stream.source_size(filepath), checkpoint)
+        return {'id_job': id_job, 'fase': fase, 'byte_offset': 0, 'checkpoint': checkpoint, 'progresso': 0.0}
+
+    # --- Importações incrementais ---
+    def get_imported_file(self, tipo: str, filepath: str) -> dict | None:
+        """Retorna o registro da última importação deste arquivo se ele parecer inalterado (pela impressão digital, sem ler o arquivo inteiro)."""
+        try:
+            entry = self.ledger_repo.get_file(tipo, os.path.basename(filepath))
+            return entry if entry and entry['fingerprint'] == import_job_repository.file_fingerprint(filepath) else None
+        except OSError as e:
+            logging.warning(f"Não foi possível ler o arquivo '{filepath}' para compará-lo com a última importação: {e}")
+            return None
+
+    def forget_imported_file(self, tipo: str, filepath: str) -> bool:
+        return self.ledger_repo.forget(tipo, os.path.basename(filepath))
+
+    def _unchanged_file(self, tipo: str, filepath: str) -> tuple[str, str, dict | None]:
+        """Retorna (fonte, hash do arquivo, registro da última importação se o conteúdo for idêntico)."""
+        fonte = os.path.basename(filepath)
+        hash_arquivo = import_ledger_repository.file_hash(filepath)
+        entry = self.ledger_repo.get_file(tipo, fonte)
+        return fonte, hash_arquivo, (entry if entry and entry['file_hash'] == hash_arquivo else None)
+
+    @staticmethod
+    def _unchanged_msg(entry: dict) -> str:
+        return f"Nenhuma alteração: o arquivo '{entry['fonte']}' é idêntico ao importado em {entry['data_importacao']}."
+
+    # --- Votação ---
+    def _save_votos_parciais(self, id_job: int, faixa: int, partial):
+        totais, cargos, _ = partial
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM import_votos_parciais WHERE id_job = ? AND faixa = ?", (id_job, faixa))
+            conn.executemany(
+                "INSERT INTO import_votos_parciais (id_job, faixa, seq, sq_candidato, cidade, votos, cargo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((id_job, faixa, seq, sq_cand, cidade, votos, cargos.get(sq_cand)) for seq, ((sq_cand, cidade), votos) in enumerate(totais.items()))
+            )
 
-                    cargo = cargos_cache.get(sq_cand) or (candidato_info_cache_csv.get(sq_cand, {}).get('cargo'))
-                    if not cargo: continue
+    def _load_votos_parciais(self, id_job: int, anos: dict) -> list:
+        """Remonta os parciais gravados, na ordem das faixas, no formato de votacao_aggregator.aggregate_range."""
+        cursor = self.pool.reader().cursor()
+        cursor.execute("SELECT faixa, sq_candidato, cidade, votos, cargo FROM import_votos_parciais WHERE id_job = ? ORDER BY faixa, seq", (id_job,))
+        partials = {}
+        for row in cursor:
+            totais, cargos, _ = partials.setdefault(row['faixa'], ({}, {}, anos.get(str(row['faixa']))))
+            totais[(row['sq_candidato'], row['cidade'])] = row['votos']
+            if row['sq_candidato'] not in cargos: cargos[row['sq_candidato']] = row['cargo']
+        return [partials[faixa] for faixa in sorted(partials)]
+
+    CARGOS_VOTOS_POR_MUNICIPIO = ('PRESIDENTE', 'VICE-PRESIDENTE', 'SENADOR', 'DEPUTADO FEDERAL', 'DEPUTADO ESTADUAL', 'DEPUTADO DISTRITAL')
+
+    def _stage_votos_agregados(self, cursor, votos_agregados: dict, candidato_info: dict, ano_eleicao: int) -> int:
+        """
+        Grava os votos agregados do CSV numa tabela TEMP (staging_votos), com um único executemany.
+        `federal` marca os cargos cujos votos ficam por município; `ordem` preserva a ordem em que as
+        cidades de cada candidato apareceram no arquivo (a primeira é a cidade da candidatura municipal).
+        """
+        cursor.execute("DROP TABLE IF EXISTS temp.staging_votos")
+        cursor.execute("CREATE TEMP TABLE staging_votos (sq_candidato TEXT NOT NULL, cidade TEXT NOT NULL, votos INTEGER NOT NULL, ordem INTEGER NOT NULL, federal INTEGER NOT NULL)")
+
+        cursor.execute("SELECT sq_candidato, cargo FROM candidaturas WHERE ano_eleicao = ?", (ano_eleicao,))
+        cargos_cache = {row['sq_candidato']: row['cargo'] for row in cursor.fetchall()}
+
+        def staged_rows():
+            for sq_cand, cidades_votos_map in votos_agregados.items():
+                cargo = cargos_cache.get(sq_cand) or candidato_info.get(sq_cand, {}).get('cargo')
+                if not cargo: continue
+                federal = 1 if cargo.upper() in self.CARGOS_VOTOS_POR_MUNICIPIO else 0
+                for ordem, (cidade, votos) in enumerate(cidades_votos_map.items()):
+                    yield (sq_cand, cidade, votos, ordem, federal)
+
+        cursor.executemany("INSERT INTO staging_votos (sq_candidato, cidade, votos, ordem, federal) VALUES (?, ?, ?, ?, ?)", staged_rows())
+        staged = cursor.execute("SELECT COUNT(*) FROM staging_votos").fetchone()[0]
+        cursor.execute("CREATE INDEX temp.idx_staging_votos_federal ON staging_votos (federal, sq_candidato)")
+        return staged
+
+    def _diff_votos_ledger(self, digests: dict, votos_agregados: dict, candidato_info: dict, ano_eleicao: int):
+        """
+        Compara os votos agregados com o registro da última importação do arquivo (chave sq|ano|cidade).
+        Retorna (votos a aplicar, municípios removidos, linhas novas/alteradas do registro, chaves removidas).
+        Os totais são por candidato, então um candidato com qualquer município novo, alterado ou removido é
+        reaplicado inteiro; os municípios removidos entram com 0 votos, depois da ordem do arquivo.
+        """
+        vistas = set()
+        alteradas = []
+        candidatos = set()
+        for sq_cand, cidades_votos_map in votos_agregados.items():
+            cargo = candidato_info.get(sq_cand, {}).get('cargo')
+            for cidade, votos in cidades_votos_map.items():
+                chave = import_ledger_repository.make_key(sq_cand, ano_eleicao, cidade)
+                vistas.add(chave)
+                digest = import_ledger_repository.row_digest((votos, cargo))
+                if digests.get(chave) != digest:
+                    alteradas.append((chave, digest))
+                    candidatos.add(sq_cand)
+
+        aplicar = {sq_cand: dict(votos_agregados[sq_cand]) for sq_cand in candidatos}
+        removidas = [chave for chave in digests if chave not in vistas]
+        municipios_removidos = []
+        for chave in removidas:
+            sq_cand, ano, cidade = import_ledger_repository.split_key(chave, 3)
+            # Chaves de outra eleição (arquivo de mesmo nome reaproveitado) só saem do registro
+            if data_helpers.safe_int(ano) != ano_eleicao: continue
+            aplicar.setdefault(sq_cand, dict(votos_agregados.get(sq_cand, {}))).setdefault(cidade, 0)
+            municipios_removidos.append((sq_cand, ano_eleicao, cidade))
+        return aplicar, municipios_removidos, alteradas, removidas
+
+    def _apply_staged_votos(self, cursor, ano_eleicao: int, report, stop_event, interrupted_error):
+        """Aplica staging_votos ao banco com três comandos: upsert em votos_por_municipio e os dois totais de candidaturas.votos."""
+        # Cargos federais/estaduais: votos por município ("WHERE" é obrigatório antes de ON CONFLICT num INSERT ... SELECT)
+        cursor.execute("""
+            INSERT INTO votos_por_municipio (sq_candidato, ano_eleicao, cidade, votos)
+            SELECT sq_candidato, ?, cidade, votos FROM staging_votos WHERE federal = 1
+            ON CONFLICT (sq_candidato, ano_eleicao, cidade) DO UPDATE SET votos = excluded.votos
+        """, (ano_eleicao,))
+
+        # Cargos municipais: o total vai direto para a candidatura na (única) cidade em que o candidato concorreu
+        cursor.execute("""
+            UPDATE candidaturas SET votos = t.total
+            FROM (SELECT sq_candidato, SUM(votos) AS total, MAX(CASE WHEN ordem = 0 THEN cidade END) AS cidade
+                  FROM staging_votos WHERE federal = 0 GROUP BY sq_candidato) AS t
+            WHERE candidaturas.sq_candidato = t.sq_candidato AND candidaturas.cidade = t.cidade
+        """)
+
+        report("Fase 3/3: Consolidando totais de votos...", 0.85)
+        if stop_event.is_set(): raise interrupted_error
+
+        # Cargos federais/estaduais: total = soma de todos os municípios já gravados (inclusive de importações anteriores)
+        cursor.execute("""
+            UPDATE candidaturas SET votos = t.total
+            FROM (SELECT v.sq_candidato, SUM(v.votos) AS total FROM votos_por_municipio v
+                  WHERE v.sq_candidato IN (SELECT sq_candidato FROM staging_votos WHERE federal = 1)
+                  GROUP BY v.sq_candidato) AS t
+            WHERE candidaturas.sq_candidato = t.sq_candidato AND candidaturas.ano_eleicao = ?
+        """, (ano_eleicao,))
+
+    def _finish_votacao(self, filepath: str, fonte: str, hash_arquivo: str, id_job: int, agregado: tuple, report, stop_event, interrupted_error) -> tuple[bool, int, int]:
+        """
+        Grava os votos agregados do arquivo (`agregado` no formato de votacao_aggregator.merge_partials).
+        `report(mensagem, fração)` recebe o andamento. Retorna (importação incremental, candidatos com votos
+        aplicados, totais por município removidos).
+        """
+        tipo = "importar_csv_eleicao"
+        votos_agregados, candidato_info_cache_csv, ano_eleicao_arquivo = agregado
+
+        # Só os candidatos com votos novos, alterados ou removidos desde a última importação deste arquivo
+        digests = self.ledger_repo.load_digests(tipo, fonte)
+        votos_aplicar, municipios_removidos, linhas_alteradas, chaves_removidas = self._diff_votos_ledger(
+            digests, votos_agregados, candidato_info_cache_csv, ano_eleicao_arquivo)
+
+        # Finalização: votos por município, totais, registro do conteúdo e conclusão do job numa única transação (refazê-la é inofensivo)
+        with self.pool.foreign_keys_disabled(), self.pool.writer() as conn:
+            cursor = conn.cursor()
+            report("Fase 2/3: Processando e salvando dados no banco...", 0.4)
+            total_staged = self._stage_votos_agregados(cursor, votos_aplicar, candidato_info_cache_csv, ano_eleicao_arquivo)
+            if stop_event.is_set(): raise interrupted_error
+
+            report(f"Fase 2/3: Gravando {total_staged:,} totais por município...", 0.6)
+            self._apply_staged_votos(cursor, ano_eleicao_arquivo, report, stop_event, interrupted_error)
+            cursor.execute("DROP TABLE IF EXISTS temp.staging_votos")
+            # Os totais já foram recalculados com 0 nos municípios removidos; agora as linhas saem da tabela
+            cursor.executemany("DELETE FROM votos_por_municipio WHERE sq_candidato = ? AND ano_eleicao = ? AND cidade = ?", municipios_removidos)
+
+            self.ledger_repo.record_rows(tipo, fonte, id_job, linhas_alteradas)
+            self.ledger_repo.drop_rows(tipo, fonte, chaves_removidas)
+            self.ledger_repo.complete_file(tipo, fonte, hash_arquivo, import_job_repository.file_fingerprint(filepath),
+                                           sum(len(cidades) for cidades in votos_agregados.values()))
+            self.job_repo.complete_job(id_job)
+        return bool(digests), len(votos_aplicar), len(chaves_removidas)
 
-                    is_federal_or_state = cargo.upper() in ['PRESIDENTE', 'VICE-PRESIDENTE', 'SENADOR', 'DEPUTADO FEDERAL', 'DEPUTADO ESTADUAL', 'DEPUTADO DISTRITAL']
-                    
-                    if is_federal_or_state:
-                        ano = candidato_info_cache_csv[sq_cand]['ano']
-                        insert_votos_municipio_buffer.extend([(sq_cand, ano, cidade, votos) for cidade, votos in cidades_votos_map.items()])
-                        federal_state_sq_cands.add(sq_cand) # Adiciona à lista de alvos
-                    else:
-                        # Para candidatos municipais, o total de votos é a soma na única cidade
-                        total_votos_municipal = sum(cidades_votos_map.values())
-                        # Assume-se que um candidato municipal só concorre em uma cidade
-                        cidade_candidatura = next(iter(cidades_votos_map.keys()))
-                        update_votos_candidatura_municipal_buffer.append((total_votos_municipal, sq_cand, cidade_candidatura))
-
-                if insert_votos_municipio_buffer:
-                    cursor.executemany("INSERT OR REPLACE INTO votos_por_municipio (sq_candidato, ano_eleicao, cidade, votos) VALUES (?, ?, ?, ?)", insert_votos_municipio_buffer)
-                
-                if update_votos_candidatura_municipal_buffer:
-                    cursor.executemany("UPDATE candidaturas SET votos = ? WHERE sq_candidato = ? AND cidade = ?", update_votos_candidatura_municipal_buffer)
+    def importar_csv_eleicao(self, filepath: str, progress_win):
+        try:
+            class InterruptedError(Exception): pass
 
-                # --- FASE FINAL: Atualização focada e correta ---
-                progress_win.after(0, lambda: progress_win.update_progress("Fase 3/3: Consolidando totais de votos...", 0.85))
-                if progress_win.stop_event.is_set(): raise InterruptedError
+            tipo = "importar_csv_eleicao"
+            progress_win.after(0, lambda: progress_win.update_progress("Verificando alterações no arquivo...", 0.0))
+            fonte, hash_arquivo, inalterado = self._unchanged_file(tipo, filepath)
+            if inalterado:
+                progress_win.after(0, lambda: progress_win.operation_finished(self._unchanged_msg(inalterado)))
+                return
 
-                if federal_state_sq_cands:
-                    params = list(federal_state_sq_cands)
-                    update_totals_buffer = []
-                    for sq_cand in params:
-                        cursor.execute("SELECT SUM(votos) FROM votos_por_municipio WHERE sq_candidato = ?", (sq_cand,))
-                        total_votos = cursor.fetchone()[0] or 0
-                        update_totals_buffer.append((total_votos, sq_cand, ano_eleicao_arquivo))
-
-                    if update_totals_buffer:
-                        cursor.executemany(
-                            "UPDATE candidaturas SET votos = ? WHERE sq_candidato = ? AND ano_eleicao = ?",
-                            update_totals_buffer
-                        )
-                
-                cursor.execute("PRAGMA foreign_keys = ON")
+            progress_win.after(0, lambda: progress_win.update_progress("Fase 1/3: Lendo e agregando votos do arquivo CSV...", 0.0))
 
-            progress_win.after(0, lambda: progress_win.operation_finished("Importação de votos concluída com sucesso!"))
+            workers = self._import_workers()
+            job = self._open_job(tipo, filepath, "agregacao", lambda: {
+                'faixas': votacao_aggregator.plan_ranges(filepath, workers), 'faixas_concluidas': [], 'anos': {}})
+            id_job, checkpoint = job['id_job'], job['checkpoint']
+            ranges = [tuple(r) for r in checkpoint['faixas']]
+            done = set(checkpoint['faixas_concluidas'])
+
+            def on_range_done(index, partial):
+                # Parcial da faixa + checkpoint do job na mesma transação
+                done.add(index)
+                checkpoint['faixas_concluidas'] = sorted(done)
+                checkpoint['anos'][str(index)] = partial[2]
+                with self.pool.writer():
+                    self._save_votos_parciais(id_job, index, partial)
+                    self.job_repo.checkpoint(id_job, "agregacao", sum(ranges[i][1] - ranges[i][0] for i in done), checkpoint)
+
+            def on_progress(bytes_read, total_bytes):
+                progress_win.after(0, lambda b=bytes_read, t=total_bytes: progress_win.update_progress(
+                    f"Lendo arquivo: {b / 1048576:,.0f} de {t / 1048576:,.0f} MB", (b / t) * 0.4 if t else 0))
+
+            if not votacao_aggregator.aggregate_ranges(filepath, ranges, workers, progress_win.stop_event, on_range_done, on_progress, done):
+                raise InterruptedError
+
+            partials = self._load_votos_parciais(id_job, checkpoint['anos'])
+            report = lambda msg, frac: progress_win.after(0, lambda: progress_win.update_progress(msg, frac))
+            incremental, candidatos, removidas = self._finish_votacao(
+                filepath, fonte, hash_arquivo, id_job, votacao_aggregator.merge_partials(partials), report, progress_win.stop_event, InterruptedError)
+
+            success_msg = "Importação de votos concluída com sucesso!"
+            if incremental:
+                success_msg += (f"\n- {candidatos} candidatos com votos alterados (importação incremental)."
+                                f"\n- {removidas} totais por município removidos.")
+            progress_win.after(0, lambda: progress_win.operation_finished(success_msg))
         
         except InterruptedError:
-            progress_win.after(0, lambda: progress_win.operation_finished("", "Importação cancelada pelo usuário."))
+            progress_win.after(0, lambda: progress_win.operation_finished("", self.CANCEL_RESUMABLE_MSG))
         except Exception as e:
-            try: cursor.execute("PRAGMA foreign_keys = ON")
-            except: pass
             logging.error(f"Erro durante a importação do CSV de votação: {e}", exc_info=True)
             progress_win.after(0, lambda err=e: progress_win.operation_finished("", f"Erro inesperado: {err}"))
+        finally:
+            # Anos e cidades das candidaturas podem ter mudado
+            self.reference_cache.invalidate()
 
 
     # def importar_csv_eleicao(self, filepath: str, progress_win):
@@ -238,159 +369,240 @@ class ImportService:
     #         logging.error(f"Erro durante a importação do CSV de votação: {e}", exc_info=True)
     #         progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro inesperado durante a importação: {e}"))
 
+    # Colunas do CSV cadastral usadas na gravação (as demais só entram no digest do registro de importação)
+    CADASTRAL_COLUMNS = ('NR_TITULO_ELEITORAL_CANDIDATO', 'NR_CPF_CANDIDATO', 'NM_CANDIDATO', 'DT_NASCIMENTO', 'NM_URNA_CANDIDATO', 'DS_GENERO',
+                         'DS_EMAIL', 'DS_OCUPACAO', 'DS_GRAU_INSTRUCAO', 'NM_UE', 'ANO_ELEICAO', 'SQ_CANDIDATO', 'NR_CANDIDATO', 'SG_PARTIDO',
+                         'DS_CARGO', 'SG_UF', 'DS_SIT_TOT_TURNO')
+    # Colunas de pessoas que a importação só preenche quando estão vazias, com a coluna de origem no CSV
+    CADASTRAL_ENRICH_COLUMNS = (('cpf', 'NR_CPF_CANDIDATO'), ('titulo_eleitor', 'NR_TITULO_ELEITORAL_CANDIDATO'), ('email', 'DS_EMAIL'))
+    PESSOA_INSERT_COLUMNS = ('id_pessoa', 'nome', 'apelido', 'cpf', 'titulo_eleitor', 'data_nascimento', 'genero', 'email', 'id_profissao', 'id_escolaridade')
+    CANDIDATURA_INSERT_COLUMNS = ('id_pessoa', 'ano_eleicao', 'sq_candidato', 'nome_urna', 'numero_urna', 'partido', 'cargo', 'cidade', 'uf', 'situacao')
+
+    def _load_cadastral_state(self) -> dict:
+        """
+        Mapas compactos para localizar as pessoas do CSV cadastral: titulo -> id, cpf -> id, nome_nascimento -> id
+        e, para quem tem alguma coluna de CADASTRAL_ENRICH_COLUMNS vazia, id -> máscara de bits dessas colunas.
+        As linhas são percorridas pelo cursor, sem carregar a tabela inteira em dicionários.
+        """
+        titulo_map, cpf_map, nome_nasc_map, vazios = {}, {}, {}, {}
+        cursor = self.pool.reader().cursor()
+        cursor.execute("SELECT id_pessoa, nome, data_nascimento, cpf, titulo_eleitor, email FROM pessoas")
+        for id_pessoa, nome, nasc, cpf, titulo, email in cursor:
+            if titulo: titulo_map[titulo] = id_pessoa
+            if cpf: cpf_map[cpf] = id_pessoa
+            if nome and nasc: nome_nasc_map[f"{nome}_{nasc}"] = id_pessoa
+            mask = (not cpf) | (not titulo) << 1 | (not email) << 2
+            if mask: vazios[id_pessoa] = mask
+        return {'titulo': titulo_map, 'cpf': cpf_map, 'nome_nasc': nome_nasc_map, 'vazios': vazios}
+
+    @staticmethod
+    def _next_id(cursor, table_name: str, id_col: str) -> int:
+        """Primeiro id livre da tabela, respeitando o AUTOINCREMENT (ids de registros apagados não são reutilizados)."""
+        cursor.execute(f"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0), COALESCE(MAX({id_col}), 0)) + 1 FROM {table_name}", (table_name,))
+        return cursor.fetchone()[0]
+
+    def _process_cadastral_rows(self, cursor, rows: list[dict], state: dict) -> tuple[int, int, int]:
+        """
+        Grava um bloco de linhas do CSV cadastral (pessoas novas, enriquecimento das existentes e candidaturas).
+        `state` (de `_load_cadastral_state`) guarda os mapas de busca entre os blocos; profissões e escolaridades
+        novas são criadas de uma vez por bloco pelo ReferenceDataCache.
+        Os ids das pessoas novas são reservados no início do bloco (a escrita é exclusiva dentro da transação),
+        então inserções, atualizações e candidaturas são gravadas em lote com executemany.
+        Retorna (inseridas, atualizadas, candidaturas).
+        """
+        titulo_map, cpf_map, nome_nasc_map, vazios = state['titulo'], state['cpf'], state['nome_nasc'], state['vazios']
+        key_maps = {'cpf': cpf_map, 'titulo_eleitor': titulo_map}
+        pessoas_para_inserir = []
+        # Colunas alteradas -> [(valores..., id_pessoa)]: um executemany por combinação de colunas
+        pessoas_para_atualizar = defaultdict(list)
+        candidaturas_para_inserir = []
+        next_id = None
+        updates_count = 0
+
+        for norm_row in rows:
+            titulo_csv = norm_row.get('NR_TITULO_ELEITORAL_CANDIDATO') or None
+            cpf_csv = norm_row.get('NR_CPF_CANDIDATO') or None
+            nome_csv = norm_row.get('NM_CANDIDATO')
+            nasc_csv = norm_row.get('DT_NASCIMENTO')
+            
+            if not nome_csv: continue
+            
+            id_pessoa = None
+            if titulo_csv: id_pessoa = titulo_map.get(titulo_csv)
+            if not id_pessoa and cpf_csv: id_pessoa = cpf_map.get(cpf_csv)
+            if not id_pessoa and nome_csv and nasc_csv:
+                id_pessoa = nome_nasc_map.get(f"{nome_csv}_{nasc_csv}")
+
+            if not id_pessoa:
+                if next_id is None: next_id = self._next_id(cursor, 'pessoas', 'id_pessoa')
+                id_pessoa, next_id = next_id, next_id + 1
+                email_csv = norm_row.get('DS_EMAIL') or None
+                # Profissão e escolaridade ainda por nome; os ids são resolvidos em lote no fim do bloco
+                pessoas_para_inserir.append((
+                    id_pessoa, nome_csv, norm_row.get('NM_URNA_CANDIDATO'), cpf_csv, titulo_csv, nasc_csv, norm_row.get('DS_GENERO'), email_csv,
+                    norm_row.get('DS_OCUPACAO'), norm_row.get('DS_GRAU_INSTRUCAO'),
+                ))
+                # Atualiza os mapas em memória para evitar duplicatas dentro do mesmo arquivo
+                if titulo_csv: titulo_map[titulo_csv] = id_pessoa
+                if cpf_csv: cpf_map[cpf_csv] = id_pessoa
+                if nome_csv and nasc_csv: nome_nasc_map[f"{nome_csv}_{nasc_csv}"] = id_pessoa
+                mask = (not cpf_csv) | (not titulo_csv) << 1 | (not email_csv) << 2
+                if mask: vazios[id_pessoa] = mask
+            elif mask := vazios.get(id_pessoa):
+                # Só preenche colunas vazias; CPF/título que já pertencem a outra pessoa não são copiados
+                colunas, valores = [], []
+                for bit, (col, csv_col) in enumerate(self.CADASTRAL_ENRICH_COLUMNS):
+                    valor = norm_row.get(csv_col)
+                    if not (mask >> bit) & 1 or not valor or valor in key_maps.get(col, ()): continue
+                    colunas.append(col); valores.append(valor)
+                    mask &= ~(1 << bit)
+                    if col in key_maps: key_maps[col][valor] = id_pessoa
+                if colunas:
+                    pessoas_para_atualizar[tuple(colunas)].append((*valores, id_pessoa))
+                    updates_count += 1
+                    if mask: vazios[id_pessoa] = mask
+                    else: del vazios[id_pessoa]
+
+            candidaturas_para_inserir.append((
+                id_pessoa, data_helpers.safe_int(norm_row.get('ANO_ELEICAO')), norm_row.get('SQ_CANDIDATO'),
+                norm_row.get('NM_URNA_CANDIDATO'), norm_row.get('NR_CANDIDATO'), norm_row.get('SG_PARTIDO'), norm_row.get('DS_CARGO'),
+                data_helpers.normalize_city_key(norm_row.get('NM_UE')), norm_row.get('SG_UF'), norm_row.get('DS_SIT_TOT_TURNO'),
+            ))
+
+        if pessoas_para_inserir:
+            profissao_ids = self.reference_cache.get_or_create_ids(cursor, 'profissoes', (p[8] for p in pessoas_para_inserir))
+            escolaridade_ids = self.reference_cache.get_or_create_ids(cursor, 'escolaridades', (p[9] for p in pessoas_para_inserir))
+            pessoas_para_inserir = [(*p[:8], profissao_ids.get(p[8]), escolaridade_ids.get(p[9])) for p in pessoas_para_inserir]
+            cursor.executemany(f"INSERT INTO pessoas ({', '.join(self.PESSOA_INSERT_COLUMNS)}) VALUES ({', '.join(['?'] * len(self.PESSOA_INSERT_COLUMNS))})",
+                               pessoas_para_inserir)
+        for colunas, params in pessoas_para_atualizar.items():
+            cursor.executemany(f"UPDATE pessoas SET {', '.join(f'{c} = ?' for c in colunas)} WHERE id_pessoa = ?", params)
+
+        if candidaturas_para_inserir:
+            # Linhas novas ou alteradas desde a última importação: os dados do TSE substituem os da candidatura existente (votos e pessoa são mantidos)
+            cursor.executemany(f"""INSERT INTO candidaturas ({', '.join(self.CANDIDATURA_INSERT_COLUMNS)}) VALUES ({', '.join(['?'] * len(self.CANDIDATURA_INSERT_COLUMNS))})
+                                   ON CONFLICT (sq_candidato, ano_eleicao, cidade) DO UPDATE SET nome_urna = excluded.nome_urna, numero_urna = excluded.numero_urna,
+                                   partido = excluded.partido, cargo = excluded.cargo, uf = excluded.uf, situacao = excluded.situacao""", candidaturas_para_inserir)
+
+        return len(pessoas_para_inserir), updates_count, len(candidaturas_para_inserir)
+
+    def _delete_candidaturas_by_key(self, cursor, chaves: list[str]) -> int:
+        """Remove as candidaturas (e seus votos por município) das chaves sq|ano|cidade do registro de importação."""
+        params = []
+        for chave in chaves:
+            sq_cand, ano, cidade = import_ledger_repository.split_key(chave, 3)
+            params.append((sq_cand, data_helpers.safe_int(ano), cidade))
+        if not params: return 0
+        cursor.executemany("DELETE FROM votos_por_municipio WHERE sq_candidato = ? AND ano_eleicao = ?", [(sq, ano) for sq, ano, _ in params])
+        cursor.executemany("DELETE FROM candidaturas WHERE sq_candidato = ? AND ano_eleicao = ? AND cidade = ?", params)
+        return cursor.rowcount
+
+    @staticmethod
+    def _cadastral_checkpoint(job: dict) -> dict:
+        return {'inseridos': 0, 'atualizados': 0, 'candidaturas': 0, 'linhas': 0, 'inalteradas': 0, 'removidas': 0, **job['checkpoint']}
+
+    def _write_cadastral_block(self, fonte: str, id_job: int, records: list, linhas: int, position: int, digests: dict, state: dict, checkpoint: dict):
+        """
+        Grava um bloco de cadastral_reader.iter_records e registra no job o checkpoint até `position`, na mesma
+        transação. Desliga as chaves estrangeiras só durante o bloco: entre um bloco e outro a conexão de escrita
+        fica livre para a interface e para a fila de geocodificação.
+        """
+        tipo = "importar_dados_cadastrais"
+        ledger_rows = []
+        norm_rows = []
+        for chave, digest, norm_row in records:
+            if chave is not None:
+                ledger_rows.append((chave, digest))
+                # Linha idêntica à da última importação: nada a gravar
+                if digests.get(chave) == digest: continue
+            norm_rows.append(norm_row)
+
+        with self.pool.foreign_keys_disabled(), self.pool.writer() as conn:
+            inseridos, atualizados, candidaturas = self._process_cadastral_rows(conn.cursor(), norm_rows, state)
+            checkpoint['inseridos'] += inseridos
+            checkpoint['atualizados'] += atualizados
+            checkpoint['candidaturas'] += candidaturas
+            checkpoint['linhas'] += linhas
+            checkpoint['inalteradas'] += linhas - len(norm_rows)
+            self.ledger_repo.record_rows(tipo, fonte, id_job, ledger_rows)
+            self.job_repo.checkpoint(id_job, "contatos", position, checkpoint)
+
+    def _finish_cadastral(self, filepath: str, fonte: str, hash_arquivo: str, id_job: int, checkpoint: dict, rebuild_recentes: bool = True):
+        """
+        Finalização idempotente: remove as candidaturas que saíram do arquivo, recalcula a última candidatura
+        de cada pessoa (se `rebuild_recentes`), registra o conteúdo importado e conclui o job na mesma transação.
+        Só saem as candidaturas de anos/municípios presentes no arquivo (escopo ano|cidade da chave), como na votação.
+        """
+        tipo = "importar_dados_cadastrais"
+        with self.pool.foreign_keys_disabled(), self.pool.writer() as conn:
+            chaves_removidas = self.ledger_repo.stale_keys(tipo, fonte, id_job, scope_from=1)
+            checkpoint['removidas'] = self._delete_candidaturas_by_key(conn.cursor(), chaves_removidas)
+            self.ledger_repo.drop_rows(tipo, fonte, chaves_removidas)
+            self.job_repo.checkpoint(id_job, "finalizacao", csv_stream.source_size(filepath), checkpoint)
+            if rebuild_recentes: self.person_repo._rebuild_candidaturas_recentes(conn.cursor())
+            self.ledger_repo.complete_file(tipo, fonte, hash_arquivo, import_job_repository.file_fingerprint(filepath), checkpoint['linhas'])
+            self.job_repo.complete_job(id_job)
+
+    @staticmethod
+    def _cadastral_summary(checkpoint: dict) -> str:
+        summary = (
+            f"- {checkpoint['inseridos']} novos contatos criados.\n"
+            f"- {checkpoint['atualizados']} contatos existentes atualizados.\n"
+            f"- {checkpoint['candidaturas']} candidaturas processadas."
+        )
+        if checkpoint['inalteradas'] or checkpoint['removidas']:
+            summary += (f"\n- {checkpoint['inalteradas']} linhas sem alteração desde a última importação."
+                        f"\n- {checkpoint['removidas']} candidaturas removidas do arquivo.")
+        return summary
+
     def importar_dados_cadastrais(self, filepath: str, progress_win):
         try:
             class InterruptedError(Exception): pass
-            
-            with self.conn:
-                cursor = self.conn.cursor()
 
-                progress_win.after(0, lambda: progress_win.update_progress("Fase 1/4: Carregando dados existentes...", 0.05))
-                # Otimização: Carrega todos os dados de uma vez para consulta em memória
-                cursor.execute("SELECT * FROM pessoas")
-                all_people_data = {row['id_pessoa']: dict(row) for row in cursor.fetchall()}
-                
-                # Cria mapas de lookup a partir dos dados em memória
-                titulo_map = {p['titulo_eleitor']: p['id_pessoa'] for p in all_people_data.values() if p.get('titulo_eleitor')}
-                cpf_map = {p['cpf']: p['id_pessoa'] for p in all_people_data.values() if p.get('cpf')}
-                nome_nasc_map = {f"{p['nome']}_{p['data_nascimento']}": p['id_pessoa'] for p in all_people_data.values() if p.get('nome') and p.get('data_nascimento')}
-
-                prof_cache = {row['nome']: row['id'] for row in self.misc_repo.get_lookup_table_data("profissoes")}
-                escol_cache = {row['nome']: row['id'] for row in self.misc_repo.get_lookup_table_data("escolaridades")}
-                
+            tipo = "importar_dados_cadastrais"
+            progress_win.after(0, lambda: progress_win.update_progress("Verificando alterações no arquivo...", 0.0))
+            fonte, hash_arquivo, inalterado = self._unchanged_file(tipo, filepath)
+            if inalterado:
+                progress_win.after(0, lambda: progress_win.operation_finished(self._unchanged_msg(inalterado)))
+                return
+
+            job = self._open_job(tipo, filepath, "contatos", dict)
+            id_job = job['id_job']
+            checkpoint = self._cadastral_checkpoint(job)
+            total_bytes = csv_stream.source_size(filepath) or 1
+            # Digest de cada linha da última importação deste arquivo, pela chave natural da candidatura
+            digests = self.ledger_repo.load_digests(tipo, fonte)
+
+            progress_win.after(0, lambda: progress_win.update_progress("Fase 1/3: Carregando dados existentes...", 0.05))
+            # Só os mapas de chave -> id ficam em memória (ao retomar, já incluem as pessoas dos blocos gravados)
+            state = self._load_cadastral_state()
+
+            if job['fase'] == "contatos":
+                start = job['byte_offset'] or None
+                # Cada bloco lido (até csv_stream.CHUNK_SIZE bytes) é gravado e registrado no job numa única transação
+                for records, position, linhas in cadastral_reader.iter_records(filepath, self.CADASTRAL_COLUMNS, start):
+                    if progress_win.stop_event.is_set(): raise InterruptedError
+                    self._write_cadastral_block(fonte, id_job, records, linhas, position, digests, state, checkpoint)
+                    progress_win.after(0, lambda p=position, c=checkpoint['candidaturas']: progress_win.update_progress(
+                        f"Fase 2/3: Processando contatos ({c:,} candidaturas gravadas)...", 0.1 + (p / total_bytes) * 0.75))
                 if progress_win.stop_event.is_set(): raise InterruptedError
 
-                progress_win.after(0, lambda: progress_win.update_progress("Fase 2/4: Lendo arquivo CSV...", 0.2))
-                with open(filepath, 'r', encoding='latin-1') as f:
-                    csv_data = list(csv.DictReader(f, delimiter=';'))
-                
-                pessoas_para_inserir = []
-                # --- NOVO: Lista para guardar as atualizações ---
-                pessoas_para_atualizar = []
-                candidaturas_para_inserir = []
-                
-                inserts_count = 0
-                updates_count = 0
-
-                total_rows = len(csv_data)
-                progress_win.after(0, lambda: progress_win.update_progress("Fase 3/4: Processando contatos...", 0.4))
-                
-                for i, row in enumerate(csv_data):
-                    if i > 0 and i % 500 == 0:
-                        if progress_win.stop_event.is_set(): raise InterruptedError
-                        progress = 0.4 + (i / total_rows) * 0.4
-                        progress_win.after(0, lambda p=progress, i=i, t=total_rows: progress_win.update_progress(f"Processando linha {i}/{t}", p))
-
-                    norm_row = data_helpers.normalize_csv_row(row)
-                    titulo_csv = norm_row.get('NR_TITULO_ELEITORAL_CANDIDATO') or None
-                    cpf_csv = norm_row.get('NR_CPF_CANDIDATO') or None
-                    nome_csv = norm_row.get('NM_CANDIDATO')
-                    nasc_csv = norm_row.get('DT_NASCIMENTO')
-                    
-                    if not nome_csv: continue
-                    
-                    id_pessoa = None
-                    if titulo_csv: id_pessoa = titulo_map.get(titulo_csv)
-                    if not id_pessoa and cpf_csv: id_pessoa = cpf_map.get(cpf_csv)
-                    if not id_pessoa and nome_csv and nasc_csv:
-                        composite_key = f"{nome_csv}_{nasc_csv}"
-                        id_pessoa = nome_nasc_map.get(composite_key)
-
-                    id_pessoa_ref = id_pessoa
-                    
-                    if not id_pessoa:
-                        # Lógica para CRIAR uma nova pessoa (inalterada)
-                        dados_pessoa = {
-                            'nome': nome_csv, 'apelido': norm_row.get('NM_URNA_CANDIDATO'),'cpf': cpf_csv, 'titulo_eleitor': titulo_csv, 
-                            'data_nascimento': nasc_csv,'genero': norm_row.get('DS_GENERO'), 'email': norm_row.get('DS_EMAIL'),
-                            'id_profissao': self._get_or_create_lookup_id(cursor, 'profissoes', norm_row.get('DS_OCUPACAO'), prof_cache),
-                            'id_escolaridade': self._get_or_create_lookup_id(cursor, 'escolaridades', norm_row.get('DS_GRAU_INSTRUCAO'), escol_cache),
-                        }
-                        pessoas_para_inserir.append(dados_pessoa)
-                        id_pessoa_ref = dados_pessoa 
-                        inserts_count += 1
-                        # Atualiza os mapas em memória para evitar duplicatas dentro do mesmo arquivo
-                        if titulo_csv: titulo_map[titulo_csv] = id_pessoa_ref
-                        if cpf_csv: cpf_map[cpf_csv] = id_pessoa_ref
-                        if nome_csv and nasc_csv: nome_nasc_map[f"{nome_csv}_{nasc_csv}"] = id_pessoa_ref
-                    else:
-                        # --- NOVO: Bloco para ATUALIZAR uma pessoa existente ---
-                        existing_person_data = all_people_data.get(id_pessoa, {})
-                        dados_para_atualizar = {}
-
-                        # Verifica se o CPF pode ser adicionado/atualizado
-                        if cpf_csv and not existing_person_data.get('cpf'):
-                            dados_para_atualizar['cpf'] = cpf_csv
-                        
-                        # Verifica se o Título de Eleitor pode ser adicionado/atualizado
-                        if titulo_csv and not existing_person_data.get('titulo_eleitor'):
-                            dados_para_atualizar['titulo_eleitor'] = titulo_csv
-                        
-                        # Adiciona outros campos que podem ser enriquecidos
-                        if norm_row.get('DS_EMAIL') and not existing_person_data.get('email'):
-                             dados_para_atualizar['email'] = norm_row.get('DS_EMAIL')
-
-                        if dados_para_atualizar:
-                            pessoas_para_atualizar.append({'id_pessoa': id_pessoa, 'data': dados_para_atualizar})
-                            updates_count += 1
-                            # Atualiza os dados em memória para consistência
-                            all_people_data[id_pessoa].update(dados_para_atualizar)
-
-                    cidade_key = data_helpers.normalize_city_key(norm_row.get('NM_UE'))
-                    dados_candidatura = {
-                        'id_pessoa_ref': id_pessoa_ref,
-                        'ano_eleicao': data_helpers.safe_int(norm_row.get('ANO_ELEICAO')),'sq_candidato': norm_row.get('SQ_CANDIDATO'),
-                        'nome_urna': norm_row.get('NM_URNA_CANDIDATO'),'numero_urna': norm_row.get('NR_CANDIDATO'),
-                        'partido': norm_row.get('SG_PARTIDO'),'cargo': norm_row.get('DS_CARGO'),'cidade': cidade_key,
-                        'uf': norm_row.get('SG_UF'),'situacao': norm_row.get('DS_SIT_TOT_TURNO')
-                    }
-                    candidaturas_para_inserir.append(dados_candidatura)
-                
-                if progress_win.stop_event.is_set(): raise InterruptedError
-                
-                progress_win.after(0, lambda: progress_win.update_progress("Fase 4/4: Salvando dados no banco...", 0.85))
-
-                # --- Executa as inserções ---
-                if pessoas_para_inserir:
-                    for p_data in pessoas_para_inserir:
-                        cols = ', '.join(p_data.keys()); placeholders = ', '.join([f":{k}" for k in p_data.keys()])
-                        cursor.execute(f"INSERT INTO pessoas ({cols}) VALUES ({placeholders})", p_data)
-                        p_data['id_pessoa'] = cursor.lastrowid
-
-                # --- NOVO: Executa as atualizações ---
-                if pessoas_para_atualizar:
-                    for update_info in pessoas_para_atualizar:
-                        set_clauses = ', '.join([f"{k} = ?" for k in update_info['data'].keys()])
-                        params = list(update_info['data'].values()) + [update_info['id_pessoa']]
-                        cursor.execute(f"UPDATE pessoas SET {set_clauses} WHERE id_pessoa = ?", tuple(params))
-
-                # --- Vincula candidaturas ---
-                final_candidaturas = []
-                for c_data in candidaturas_para_inserir:
-                    id_ref = c_data.pop('id_pessoa_ref')
-                    c_data['id_pessoa'] = id_ref['id_pessoa'] if isinstance(id_ref, dict) else id_ref
-                    final_candidaturas.append(c_data)
-
-                if final_candidaturas:
-                    cols = ', '.join(final_candidaturas[0].keys()); placeholders = ', '.join([f":{k}" for k in final_candidaturas[0].keys()])
-                    cursor.executemany(f"INSERT OR IGNORE INTO candidaturas ({cols}) VALUES ({placeholders})", final_candidaturas)
-
-            success_msg = (
-                f"Importação cadastral concluída!\n"
-                f"- {inserts_count} novos contatos criados.\n"
-                f"- {updates_count} contatos existentes atualizados.\n"
-                f"- {len(candidaturas_para_inserir)} candidaturas processadas."
-            )
+            progress_win.after(0, lambda: progress_win.update_progress("Fase 3/3: Finalizando importação...", 0.9))
+            self._finish_cadastral(filepath, fonte, hash_arquivo, id_job, checkpoint)
+            success_msg = "Importação cadastral concluída!\n" + self._cadastral_summary(checkpoint)
             progress_win.after(0, lambda: progress_win.operation_finished(success_msg))
             
         except InterruptedError:
-            progress_win.after(0, lambda: progress_win.operation_finished("", "Importação cancelada pelo usuário."))
+            progress_win.after(0, lambda: progress_win.operation_finished("", self.CANCEL_RESUMABLE_MSG))
         except sqlite3.IntegrityError as ie:
             logging.error(f"Erro de integridade durante a importação cadastral: {ie}", exc_info=True)
             progress_win.after(0, lambda e=ie: progress_win.operation_finished("", f"Erro de Duplicata: {e}"))
         except Exception as e:
             logging.error(f"Erro durante a importação cadastral: {e}", exc_info=True)
             progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro: {e}"))
+        finally:
+            # Também em caso de erro: profissões/escolaridades criadas num bloco desfeito não podem ficar no cache
+            self.reference_cache.invalidate()
 
     # def importar_dados_cadastrais(self, filepath: str, progress_win):
     #     try:
@@ -578,22 +790,19 @@ class ImportService:
         try:
             class InterruptedError(Exception): pass
 
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 
                 # --- FASE 1: Mapear a última candidatura de cada pessoa (rápido) ---
                 progress_win.after(0, lambda: progress_win.update_progress("Fase 1/4: Mapeando candidaturas...", 0.05))
                 if progress_win.stop_event.is_set(): raise InterruptedError
                 
-                # Usamos ROW_NUMBER() para eficientemente pegar a última candidatura de cada pessoa
+                # A última candidatura de cada pessoa já está materializada em 'pessoa_candidatura_recente'
                 query_candidaturas = """
-                    SELECT id_pessoa, cidade
-                    FROM (
-                        SELECT id_pessoa, cidade, ROW_NUMBER() OVER (PARTITION BY id_pessoa ORDER BY ano_eleicao DESC) as rn
-                        FROM candidaturas
-                        WHERE cidade IS NOT NULL AND cidade != ''
-                    )
-                    WHERE rn = 1;
+                    SELECT pcr.id_pessoa, c.cidade
+                    FROM pessoa_candidatura_recente pcr
+                    JOIN candidaturas c ON pcr.id_candidatura = c.id_candidatura
+                    WHERE c.cidade IS NOT NULL AND c.cidade != '';
                 """
                 cursor.execute(query_candidaturas)
                 person_id_to_city_key_map = {row['id_pessoa']: row['cidade'] for row in cursor.fetchall()}
@@ -659,126 +868,60 @@ class ImportService:
             logging.error(f"Erro ao sincronizar cidades: {e}", exc_info=True)
             progress_win.after(0, lambda err=e: progress_win.operation_finished("", f"Erro inesperado: {err}"))
 
-    def corrigir_duplicatas_de_pessoas(self, progress_win):
+    # --- Duplicatas de pessoas ---
+    def plan_person_merges(self, fuzzy: bool = False, stop_event=None) -> list[MergePlan]:
+        """
+        Agrupa as pessoas duplicadas (CPF, título ou nome + nascimento) e retorna os planos de fusão, sem gravar nada.
+        Com `fuzzy`, inclui os pares de nomes semelhantes encontrados por fuzzy_dedup (mesmo bloco fonético e ano de nascimento).
+        """
+        columns = dedup_engine.PLAN_COLUMNS + (fuzzy_dedup.FUZZY_COLUMNS if fuzzy else ())
+        cursor = self.pool.reader().cursor()
+        cursor.execute(f"SELECT {', '.join(columns)} FROM pessoas ORDER BY id_pessoa")
+        pessoas = [dict(row) for row in cursor.fetchall()]
+        links = fuzzy_dedup.find_similar_pairs(pessoas, stop_event=stop_event) if fuzzy else ()
+        return dedup_engine.build_merge_plans(pessoas, links=links)
+
+    def planejar_fusao_de_duplicatas(self, fuzzy: bool, on_ready, progress_win):
+        """Calcula os planos de fusão em segundo plano e os entrega a `on_ready(planos)` na thread da interface, para pré-visualização."""
         try:
-            class InterruptedError(Exception): pass
-            
-            cursor = self.conn.cursor()
-            try:
-                with self.conn:
-                    cursor.execute("PRAGMA foreign_keys = OFF")
-
-                    progress_win.after(0, lambda: progress_win.update_progress("Fase 1/3: Buscando e agrupando contatos...", 0.1))
-                    cursor.execute("SELECT * FROM pessoas"); todas_as_pessoas = [dict(row) for row in cursor.fetchall()]
-                    
-                    grupos = defaultdict(set)
-                    for pessoa in todas_as_pessoas:
-                        cpf = pessoa.get('cpf')
-                        titulo = pessoa.get('titulo_eleitor')
-                        nome = pessoa.get('nome')
-                        nasc = pessoa.get('data_nascimento')
-                        if cpf: grupos[f"cpf_{cpf}"].add(pessoa['id_pessoa'])
-                        if titulo: grupos[f"titulo_{titulo}"].add(pessoa['id_pessoa'])
-                        if nome and nasc:
-                            nome_normalizado = data_helpers.normalize_city_key(nome)
-                            grupos[f"nome_nasc_{nome_normalizado}_{nasc}"].add(pessoa['id_pessoa'])
-                    
-                    if progress_win.stop_event.is_set(): raise InterruptedError
-                    
-                    progress_win.after(0, lambda: progress_win.update_progress("Fase 2/3: Consolidando grupos de duplicatas...", 0.4))
-                    id_para_grupo_final = {}
-                    grupo_id_counter = 0
-                    for ids_grupo in grupos.values():
-                        if len(ids_grupo) < 2: continue
-                        conjunto_de_grupos_associados = {id_para_grupo_final.get(id_pessoa) for id_pessoa in ids_grupo if id_pessoa in id_para_grupo_final}
-                        
-                        if not conjunto_de_grupos_associados:
-                            id_novo_grupo = grupo_id_counter; grupo_id_counter += 1
-                        else:
-                            id_novo_grupo = min(conjunto_de_grupos_associados)
-
-                        for id_pessoa in ids_grupo:
-                            grupo_existente = id_para_grupo_final.get(id_pessoa)
-                            if grupo_existente is not None and grupo_existente != id_novo_grupo:
-                                grupo_a_ser_mesclado = grupo_existente
-                                for id_p, id_g in id_para_grupo_final.items():
-                                    if id_g == grupo_a_ser_mesclado: id_para_grupo_final[id_p] = id_novo_grupo
-                            id_para_grupo_final[id_pessoa] = id_novo_grupo
-                    
-                    grupos_consolidados = defaultdict(list)
-                    for id_pessoa, id_grupo in id_para_grupo_final.items():
-                        grupos_consolidados[id_grupo].append(id_pessoa)
-                    grupos_para_fusao = [sorted(g) for g in grupos_consolidados.values() if len(g) > 1]
-                    
-                    if progress_win.stop_event.is_set(): raise InterruptedError
+            status = "Comparando nomes semelhantes e agrupando contatos duplicados..." if fuzzy else "Buscando e agrupando contatos duplicados..."
+            progress_win.after(0, lambda: progress_win.update_progress(status, 0.2))
+            plans = self.plan_person_merges(fuzzy, progress_win.stop_event)
+            if progress_win.stop_event.is_set():
+                progress_win.after(0, lambda: progress_win.operation_finished("", "Operação cancelada pelo usuário."))
+                return
+            registros = sum(len(plan.ids_duplicados) for plan in plans)
+            progress_win.after(0, lambda: progress_win.operation_finished(f"{len(plans)} grupos de duplicatas encontrados ({registros} registros a fundir)."))
+            if plans:
+                progress_win.after(0, lambda: on_ready(plans))
+        except Exception as e:
+            logging.error(f"Erro ao buscar duplicatas: {e}", exc_info=True)
+            progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro: {e}"))
 
-                    total_grupos, registros_fundidos = len(grupos_para_fusao), 0
-                    progress_win.after(0, lambda: progress_win.update_progress(f"Fase 3/3: Fundindo {total_grupos} grupos...", 0.6))
+    def aplicar_fusao_de_duplicatas(self, plans: list[MergePlan], progress_win):
+        """Aplica planos de fusão já calculados (e revisados na interface)."""
+        self.corrigir_duplicatas_de_pessoas(progress_win, plans)
 
-                    for i, ids_grupo in enumerate(grupos_para_fusao):
-                        if progress_win.stop_event.is_set(): break
-                        progress = 0.6 + (i / total_grupos) * 0.4 if total_grupos > 0 else 0.6
-                        progress_win.after(0, lambda i=i,t=total_grupos,p=progress: progress_win.update_progress(f"Corrigindo grupo {i+1}/{t}...", p))
+    def corrigir_duplicatas_de_pessoas(self, progress_win, plans: list[MergePlan] | None = None):
+        try:
+            class InterruptedError(Exception): pass
 
-                        pessoas_no_grupo = [p for p in todas_as_pessoas if p['id_pessoa'] in ids_grupo]
-                        
-                        master_pessoa_ref = next((p for p in pessoas_no_grupo if p.get('cpf')), None)
-                        if not master_pessoa_ref: master_pessoa_ref = next((p for p in pessoas_no_grupo if p.get('titulo_eleitor')), None)
-                        if not master_pessoa_ref: master_pessoa_ref = pessoas_no_grupo[0]
-                        
-                        mestre_dados = dict(master_pessoa_ref)
-                        id_mestre = mestre_dados['id_pessoa']
-                        ids_para_deletar = [p['id_pessoa'] for p in pessoas_no_grupo if p['id_pessoa'] != id_mestre]
-                        
-                        unique_cols = {'cpf', 'titulo_eleitor'}
-                        
-                        for id_duplicado in ids_para_deletar:
-                            duplicado_dados = next((p for p in todas_as_pessoas if p['id_pessoa'] == id_duplicado), {})
-                            for col, val in duplicado_dados.items():
-                                if col != 'id_pessoa' and not mestre_dados.get(col) and val:
-                                    can_merge = True
-                                    if col in unique_cols:
-                                        placeholders_check = ', '.join(['?'] * len(ids_grupo))
-                                        check_query = f"SELECT 1 FROM pessoas WHERE {col} = ? AND id_pessoa NOT IN ({placeholders_check}) LIMIT 1"
-                                        params_check = (val, *ids_grupo)
-                                        cursor.execute(check_query, params_check)
-                                        if cursor.fetchone():
-                                            can_merge = False
-                                            logging.warning(f"Não foi possível fundir o valor '{val}' para a coluna '{col}' no registro mestre {id_mestre} pois ele já existe em outro registro não relacionado.")
-                                    if can_merge:
-                                        mestre_dados[col] = val
-
-                        mestre_dados.pop('id_pessoa', None)
-                        set_clauses = ', '.join([f"{k} = ?" for k in mestre_dados.keys()]); sql_upd = f"UPDATE pessoas SET {set_clauses} WHERE id_pessoa = ?"; cursor.execute(sql_upd, (*mestre_dados.values(), id_mestre))
-                        
-                        # --- CORREÇÃO AQUI: Estrutura de dados e loop corrigidos ---
-                        tabelas_para_atualizar = {
-                            'candidaturas': 'id_pessoa',
-                            'atendimentos': 'id_pessoa',
-                            'pessoa_listas_assoc': 'id_pessoa',
-                            'pessoa_tags_assoc': 'id_pessoa',
-                            'relacionamentos': ['id_pessoa_origem', 'id_pessoa_destino']
-                        }
-                        placeholders = ', '.join(['?'] * len(ids_para_deletar))
-                        
-                        for tab_name, col_data in tabelas_para_atualizar.items():
-                            if isinstance(col_data, list): # Caso especial para relacionamentos
-                                for col in col_data:
-                                    cursor.execute(f"UPDATE {tab_name} SET {col} = ? WHERE {col} IN ({placeholders})", (id_mestre, *ids_para_deletar))
-                            else: # Caso normal
-                                col = col_data
-                                cursor.execute(f"UPDATE {tab_name} SET {col} = ? WHERE {col} IN ({placeholders})", (id_mestre, *ids_para_deletar))
-                                
-                        cursor.execute(f"DELETE FROM pessoas WHERE id_pessoa IN ({placeholders})", tuple(ids_para_deletar)); registros_fundidos += len(ids_para_deletar)
-                    
+            if plans is None:
+                progress_win.after(0, lambda: progress_win.update_progress("Fase 1/2: Buscando e agrupando contatos...", 0.1))
+                plans = self.plan_person_merges()
                 if progress_win.stop_event.is_set(): raise InterruptedError
-                
-                success_msg = f"Correção concluída! {total_grupos} grupos de duplicatas encontrados e {registros_fundidos} registros fundidos."
-                progress_win.after(0, lambda: progress_win.operation_finished(success_msg))
-            
-            finally:
-                cursor.execute("PRAGMA foreign_keys = ON")
-                logging.info("Verificação de chaves estrangeiras reativada.")
+
+            total_grupos = len(plans)
+            progress_win.after(0, lambda: progress_win.update_progress(f"Fase 2/2: Fundindo {total_grupos} grupos...", 0.6))
+            if progress_win.stop_event.is_set(): raise InterruptedError
+            # Todos os grupos em uma única transação, com um comando por tabela (merge_executor)
+            with self.pool.foreign_keys_disabled(), self.pool.writer() as conn:
+                total_grupos, registros_fundidos = merge_executor.apply_merge_plans(conn.cursor(), plans)
+                if registros_fundidos:
+                    self.person_repo._rebuild_candidaturas_recentes(conn.cursor())
+
+            success_msg = f"Correção concluída! {total_grupos} grupos de duplicatas encontrados e {registros_fundidos} registros fundidos."
+            progress_win.after(0, lambda: progress_win.operation_finished(success_msg))
 
         except InterruptedError:
             progress_win.after(0, lambda: progress_win.operation_finished("", "Operação cancelada pelo usuário."))
@@ -786,116 +929,354 @@ class ImportService:
             logging.error(f"Erro ao corrigir duplicatas: {e}", exc_info=True)
             progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro: {e}"))
 
+    MUNICIPIO_COLUMNS = ('cidade_key', 'cidade', 'uf', 'sg_ue', 'cod_ibge', 'populacao', 'dens_demo', 'gentilico', 'area', 'idhm_geral', 'idhm_long', 'idhm_renda', 'idhm_educ', 'aniversario')
+    ORGAO_COLUMNS = ('id_organizacao', 'nome_fantasia', 'cnpj', 'endereco', 'numero', 'complemento', 'cep', 'bairro', 'cidade', 'uf', 'telefone', 'email', 'website', 'id_municipio', 'tipo_organizacao')
+    # Colunas lidas do CSV de órgãos públicos (as ausentes no arquivo ficam vazias)
+    ORGAO_CSV_COLUMNS = ('ORGAO_NOME', 'CIDADE', 'CNPJ', 'LOGRADOURO', 'NUMERO', 'COMPLEMENTO', 'CEP', 'BAIRRO', 'UF', 'TELEFONE', 'EMAIL', 'SITE')
+
+    @staticmethod
+    def _upsert_sql(table_name: str, columns: tuple, conflict: str) -> str:
+        """INSERT ... ON CONFLICT (conflict) DO UPDATE de todas as demais colunas."""
+        updates = ', '.join(f"{c} = excluded.{c}" for c in columns if c not in conflict.split(', '))
+        return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))}) ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+
+    def _load_municipios_map(self) -> dict[str, tuple[int, str | None]]:
+        cursor = self.pool.reader().cursor()
+        cursor.execute("SELECT id, cidade_key, uf FROM municipios WHERE cidade_key IS NOT NULL")
+        return {row['cidade_key']: (row['id'], row['uf']) for row in cursor.fetchall()}
+
+    def _import_municipios(self, prefeituras_path: str) -> int:
+        """Grava os municípios do prefeituras_sp.csv numa única transação. Retorna quantos foram importados."""
+        with open(prefeituras_path, 'r', encoding='utf-8-sig') as f:
+            municipios_data = [
+                (data_helpers.normalize_city_key(r.get('CIDADE')), r.get('CIDADE'), 'SP', r.get('SG_UE'), r.get('COD.IBGE'), data_helpers.safe_int(r.get('POPULACAO')),
+                 data_helpers.safe_int(r.get('DENS.DEMO'), None), r.get('GENTILICO'), data_helpers.safe_int(r.get('AREA'), None), data_helpers.safe_int(r.get('IDHM_GERAL'), None),
+                 data_helpers.safe_int(r.get('IDHM_LONG'), None), data_helpers.safe_int(r.get('IDHM_RENDA'), None), data_helpers.safe_int(r.get('IDHM_EDUC'), None), r.get('ANIVERSARIO'))
+                for r in (data_helpers.normalize_csv_row(row) for row in csv.DictReader(f, delimiter=';')) if r.get('CIDADE')
+            ]
+        # UPSERT pela cidade_key: o id do município é mantido (INSERT OR REPLACE criava um id novo e soltava eleitorado e órgãos)
+        with self.pool.writer() as conn:
+            conn.cursor().executemany(self._upsert_sql('municipios', self.MUNICIPIO_COLUMNS, 'cidade_key'), municipios_data)
+        return len(municipios_data)
+
+    def _save_eleitorado(self, totais: dict, perfis: dict):
+        """Grava o resultado de eleitorado_aggregator.aggregate_eleitorado numa única transação."""
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(self._upsert_sql('eleitorado', ('id_municipio', 'ano', 'total', 'masculino', 'feminino', 'nao_informado'), 'id_municipio, ano'),
+                               [(id_municipio, ano, sum(contagem), *contagem) for (id_municipio, ano), contagem in totais.items()])
+            if perfis:
+                # O perfil de cada município/ano do arquivo é substituído por inteiro (categorias que sumiram não ficam para trás)
+                cursor.executemany("DELETE FROM eleitorado_perfil WHERE id_municipio = ? AND ano = ?", list(totais))
+                cursor.executemany(self._upsert_sql('eleitorado_perfil', ('id_municipio', 'ano', 'dimensao', 'categoria', 'total'), 'id_municipio, ano, dimensao, categoria'),
+                                   [(*key, total) for key, total in perfis.items()])
+
     def importar_prefeituras_eleitorado_csv(self, prefeituras_path, eleitorado_path, progress_win):
+        """
+        Importa os municípios (prefeituras_sp.csv) e o eleitorado, cada arquivo numa única transação.
+        O eleitorado pode ser o perfil_eleitorado do TSE (vários anos, com faixa etária e escolaridade) ou o
+        eleitorado_ANO.csv; ele é somado em fluxo (eleitorado_aggregator) antes de abrir a transação de escrita.
+        """
         try:
             class InterruptedError(Exception): pass
-            
-            with self.conn:
-                cursor = self.conn.cursor()
-                if progress_win.stop_event.is_set(): raise InterruptedError
-                progress_win.after(0, lambda: progress_win.update_progress("Fase 1/2: Importando municípios...", 0.0))
-                
-                if os.path.exists(prefeituras_path):
-                    with open(prefeituras_path, 'r', encoding='utf-8-sig') as f:
-                        reader = csv.DictReader(f, delimiter=';')
-                        municipios_data = [ { 'cidade_key': data_helpers.normalize_city_key(r.get('CIDADE')), 'cidade': r.get('CIDADE'), 'uf': 'SP', 'sg_ue': r.get('SG_UE'), 'cod_ibge': r.get('COD.IBGE'), 'populacao': data_helpers.safe_int(r.get('POPULACAO')), 'dens_demo': data_helpers.safe_int(r.get('DENS.DEMO'), None), 'gentilico': r.get('GENTILICO'), 'area': data_helpers.safe_int(r.get('AREA'), None), 'idhm_geral': data_helpers.safe_int(r.get('IDHM_GERAL'), None), 'idhm_long': data_helpers.safe_int(r.get('IDHM_LONG'), None), 'idhm_renda': data_helpers.safe_int(r.get('IDHM_RENDA'), None), 'idhm_educ': data_helpers.safe_int(r.get('IDHM_EDUC'), None), 'aniversario': r.get('ANIVERSARIO') } for r in (data_helpers.normalize_csv_row(row) for row in reader) if r.get('CIDADE') ]
-                        cursor.executemany('INSERT OR REPLACE INTO municipios (cidade_key, cidade, uf, sg_ue, cod_ibge, populacao, dens_demo, gentilico, area, idhm_geral, idhm_long, idhm_renda, idhm_educ, aniversario) VALUES (:cidade_key, :cidade, :uf, :sg_ue, :cod_ibge, :populacao, :dens_demo, :gentilico, :area, :idhm_geral, :idhm_long, :idhm_renda, :idhm_educ, :aniversario)', municipios_data)
 
-                if progress_win.stop_event.is_set(): raise InterruptedError
-                progress_win.after(0, lambda: progress_win.update_progress("Fase 2/2: Atualizando eleitorado...", 0.5))
-                
-                if os.path.exists(eleitorado_path):
-                    ano_eleitorado = data_helpers.safe_int(re.search(r'\d{4}', os.path.basename(eleitorado_path)).group(), 2024)
-                    eleitorado_por_cidade = defaultdict(lambda: {'masculino': 0, 'feminino': 0, 'nao_informado': 0})
-                    with open(eleitorado_path, 'r', encoding='latin-1') as f:
-                        reader = csv.DictReader(f, delimiter=';')
-                        for row in reader:
-                            norm_row = data_helpers.normalize_csv_row(row)
-                            cidade_normalizada = data_helpers.normalize_city_key(norm_row.get('CIDADE'))
-                            genero, votos = norm_row.get('GENERO'), data_helpers.safe_int(norm_row.get('VOTOS'))
-                            if genero == 'MASCULINO': eleitorado_por_cidade[cidade_normalizada]['masculino'] += votos
-                            elif genero == 'FEMININO': eleitorado_por_cidade[cidade_normalizada]['feminino'] += votos
-                            else: eleitorado_por_cidade[cidade_normalizada]['nao_informado'] += votos
-                    
-                    updates_para_fazer = []
-                    for cidade_key, d in eleitorado_por_cidade.items():
-                        cursor.execute("SELECT id FROM municipios WHERE cidade_key = ?", (cidade_key,))
-                        municipio_res = cursor.fetchone()
-                        if municipio_res:
-                            updates_para_fazer.append({'id_municipio': municipio_res['id'], 'ano': ano_eleitorado, 'total': d['masculino'] + d['feminino'] + d['nao_informado'], 'mas': d['masculino'], 'fem': d['feminino'], 'ni': d['nao_informado']})
-                    
-                    if updates_para_fazer:
-                        cursor.executemany('INSERT OR REPLACE INTO eleitorado (id_municipio, ano, total, masculino, feminino, nao_informado) VALUES (:id_municipio, :ano, :total, :mas, :fem, :ni)', updates_para_fazer)
-                
             if progress_win.stop_event.is_set(): raise InterruptedError
-            progress_win.after(0, lambda: progress_win.operation_finished("Importação concluída!"))
+            progress_win.after(0, lambda: progress_win.update_progress("Fase 1/3: Importando municípios...", 0.0))
+            municipios_importados = self._import_municipios(prefeituras_path) if os.path.exists(prefeituras_path) else 0
+
+            if progress_win.stop_event.is_set(): raise InterruptedError
+            totais, perfis = {}, {}
+            if os.path.exists(zip_source.source_path(eleitorado_path)):
+                formato = "perfil do eleitorado do TSE" if eleitorado_aggregator.is_perfil_file(eleitorado_path) else "eleitorado"
+                progress_win.after(0, lambda: progress_win.update_progress(f"Fase 2/3: Somando o {formato}...", 0.1))
+
+                def on_progress(position, total_bytes):
+                    progress_win.after(0, lambda p=position / total_bytes: progress_win.update_progress(
+                        f"Fase 2/3: Somando o {formato} ({p:.0%})...", 0.1 + p * 0.8))
+
+                resultado = eleitorado_aggregator.aggregate_eleitorado(
+                    eleitorado_path, self._load_municipios_map(), eleitorado_aggregator.year_from_filename(eleitorado_path, 2024),
+                    progress_win.stop_event, on_progress)
+                if resultado is None: raise InterruptedError
+                totais, perfis = resultado
+
+                progress_win.after(0, lambda: progress_win.update_progress("Fase 3/3: Gravando o eleitorado...", 0.9))
+                self._save_eleitorado(totais, perfis)
+
+            anos = sorted({ano for _, ano in totais})
+            success_msg = (f"Importação concluída!\n- {municipios_importados} municípios importados."
+                           f"\n- Eleitorado de {len({m for m, _ in totais})} municípios" + (f" ({', '.join(map(str, anos))})." if anos else "."))
+            if perfis:
+                success_msg += "\n- Perfil por faixa etária e escolaridade atualizado."
+            progress_win.after(0, lambda: progress_win.operation_finished(success_msg))
             
         except InterruptedError:
             progress_win.after(0, lambda: progress_win.operation_finished("", "Importação cancelada."))
         except Exception as e:
+            logging.error(f"Erro ao importar municípios e eleitorado: {e}", exc_info=True)
             progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro: {e}"))
+        finally:
+            self.reference_cache.invalidate()
 
     def importar_orgaos_publicos_csv(self, filepath: str, progress_win):
-            try:
-                class InterruptedError(Exception): pass
-                with self.conn:
-                    with open(filepath, 'r', encoding='latin-1') as f:
-                        rows = list(csv.DictReader(f, delimiter=';'))
-                    cursor = self.conn.cursor()
-                    
-                    total_rows = len(rows)
-                    for i, row in enumerate(rows):
-                        if progress_win.stop_event.is_set(): raise InterruptedError
-                        progress = (i + 1) / total_rows
-                        norm_row = data_helpers.normalize_csv_row(row)
+        """
+        Importa as prefeituras e órgãos públicos numa única transação. Organizações e municípios são localizados
+        por mapas carregados uma vez (CNPJ, nome + tipo, cidade_key); os novos recebem ids reservados na hora,
+        e cada bloco do arquivo é gravado com um único UPSERT por tabela.
+        """
+        try:
+            class InterruptedError(Exception): pass
+            tipo_organizacao = "Prefeitura" # Mantém o tipo fixo para esta importação
+            total_bytes = os.path.getsize(filepath) or 1
+            with open(filepath, 'rb') as f:
+                header = csv_stream.read_header(f)
+            csv_columns = [c for c in self.ORGAO_CSV_COLUMNS if c in header]
+
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id, cidade_key FROM municipios WHERE cidade_key IS NOT NULL")
+                municipio_ids = {row['cidade_key']: row['id'] for row in cursor.fetchall()}
+                cursor.execute("SELECT id_organizacao, cnpj FROM organizacoes WHERE cnpj IS NOT NULL")
+                cnpj_ids = {row['cnpj']: row['id_organizacao'] for row in cursor.fetchall()}
+                cnpj_atual = {id_organizacao: cnpj for cnpj, id_organizacao in cnpj_ids.items()}
+                # Nome -> ids das prefeituras com esse nome (com nomes repetidos vale o de menor id, como na busca pelo índice)
+                cursor.execute("SELECT id_organizacao, nome_fantasia FROM organizacoes WHERE tipo_organizacao = ?", (tipo_organizacao,))
+                nome_atual = {row['id_organizacao']: row['nome_fantasia'] for row in cursor.fetchall()}
+                nome_ids = defaultdict(set)
+                for id_organizacao, nome in nome_atual.items(): nome_ids[nome].add(id_organizacao)
+                next_municipio_id = next_org_id = None
+                processados = 0
+
+                for rows, position in csv_stream.iter_row_chunks(filepath, csv_columns):
+                    if progress_win.stop_event.is_set(): raise InterruptedError
+                    novos_municipios = []
+                    orgs_para_gravar = []
+                    for values in rows:
+                        norm_row = {c: v.strip() for c, v in zip(csv_columns, values)}
                         org_nome, cidade_nome = norm_row.get('ORGAO_NOME'), norm_row.get('CIDADE')
-                        progress_win.after(0, lambda p=progress, o=org_nome or cidade_nome, i=i, t=total_rows: progress_win.update_progress(f"Processando: {o}", p, f"Registro {i+1}/{t}"))
-                        
                         if not cidade_nome: continue
                         cidade_key = data_helpers.normalize_city_key(cidade_nome)
-                        cursor.execute("SELECT id FROM municipios WHERE cidade_key = ?", (cidade_key,))
-                        municipio_result = cursor.fetchone()
-                        id_municipio = municipio_result['id'] if municipio_result else cursor.execute("INSERT INTO municipios (cidade, cidade_key, uf) VALUES (?, ?, 'SP')", (cidade_nome, cidade_key)).lastrowid
+                        id_municipio = municipio_ids.get(cidade_key)
+                        if not id_municipio:
+                            if next_municipio_id is None: next_municipio_id = self._next_id(cursor, 'municipios', 'id')
+                            id_municipio, next_municipio_id = next_municipio_id, next_municipio_id + 1
+                            municipio_ids[cidade_key] = id_municipio
+                            novos_municipios.append((id_municipio, cidade_nome, cidade_key))
 
                         if not org_nome: continue
-                        
-                        org_data = {
-                            "nome_fantasia": org_nome,
-                            "cnpj": norm_row.get('CNPJ') or None,
-                            "endereco": norm_row.get('LOGRADOURO'),
-                            "numero": norm_row.get('NUMERO'),
-                            "complemento": norm_row.get('COMPLEMENTO'),
-                            "cep": re.sub(r'\D', '', norm_row.get('CEP', '')), # Remove caracteres não numéricos do CEP
-                            "bairro": norm_row.get('BAIRRO'),
-                            "cidade": cidade_nome,
-                            "uf": norm_row.get('UF') or 'SP', # Define 'SP' como padrão se a UF estiver vazia
-                            "telefone": re.sub(r'\D', '', norm_row.get('TELEFONE', '')),
-                            "email": norm_row.get('EMAIL'),
-                            "website": norm_row.get('SITE'),
-                            "id_municipio": id_municipio,
-                            "tipo_organizacao": "Prefeitura" # Mantém o tipo fixo para esta importação
-                        }
-
-                        id_organizacao = None
-                        if org_data["cnpj"]:
-                            cursor.execute("SELECT id_organizacao FROM organizacoes WHERE cnpj = ?", (org_data["cnpj"],))
-                            res = cursor.fetchone(); id_organizacao = res['id_organizacao'] if res else None
+                        cnpj = norm_row.get('CNPJ') or None
+                        ids_com_nome = nome_ids.get(org_nome)
+                        id_organizacao = (cnpj_ids.get(cnpj) if cnpj else None) or (min(ids_com_nome) if ids_com_nome else None)
                         if not id_organizacao:
-                            cursor.execute("SELECT id_organizacao FROM organizacoes WHERE nome_fantasia = ? AND tipo_organizacao = ?", (org_nome, "Prefeitura"))
-                            res = cursor.fetchone(); id_organizacao = res['id_organizacao'] if res else None
-                        
-                        if id_organizacao:
-                            update_clauses = ', '.join([f"{key} = ?" for key in org_data.keys()])
-                            cursor.execute(f"UPDATE organizacoes SET {update_clauses} WHERE id_organizacao = ?", (*org_data.values(), id_organizacao))
+                            if next_org_id is None: next_org_id = self._next_id(cursor, 'organizacoes', 'id_organizacao')
+                            id_organizacao, next_org_id = next_org_id, next_org_id + 1
+                        # A linha grava o nome e o CNPJ do arquivo (mesmo vazio): os mapas acompanham o que fica no banco
+                        if nome_atual.get(id_organizacao) != org_nome:
+                            if id_organizacao in nome_atual: nome_ids[nome_atual[id_organizacao]].discard(id_organizacao)
+                            nome_ids[org_nome].add(id_organizacao)
+                            nome_atual[id_organizacao] = org_nome
+                        anterior = cnpj_atual.pop(id_organizacao, None)
+                        if anterior and anterior != cnpj: cnpj_ids.pop(anterior, None)
+                        if cnpj:
+                            cnpj_ids[cnpj] = id_organizacao
+                            cnpj_atual[id_organizacao] = cnpj
+                        orgs_para_gravar.append((
+                            id_organizacao, org_nome, cnpj, norm_row.get('LOGRADOURO'), norm_row.get('NUMERO'), norm_row.get('COMPLEMENTO'),
+                            re.sub(r'\D', '', norm_row.get('CEP', '')), # Remove caracteres não numéricos do CEP
+                            norm_row.get('BAIRRO'), cidade_nome,
+                            norm_row.get('UF') or 'SP', # Define 'SP' como padrão se a UF estiver vazia
+                            re.sub(r'\D', '', norm_row.get('TELEFONE', '')), norm_row.get('EMAIL'), norm_row.get('SITE'), id_municipio, tipo_organizacao,
+                        ))
+
+                    cursor.executemany("INSERT INTO municipios (id, cidade, cidade_key, uf) VALUES (?, ?, ?, 'SP')", novos_municipios)
+                    # Linhas repetidas no mesmo bloco caem no ON CONFLICT e a última prevalece
+                    cursor.executemany(self._upsert_sql('organizacoes', self.ORGAO_COLUMNS, 'id_organizacao'), orgs_para_gravar)
+                    processados += len(rows)
+                    progress_win.after(0, lambda p=position / total_bytes, n=processados: progress_win.update_progress(
+                        "Importando órgãos públicos...", p, f"{n} registros processados"))
+
+            progress_win.after(0, lambda: progress_win.operation_finished(f"Importação concluída! {processados} registros processados."))
+        except InterruptedError:
+            progress_win.after(0, lambda: progress_win.operation_finished("", "Operação cancelada."))
+        except Exception as e:
+            logging.error(f"Erro ao importar órgãos públicos: {e}", exc_info=True)
+            progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro: {e}"))
+        finally:
+            self.reference_cache.invalidate()
+    # --- Importação em lote ---
+    def classificar_arquivos(self, paths, ufs=None) -> dict[str | None, list[str]]:
+        """
+        Arquivos .csv e .zip de `paths` (arquivos ou pastas) agrupados pelo tipo reconhecido no cabeçalho
+        (None: não reconhecidos). Os ZIPs viram origens com as `ufs` escolhidas (functions.zip_source).
+        """
+        grupos = {}
+        for filepath in batch_import.list_import_files(paths, ufs):
+            grupos.setdefault(batch_import.detect_file_type(filepath), []).append(filepath)
+        return grupos
+
+    def importar_lote(self, paths: list[str], progress_win, ufs=None):
+        """
+        Importa de uma vez os arquivos do TSE de `paths` (candidatos, votação, eleitorado e prefeituras), com o
+        tipo de cada um reconhecido pelo cabeçalho. A leitura roda em paralelo nos processos do batch_import.ParsePool
+        e esta thread grava os resultados à medida que chegam, com as mesmas rotinas das importações de um arquivo
+        (registro de importação, retomada do cadastral, arquivos inalterados ignorados). As prefeituras são gravadas
+        antes de tudo e a votação só depois de todos os cadastrais, de que dependem os votos dos cargos municipais.
+        Dos ZIPs do TSE, são lidos só os CSVs das `ufs` (ou o nacional, sem UFs), direto do ZIP.
+        """
+        try:
+            class InterruptedError(Exception): pass
+            stop_event = progress_win.stop_event
+
+            def report(status, progress, details=""):
+                progress_win.after(0, lambda: progress_win.update_progress(status, progress, details))
+
+            report("Identificando os arquivos...", 0.0)
+            grupos = self.classificar_arquivos(paths, ufs)
+            ignorados = grupos.pop(None, [])
+            if not grupos:
+                progress_win.after(0, lambda: progress_win.operation_finished("", "Nenhum arquivo do TSE foi reconhecido entre os selecionados."))
+                return
+
+            ordem = [(filepath, tipo) for tipo, files in grupos.items() for filepath in files]
+            resultados, erros = {}, {}
+
+            # Municípios antes de tudo: o eleitorado é somado pelo id do município
+            for filepath in grupos.pop(batch_import.TIPO_PREFEITURAS, []):
+                if stop_event.is_set(): raise InterruptedError
+                report(f"Importando municípios de '{os.path.basename(filepath)}'...", 0.0)
+                try:
+                    resultados[filepath] = f"{self._import_municipios(filepath)} municípios importados."
+                except Exception as e:
+                    logging.error(f"Erro na importação em lote de '{filepath}': {e}", exc_info=True)
+                    erros[filepath] = str(e)
+
+            arquivos = [{'tipo': tipo, 'filepath': filepath, 'fonte': os.path.basename(filepath), 'tamanho': csv_stream.source_size(filepath)}
+                        for tipo, files in grupos.items() for filepath in files]
+            # Votação e cadastral são lidos duas vezes (hash e leitura); o eleitorado, uma
+            total_bytes = sum(a['tamanho'] * (1 if a['tipo'] == batch_import.TIPO_ELEITORADO else 2) for a in arquivos) or 1
+            municipios = self._load_municipios_map() if batch_import.TIPO_ELEITORADO in grupos else None
+            cadastrais_abertos = sum(1 for a in arquivos if a['tipo'] == batch_import.TIPO_CADASTRAL)
+            votacao_prontos = []
+            cadastral_state = None
+            recentes = False
+            bytes_pulados = 0
+            progresso = 0.05
+            workers = self._import_workers()
+
+            def falhou(arq: dict, erro: str):
+                nonlocal cadastrais_abertos
+                erros[arq['filepath']] = erro
+                arq['digests'] = None
+                if arq['tipo'] == batch_import.TIPO_CADASTRAL: cadastrais_abertos -= 1
+
+            def detalhes() -> str:
+                return f"{len(resultados) + len(erros)} de {len(ordem)} arquivos concluídos"
+
+            with batch_import.ParsePool(workers, stop_event) as parsers:
+                for i, arq in enumerate(arquivos):
+                    if arq['tipo'] == batch_import.TIPO_ELEITORADO:
+                        parsers.submit((i, None), batch_import.TIPO_ELEITORADO, arq['filepath'], municipios,
+                                       eleitorado_aggregator.year_from_filename(arq['filepath'], 2024))
+                    else:
+                        parsers.submit((i, 'hash'), 'hash', arq['filepath'])
+
+                for key, evento, dados in parsers.messages():
+                    if stop_event.is_set(): raise InterruptedError
+                    progresso = 0.05 + 0.85 * min(1.0, (parsers.bytes_read + bytes_pulados) / total_bytes)
+                    report(f"Lendo e gravando {len(arquivos)} arquivos...", progresso, detalhes())
+                    if key is None: continue
+
+                    i, parte = key
+                    arq = arquivos[i]
+                    filepath, tipo = arq['filepath'], arq['tipo']
+                    if filepath in erros: continue
+                    if evento == 'erro':
+                        falhou(arq, dados)
+                        continue
+                    if evento == 'fim' and dados is None: raise InterruptedError
+
+                    try:
+                        if parte == 'hash':
+                            arq['hash'] = dados
+                            entry = self.ledger_repo.get_file(tipo, arq['fonte'])
+                            if entry and entry['file_hash'] == dados:
+                                resultados[filepath] = "sem alterações desde a última importação."
+                                bytes_pulados += arq['tamanho']
+                                if tipo == batch_import.TIPO_CADASTRAL: cadastrais_abertos -= 1
+                            elif tipo == batch_import.TIPO_VOTACAO:
+                                arq['faixas'] = votacao_aggregator.plan_ranges(filepath, workers)
+                                arq['parciais'] = {}
+                                for n, (start, end) in enumerate(arq['faixas']):
+                                    parsers.submit((i, n), batch_import.TIPO_VOTACAO, filepath, start, end)
+                            else:
+                                # Um cadastral interrompido continua de onde parou, como na importação de um arquivo
+                                job = self._open_job(tipo, filepath, "contatos", dict)
+                                arq.update(job=job, checkpoint=self._cadastral_checkpoint(job), digests=self.ledger_repo.load_digests(tipo, arq['fonte']))
+                                bytes_pulados += job['byte_offset']
+                                parsers.submit((i, None), batch_import.TIPO_CADASTRAL, filepath, self.CADASTRAL_COLUMNS, job['byte_offset'] or None)
+
+                        elif evento == 'lote':
+                            if cadastral_state is None: cadastral_state = self._load_cadastral_state()
+                            records, position, linhas = dados
+                            self._write_cadastral_block(arq['fonte'], arq['job']['id_job'], records, linhas, position, arq['digests'], cadastral_state, arq['checkpoint'])
+
+                        elif tipo == batch_import.TIPO_CADASTRAL:
+                            checkpoint = arq['checkpoint']
+                            self._finish_cadastral(filepath, arq['fonte'], arq['hash'], arq['job']['id_job'], checkpoint, rebuild_recentes=False)
+                            recentes = True
+                            cadastrais_abertos -= 1
+                            arq['digests'] = None
+                            resultados[filepath] = (f"{checkpoint['inseridos']} contatos novos, {checkpoint['atualizados']} atualizados, "
+                                                    f"{checkpoint['candidaturas']} candidaturas.")
+
+                        elif tipo == batch_import.TIPO_VOTACAO:
+                            arq['parciais'][parte] = dados
+                            if len(arq['parciais']) == len(arq['faixas']): votacao_prontos.append(arq)
+
                         else:
-                            columns = ', '.join(org_data.keys()); placeholders = ', '.join(['?'] * len(org_data)); cursor.execute(f"INSERT INTO organizacoes ({columns}) VALUES ({placeholders})", tuple(org_data.values()))
-                
-                if progress_win.stop_event.is_set():
-                    progress_win.after(0, lambda: progress_win.operation_finished("", "Operação cancelada."))
-                else:
-                    progress_win.after(0, lambda: progress_win.operation_finished(f"Importação concluída! {len(rows)} registros processados."))
-            except InterruptedError:
-                progress_win.after(0, lambda: progress_win.operation_finished("", "Importação cancelada."))
-            except Exception as e:
-                logging.error(f"Erro ao importar órgãos públicos: {e}", exc_info=True)
-                progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro: {e}"))
\ No newline at end of file
+                            totais, perfis = dados
+                            self._save_eleitorado(totais, perfis)
+                            anos = sorted({ano for _, ano in totais})
+                            resultados[filepath] = f"eleitorado de {len({m for m, _ in totais})} municípios" + (f" ({', '.join(map(str, anos))})." if anos else ".")
+                    except InterruptedError:
+                        raise
+                    except Exception as e:
+                        logging.error(f"Erro na importação em lote de '{filepath}': {e}", exc_info=True)
+                        falhou(arq, str(e))
+
+                    # Votação só depois de todos os cadastrais: os votos dos cargos municipais vão para as candidaturas gravadas por eles
+                    while votacao_prontos and not cadastrais_abertos:
+                        arq = votacao_prontos.pop(0)
+                        try:
+                            job = self._open_job(arq['tipo'], arq['filepath'], "agregacao", lambda: {'faixas': arq['faixas'], 'faixas_concluidas': [], 'anos': {}})
+                            agregado = votacao_aggregator.merge_partials([arq['parciais'][n] for n in range(len(arq['faixas']))])
+                            arq['parciais'] = None
+                            _, candidatos, _ = self._finish_votacao(
+                                arq['filepath'], arq['fonte'], arq['hash'], job['id_job'], agregado,
+                                lambda status, _, fonte=arq['fonte']: report(f"{fonte}: {status}", progresso, detalhes()), stop_event, InterruptedError)
+                            resultados[arq['filepath']] = f"votos de {candidatos} candidatos gravados."
+                        except InterruptedError:
+                            raise
+                        except Exception as e:
+                            logging.error(f"Erro na importação em lote de '{arq['filepath']}': {e}", exc_info=True)
+                            falhou(arq, str(e))
+
+            if recentes:
+                report("Atualizando a última candidatura de cada contato...", 0.95, detalhes())
+                self.person_repo.rebuild_candidaturas_recentes()
+
+            linhas = [f"- {os.path.basename(filepath)} ({batch_import.TYPE_LABELS[tipo]}): " + (resultados.get(filepath) or f"ERRO: {erros.get(filepath)}")
+                      for filepath, tipo in ordem]
+            msg = f"Importação em lote concluída: {len(resultados)} de {len(ordem)} arquivos importados.\n" + "\n".join(linhas)
+            if ignorados:
+                msg += f"\n\n{len(ignorados)} arquivos não reconhecidos foram ignorados."
+            progress_win.after(0, lambda: progress_win.operation_finished("", msg) if erros else progress_win.operation_finished(msg))
+
+        except InterruptedError:
+            progress_win.after(0, lambda: progress_win.operation_finished("", "Importação em lote interrompida. Os arquivos já gravados foram mantidos, "
+                                                                              "e os cadastrais interrompidos continuam de onde pararam na próxima importação."))
+        except Exception as e:
+            logging.error(f"Erro durante a importação em lote: {e}", exc_info=True)
+            progress_win.after(0, lambda e=e: progress_win.operation_finished("", f"Erro inesperado: {e}"))
+        finally:
+            self.reference_cache.invalidate()
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Aplicação em lote dos planos de fusão de pessoas duplicadas (dto.MergePlan).
+
+Todos os planos são aplicados de uma vez, com poucos comandos: os ids dos grupos vão para uma tabela
+TEMP, os campos do mestre são calculados em memória e o mapa duplicado -> mestre vai para a tabela
+TEMP merge_map, usada por um único UPDATE ... FROM por tabela. Nas tabelas de associação, cuja
+chave primária inclui o id da pessoa, as linhas são copiadas para o mestre com INSERT OR IGNORE
+(o mestre pode já ter a mesma tag/lista) e as dos duplicados são apagadas em seguida.
+Deve ser chamado dentro de `pool.writer()`, com as chaves estrangeiras desligadas.
+"""
+import logging
+
+from functions import dedup_engine
+
+# Tabelas cujo id da pessoa não faz parte de nenhuma restrição única: UPDATE direto
+REASSIGN_TABLES = (('candidaturas', 'id_pessoa'), ('atendimentos', 'id_pessoa'))
+# Tabelas de associação (chave primária composta com o id da pessoa): cópia + remoção
+ASSOC_TABLES = (('pessoa_listas_assoc', 'id_lista'), ('pessoa_tags_assoc', 'id_tag'))
+
+def _load_groups(cursor, plans: list) -> dict[int, list[dict]]:
+    """Linhas atuais de todas as pessoas dos planos, por índice do plano (em ordem de id)."""
+    cursor.execute("DROP TABLE IF EXISTS temp.merge_plan_ids")
+    cursor.execute("CREATE TEMP TABLE merge_plan_ids (id_pessoa INTEGER PRIMARY KEY, grupo INTEGER NOT NULL)")
+    cursor.executemany("INSERT OR IGNORE INTO merge_plan_ids (id_pessoa, grupo) VALUES (?, ?)",
+                       ((id_pessoa, grupo) for grupo, plan in enumerate(plans) for id_pessoa in plan.ids))
+    cursor.execute("SELECT p.*, g.grupo AS merge_grupo FROM pessoas p JOIN merge_plan_ids g ON g.id_pessoa = p.id_pessoa ORDER BY p.id_pessoa")
+    groups = {}
+    for row in cursor.fetchall():
+        pessoa = dict(row)
+        groups.setdefault(pessoa.pop('merge_grupo'), []).append(pessoa)
+    cursor.execute("DROP TABLE temp.merge_plan_ids")
+    return groups
+
+def apply_merge_plans(cursor, plans: list) -> tuple[int, int]:
+    """
+    Aplica os planos com os dados atuais do banco (o plano pode ter sido exibido antes): ids que não
+    existem mais são ignorados e o mestre é escolhido de novo se tiver sido removido. Os campos vazios
+    do mestre são preenchidos com os dos duplicados. Retorna (grupos fundidos, registros removidos).
+    """
+    groups = _load_groups(cursor, plans)
+
+    merge_map = []
+    campos_por_mestre = {}
+    for grupo, pessoas_no_grupo in groups.items():
+        if len(pessoas_no_grupo) < 2: continue
+        plan = plans[grupo]
+        mestre = next((p for p in pessoas_no_grupo if p['id_pessoa'] == plan.id_mestre), None) or dedup_engine.choose_master(pessoas_no_grupo)
+        duplicados = [p for p in pessoas_no_grupo if p is not mestre]
+        merge_map.extend((p['id_pessoa'], mestre['id_pessoa']) for p in duplicados)
+        # CPF e título são UNIQUE: o valor de um duplicado só pode pertencer a ele mesmo, que será removido
+        campos = dedup_engine.merge_fields(mestre, duplicados)
+        if campos: campos_por_mestre[mestre['id_pessoa']] = campos
+
+    if not merge_map:
+        return 0, 0
+
+    cursor.execute("DROP TABLE IF EXISTS temp.merge_map")
+    cursor.execute("CREATE TEMP TABLE merge_map (id_dup INTEGER PRIMARY KEY, id_master INTEGER NOT NULL)")
+    cursor.executemany("INSERT INTO merge_map (id_dup, id_master) VALUES (?, ?)", merge_map)
+
+    for table, col in REASSIGN_TABLES:
+        cursor.execute(f"UPDATE {table} SET {col} = m.id_master FROM merge_map m WHERE {table}.{col} = m.id_dup")
+
+    for table, other_col in ASSOC_TABLES:
+        cursor.execute(f"""INSERT OR IGNORE INTO {table} (id_pessoa, {other_col})
+                           SELECT m.id_master, a.{other_col} FROM {table} a JOIN merge_map m ON a.id_pessoa = m.id_dup""")
+        cursor.execute(f"DELETE FROM {table} WHERE id_pessoa IN (SELECT id_dup FROM merge_map)")
+
+    # Relacionamentos: mantém os ids; o que já existir no mestre (UNIQUE origem/destino/tipo) é descartado,
+    # assim como as relações entre o mestre e os seus próprios duplicados
+    for col in ('id_pessoa_origem', 'id_pessoa_destino'):
+        cursor.execute(f"UPDATE OR IGNORE relacionamentos SET {col} = m.id_master FROM merge_map m WHERE relacionamentos.{col} = m.id_dup")
+    cursor.execute("""DELETE FROM relacionamentos WHERE id_pessoa_origem IN (SELECT id_dup FROM merge_map) OR id_pessoa_destino IN (SELECT id_dup FROM merge_map)
+                      OR (id_pessoa_origem = id_pessoa_destino AND id_pessoa_origem IN (SELECT id_master FROM merge_map))""")
+
+    cursor.execute("DELETE FROM pessoas WHERE id_pessoa IN (SELECT id_dup FROM merge_map)")
+
+    # Campos herdados dos duplicados (depois da remoção, por causa das colunas únicas), agrupados pelas colunas alteradas
+    updates_por_colunas = {}
+    for id_mestre, campos in campos_por_mestre.items():
+        cols = tuple(sorted(campos))
+        updates_por_colunas.setdefault(cols, []).append((*(campos[c] for c in cols), id_mestre))
+    for cols, params in updates_por_colunas.items():
+        cursor.executemany(f"UPDATE pessoas SET {', '.join(f'{c} = ?' for c in cols)} WHERE id_pessoa = ?", params)
+
+    cursor.execute("DROP TABLE temp.merge_map")
+    grupos = len({id_master for _, id_master in merge_map})
+    logging.info(f"Fusão em lote: {grupos} grupos, {len(merge_map)} registros duplicados removidos.")
+    return grupos, len(merge_map)
\ No newline at end of file
@@ -6,9 +6,13 @@ from tkinter import messagebox
 from tag_definitions import TAG_DEFINITIONS
 import config
 
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
 class MiscRepository:
-    def __init__(self, conn: sqlite3.Connection):
-        self.conn = conn
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
         self.ui_tags = {}
         self._load_ui_tags()
 
@@ -47,7 +51,7 @@ class MiscRepository:
 
     def get_app_setting(self, key: str) -> str | None:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
             result = cursor.fetchone()
             return result['value'] if result else None
@@ -57,8 +61,8 @@ class MiscRepository:
 
     def save_app_setting(self, key: str, value: str) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)", (key, value))
             return True
         except sqlite3.Error as e:
@@ -67,7 +71,7 @@ class MiscRepository:
 
     def get_all_lists(self) -> list[dict]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT id_lista, nome, tipo FROM listas ORDER BY tipo, nome ASC")
             return [dict(row) for row in cursor.fetchall()]
         except sqlite3.Error: return []
@@ -81,7 +85,7 @@ class MiscRepository:
             return []
         
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             id_col_name = "id_tag" if table_name == "tags" else ("id_tema" if table_name == "temas" else "id")
             
             cursor.execute(f"SELECT {id_col_name} as id, nome FROM {table_name} ORDER BY nome ASC")
@@ -96,7 +100,7 @@ class MiscRepository:
         if not cidade: return None
         try:
             cidade_key = data_helpers.normalize_city_key(cidade)
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT sg_ue FROM municipios WHERE cidade_key = ?"
             cursor.execute(query, (cidade_key,))
             result = cursor.fetchone()
@@ -109,8 +113,8 @@ class MiscRepository:
     # Para garantir a completude, o restante das funções que você tinha serão adicionadas abaixo.
     def save_lista(self, nome: str, tipo: str) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("INSERT INTO listas (nome, tipo) VALUES (?, ?)", (nome, tipo))
             return True
         except sqlite3.IntegrityError:
@@ -123,8 +127,8 @@ class MiscRepository:
             messagebox.showerror("Ação Proibida", "Não é possível apagar as listas padrão.", parent=None)
             return False
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("DELETE FROM listas WHERE id_lista = ?", (list_id,))
                 return cursor.rowcount > 0
         except sqlite3.Error: return False
@@ -134,14 +138,14 @@ class MiscRepository:
 
     def get_anos_de_eleicao(self) -> list[str]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT DISTINCT ano_eleicao FROM candidaturas WHERE ano_eleicao IS NOT NULL ORDER BY ano_eleicao DESC")
             return [str(row['ano_eleicao']) for row in cursor.fetchall()]
         except sqlite3.Error: return []
 
     def get_cidades_por_ano(self, ano: int) -> list[str]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT COUNT(*) FROM candidaturas WHERE ano_eleicao = ? AND cargo IN ('PREFEITO', 'VEREADOR')", (ano,))
             is_municipal = cursor.fetchone()[0] > 0
             if is_municipal:
@@ -155,7 +159,7 @@ class MiscRepository:
 
     def get_city_list_from_db(self):
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT DISTINCT cidade FROM municipios WHERE cidade IS NOT NULL AND cidade != '' ORDER BY cidade ASC")
             return [row['cidade'] for row in cursor.fetchall()]
         except sqlite3.Error as e:
@@ -0,0 +1,177 @@
+"""
+Geocodificação offline no nível de município, a partir de uma tabela de centros (centroides) dos
+municípios (municipio_centroides), carregada inteira em memória.
+
+Endereços que só têm cidade/UF são resolvidos localmente, sem chamar a API; só os endereços com rua,
+número ou bairro seguem para o geocodificador remoto. A tabela é preenchida pelo arquivo de municípios
+do IBGE (codigo_ibge, nome, latitude, longitude, codigo_uf — o mesmo formato do conjunto público
+"Municípios Brasileiros"), lido de BUNDLED_CENTROIDS_PATH na primeira consulta com a tabela vazia ou
+importado pelas Configurações, e completada com o resultado das geocodificações remotas de cidades que
+ainda não estavam nela. Cada ponto gravado nas entidades leva o nível de precisão (geo_precisao), para
+que o mapa diferencie endereços exatos de pontos no centro da cidade.
+"""
+import os
+import csv
+import logging
+import sqlite3
+import threading
+
+import config
+from functions import data_helpers
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
+# Níveis de precisão gravados em pessoas/organizacoes.geo_precisao (NULL: coordenadas informadas à mão ou anteriores à v28)
+PRECISAO_ENDERECO = "endereco"
+PRECISAO_APROXIMADA = "aproximado"
+PRECISAO_CIDADE = "cidade"
+# location_type da API do Google que correspondem a um endereço exato
+EXACT_LOCATION_TYPES = {"ROOFTOP", "RANGE_INTERPOLATED"}
+
+ORIGEM_IBGE = "ibge"
+ORIGEM_GEOCODIFICADO = "geocodificado"
+BUNDLED_CENTROIDS_PATH = os.path.join(config.BASE_PATH, "data", "municipios_centroides.csv")
+DEFAULT_UF = "SP"
+
+# Código IBGE da UF (dois primeiros dígitos do código do município) -> sigla
+UF_BY_IBGE_CODE = {
+    "11": "RO", "12": "AC", "13": "AM", "14": "RR", "15": "PA", "16": "AP", "17": "TO",
+    "21": "MA", "22": "PI", "23": "CE", "24": "RN", "25": "PB", "26": "PE", "27": "AL", "28": "SE", "29": "BA",
+    "31": "MG", "32": "ES", "33": "RJ", "35": "SP", "41": "PR", "42": "SC", "43": "RS",
+    "50": "MS", "51": "MT", "52": "GO", "53": "DF",
+}
+# Nomes aceitos para cada coluna do arquivo de centroides
+CSV_COLUMNS = {
+    'cod_ibge': ('CODIGO_IBGE', 'COD_IBGE', 'COD.IBGE', 'CD_MUN'),
+    'nome': ('NOME', 'CIDADE', 'MUNICIPIO', 'NM_MUN'),
+    'uf': ('UF', 'SIGLA_UF', 'SG_UF'),
+    'latitude': ('LATITUDE', 'LAT'),
+    'longitude': ('LONGITUDE', 'LON', 'LNG'),
+}
+
+def precision_from_location_type(location_type: str | None) -> str:
+    return PRECISAO_ENDERECO if location_type in EXACT_LOCATION_TYPES else PRECISAO_APROXIMADA
+
+def centroid_key(cidade: str, uf: str | None) -> tuple[str, str]:
+    return data_helpers.normalize_city_key(cidade), (uf or "").strip().upper() or DEFAULT_UF
+
+def read_centroids_csv(filepath: str) -> list[tuple[str, str, str, float, float]]:
+    """Lê o arquivo de municípios e retorna (cidade_key, uf, cod_ibge, latitude, longitude) de cada linha válida."""
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+        reader = csv.reader(f, delimiter=delimiter)
+        header = [h.strip().upper() for h in next(reader, [])]
+        positions = {}
+        for column, names in CSV_COLUMNS.items():
+            positions[column] = next((header.index(n) for n in names if n in header), None)
+        missing = [c for c in ('nome', 'latitude', 'longitude') if positions[c] is None]
+        if missing or (positions['uf'] is None and positions['cod_ibge'] is None):
+            raise ValueError(f"O arquivo não tem as colunas de município, UF (ou código IBGE), latitude e longitude: {', '.join(header)}")
+
+        rows = []
+        for row in reader:
+            try:
+                nome = row[positions['nome']]
+                cod_ibge = row[positions['cod_ibge']].strip() if positions['cod_ibge'] is not None else ""
+                uf = row[positions['uf']].strip().upper() if positions['uf'] is not None else UF_BY_IBGE_CODE.get(cod_ibge[:2], "")
+                lat = float(row[positions['latitude']].replace(',', '.'))
+                lon = float(row[positions['longitude']].replace(',', '.'))
+            except (IndexError, ValueError):
+                continue
+            cidade_key = data_helpers.normalize_city_key(nome)
+            if cidade_key and uf:
+                rows.append((cidade_key, uf, cod_ibge or None, lat, lon))
+        return rows
+
+class OfflineGeocoder:
+    """Consulta e manutenção da tabela municipio_centroides. Seguro para uso por várias threads."""
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
+        self._centroids = None
+        # Incrementado por invalidate(): uma carga iniciada antes dele não é guardada
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[tuple[str, str], tuple[float, float]]:
+        with self._lock:
+            if self._centroids is not None:
+                return self._centroids
+            generation = self._generation
+        # Lida (e semeada) fora de self._lock: learn() toma o lock já dentro de pool.writer(), e a carga inicial
+        # da tabela toma pool.writer(); na mesma ordem inversa, as duas threads se travariam
+        try:
+            centroids = self._read_centroids()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logging.error(f"Erro ao carregar os centroides dos municípios: {e}", exc_info=True)
+            return {}
+        with self._lock:
+            if self._centroids is not None:
+                return self._centroids
+            if generation == self._generation:
+                self._centroids = centroids
+        logging.info(f"{len(centroids)} centroides de municípios carregados para a geocodificação offline.")
+        return centroids
+
+    def _read_centroids(self) -> dict[tuple[str, str], tuple[float, float]]:
+        cursor = self.pool.reader().cursor()
+        cursor.execute("SELECT 1 FROM municipio_centroides LIMIT 1")
+        if cursor.fetchone() is None and os.path.exists(BUNDLED_CENTROIDS_PATH):
+            logging.info(f"Carregando os centroides dos municípios de '{BUNDLED_CENTROIDS_PATH}'...")
+            self._save_ibge_rows(read_centroids_csv(BUNDLED_CENTROIDS_PATH))
+
+        cursor.execute("SELECT cidade_key, uf, cod_ibge, latitude, longitude FROM municipio_centroides")
+        centroids, by_cod = {}, {}
+        for cidade_key, uf, cod_ibge, lat, lon in cursor.fetchall():
+            centroids[(cidade_key, uf)] = (lat, lon)
+            if cod_ibge: by_cod[cod_ibge] = (lat, lon)
+        # Grafias da tabela de municípios (prefeituras) que diferem da do arquivo do IBGE, pelo código IBGE
+        cursor.execute("SELECT cidade_key, COALESCE(NULLIF(uf, ''), ?), cod_ibge FROM municipios WHERE cod_ibge IS NOT NULL AND cod_ibge != ''", (DEFAULT_UF,))
+        for cidade_key, uf, cod_ibge in cursor.fetchall():
+            if cod_ibge in by_cod: centroids.setdefault((cidade_key, uf), by_cod[cod_ibge])
+        return centroids
+
+    def invalidate(self):
+        with self._lock:
+            self._centroids = None
+            self._generation += 1
+
+    def lookup(self, cidade: str, uf: str | None) -> tuple[float, float] | None:
+        """Centro do município, ou None se ele não estiver na tabela."""
+        if not cidade or not cidade.strip(): return None
+        return self._load().get(centroid_key(cidade, uf))
+
+    def learn(self, entries):
+        """Grava (cidade, uf, latitude, longitude) de cidades geocodificadas remotamente que ainda não estão na tabela."""
+        rows = [(*centroid_key(cidade, uf), lat, lon) for cidade, uf, lat, lon in entries]
+        if not rows: return
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO municipio_centroides (cidade_key, uf, latitude, longitude, origem) VALUES (?, ?, ?, ?, ?)",
+                    [(*row, ORIGEM_GEOCODIFICADO) for row in rows])
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao gravar centroides de municípios: {e}", exc_info=True)
+            return
+        with self._lock:
+            if self._centroids is not None:
+                for cidade_key, uf, lat, lon in rows: self._centroids.setdefault((cidade_key, uf), (lat, lon))
+
+    def _save_ibge_rows(self, rows) -> int:
+        # Os dados do IBGE substituem os pontos aprendidos da API
+        with self.pool.writer() as conn:
+            conn.executemany(
+                """INSERT INTO municipio_centroides (cidade_key, uf, cod_ibge, latitude, longitude, origem) VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (cidade_key, uf) DO UPDATE SET cod_ibge = excluded.cod_ibge, latitude = excluded.latitude,
+                   longitude = excluded.longitude, origem = excluded.origem""",
+                [(*row, ORIGEM_IBGE) for row in rows])
+        return len(rows)
+
+    def import_csv(self, filepath: str) -> int:
+        """Importa o arquivo de municípios do IBGE. Retorna quantos municípios foram gravados."""
+        count = self._save_ibge_rows(read_centroids_csv(filepath))
+        self.invalidate()
+        return count
\ No newline at end of file
@@ -4,14 +4,24 @@ from tkinter import messagebox
 # MUDANÇA: Importa 'fields' para introspecção do dataclass
 from dataclasses import fields
 from dto.organizacao import Organizacao
+from . import pagination
+from .spatial_index import SpatialIndex
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
 
 class OrganizationRepository:
-    def __init__(self, conn: sqlite3.Connection):
-        self.conn = conn
+    # Máximo de IDs por consulta IN (...) ao carregar os resultados das buscas por raio/proximidade
+    GEO_FETCH_BATCH = 500
+
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
+        self.spatial = SpatialIndex(pool, "organizacoes", "id_organizacao")
 
     def get_all_organizacoes(self, search_term: str = "", limit: int = 50, offset: int = 0) -> list[Organizacao]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             params = []
             query = "SELECT id_organizacao, nome_fantasia, cnpj, telefone, cidade FROM organizacoes"
             if search_term:
@@ -25,9 +35,43 @@ class OrganizationRepository:
             logging.error(f"Erro ao buscar lista de organizações: {e}", exc_info=True)
             return []
 
+    def get_organizacoes_page(self, search_term: str = "", limit: int = 50, cursor: str | None = None, backwards: bool = False) -> tuple[list[Organizacao], str | None, str | None]:
+        """
+        Versão por chave (seek) de get_all_organizacoes, na mesma ordem (nome_fantasia).
+        Retorna (organizações, cursor_do_primeiro_registro, cursor_do_último_registro); veja PersonRepository.get_pessoas_page.
+        """
+        try:
+            db_cursor = self.pool.reader().cursor()
+            rows = []
+            for seek_sql, seek_params, order_sql in pagination.seek_steps("nome_fantasia", "id_organizacao", backwards, pagination.decode_cursor(cursor)):
+                params, where_clauses = [], []
+                if search_term:
+                    where_clauses.append("(nome_fantasia LIKE ? OR razao_social LIKE ?)")
+                    params.extend([f"%{search_term}%", f"%{search_term}%"])
+                if seek_sql:
+                    where_clauses.append(seek_sql)
+                    params.extend(seek_params)
+
+                query = "SELECT id_organizacao, nome_fantasia, cnpj, telefone, cidade FROM organizacoes"
+                if where_clauses:
+                    query += " WHERE " + " AND ".join(where_clauses)
+                query += f" ORDER BY {order_sql} LIMIT ?"
+                params.append(limit - len(rows))
+                db_cursor.execute(query, tuple(params))
+                rows.extend(db_cursor.fetchall())
+                if len(rows) >= limit: break
+            if backwards: rows.reverse()
+            if not rows: return [], None, None
+
+            def row_cursor(row): return pagination.encode_cursor([row['nome_fantasia'], row['id_organizacao']])
+            return [Organizacao.from_dict(dict(row)) for row in rows], row_cursor(rows[0]), row_cursor(rows[-1])
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao buscar página de organizações: {e}", exc_info=True)
+            return [], None, None
+
     def count_organizacoes(self, search_term: str = "") -> int:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             params = []
             query = "SELECT COUNT(id_organizacao) FROM organizacoes"
             if search_term:
@@ -40,9 +84,24 @@ class OrganizationRepository:
             logging.error(f"Erro ao contar organizações: {e}", exc_info=True)
             return 0
 
+    def count_organizacoes_bounded(self, limit: int, search_term: str = "") -> int:
+        """Conta as organizações que atendem à busca, parando em `limit` + 1."""
+        try:
+            cursor = self.pool.reader().cursor()
+            params = []
+            query = "SELECT 1 FROM organizacoes"
+            if search_term:
+                query += " WHERE nome_fantasia LIKE ? OR razao_social LIKE ?"
+                params.extend([f"%{search_term}%", f"%{search_term}%"])
+            cursor.execute(f"SELECT COUNT(*) FROM ({query} LIMIT ?)", (*params, limit + 1))
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao contar organizações (limitado): {e}", exc_info=True)
+            return 0
+
     def get_organization_details(self, org_id: int) -> Organizacao | None:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT * FROM organizacoes WHERE id_organizacao = ?", (org_id,))
             row = cursor.fetchone()
             return Organizacao.from_dict(dict(row)) if row else None
@@ -61,8 +120,8 @@ class OrganizationRepository:
             data['cnpj'] = None
         
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 if org.id_organizacao == 0:
                     valid_data = {k: v for k, v in data.items() if v is not None and v != ''}
                     columns = ', '.join(valid_data.keys())
@@ -87,8 +146,8 @@ class OrganizationRepository:
     def delete_organizacao(self, id_organizacao: int) -> bool:
         if not id_organizacao: return False
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("DELETE FROM organizacoes WHERE id_organizacao = ?", (id_organizacao,))
                 return cursor.rowcount > 0
         except sqlite3.Error:
@@ -96,10 +155,50 @@ class OrganizationRepository:
         
     def get_all_geocoded_organizacoes(self) -> list[Organizacao]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT * FROM organizacoes WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND geo_visivel = 1"
             cursor.execute(query)
             return [Organizacao.from_dict(dict(row)) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             logging.error(f"Erro ao buscar organizações geocodificadas: {e}", exc_info=True)
-            return []
\ No newline at end of file
+            return []
+
+    def get_geocoded_organizacoes_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: int | None = None) -> list[Organizacao]:
+        """Organizações exibíveis no mapa dentro da caixa (graus), pelo índice espacial."""
+        try:
+            cursor = self.pool.reader().cursor()
+            query = f"""
+                SELECT o.* FROM {self.spatial.geo_table} g JOIN organizacoes o ON o.id_organizacao = g.id
+                WHERE {self.spatial.bbox_filter_sql()} AND o.latitude BETWEEN ? AND ? AND o.longitude BETWEEN ? AND ?
+                LIMIT ?
+            """
+            cursor.execute(query, (min_lat, max_lat, min_lon, max_lon, min_lat, max_lat, min_lon, max_lon, -1 if limit is None else limit))
+            return [Organizacao.from_dict(dict(row)) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao buscar organizações na área do mapa: {e}", exc_info=True)
+            return []
+
+    def get_organizacoes_within_radius(self, lat: float, lon: float, radius_km: float, limit: int | None = None) -> list[tuple[Organizacao, float]]:
+        """[(organização, distância_km)] a até `radius_km` do ponto, da mais próxima à mais distante."""
+        try:
+            return self._get_geocoded_organizacoes_by_distance(self.spatial.within_radius(lat, lon, radius_km, limit))
+        except sqlite3.Error as e:
+            logging.error(f"Erro na busca de organizações por raio: {e}", exc_info=True)
+            return []
+
+    def get_nearest_organizacoes(self, lat: float, lon: float, k: int = 10) -> list[tuple[Organizacao, float]]:
+        """[(organização, distância_km)] das `k` organizações mais próximas do ponto, da mais próxima à mais distante."""
+        try:
+            return self._get_geocoded_organizacoes_by_distance(self.spatial.nearest(lat, lon, k))
+        except sqlite3.Error as e:
+            logging.error(f"Erro na busca das organizações mais próximas: {e}", exc_info=True)
+            return []
+
+    def _get_geocoded_organizacoes_by_distance(self, hits: list[tuple[int, float]]) -> list[tuple[Organizacao, float]]:
+        cursor = self.pool.reader().cursor()
+        orgs = {}
+        for start in range(0, len(hits), self.GEO_FETCH_BATCH):
+            ids = [id_org for id_org, _ in hits[start:start + self.GEO_FETCH_BATCH]]
+            cursor.execute(f"SELECT * FROM organizacoes WHERE id_organizacao IN ({','.join('?' * len(ids))})", ids)
+            orgs.update((row['id_organizacao'], Organizacao.from_dict(dict(row))) for row in cursor.fetchall())
+        return [(orgs[id_org], distance) for id_org, distance in hits if id_org in orgs]
\ No newline at end of file
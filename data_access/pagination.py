@@ -0,0 +1,47 @@
+"""
+Utilitários de paginação por chave (keyset/seek) compartilhados pelos repositórios.
+
+Em vez de LIMIT/OFFSET, cada página continua a partir da chave de ordenação (valor + id) do
+último registro exibido, então a página 400 custa o mesmo que a primeira. A chave é entregue à
+interface como um cursor opaco (JSON em base64) que só precisa ser devolvido ao repositório.
+"""
+import json
+import base64
+import logging
+
+def encode_cursor(data) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str | None):
+    if not cursor: return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        logging.warning(f"Cursor de paginação inválido ignorado: {e}")
+        return None
+
+def seek_steps(sort_sql: str, id_sql: str, descending: bool, key: list | None) -> list[tuple[str, list, str]]:
+    """
+    Retorna as consultas (condição, parâmetros, ORDER BY) que, executadas em sequência até completar a
+    página, continuam a listagem logo após `key` = [valor, id] na ordem (sort_sql, id_sql).
+    São duas etapas: primeiro os empates no mesmo valor (`s = ? AND id > ?`, que o SQLite resolve
+    direto no índice da coluna de ordenação, já que o rowid faz parte do índice) e depois os valores
+    seguintes (`s > ?`). Uma única condição com OR obrigaria o SQLite a percorrer todos os empates,
+    o que é caro em colunas com muitos valores vazios (apelido, celular).
+    """
+    op = "<" if descending else ">"
+    if not key:
+        return [("", [], order_clause(sort_sql, id_sql, descending))]
+    sort_value, id_value = key
+    if sort_sql == id_sql:
+        return [(f"{id_sql} {op} ?", [id_value], order_clause(sort_sql, id_sql, descending))]
+    return [
+        (f"{sort_sql} = ? AND {id_sql} {op} ?", [sort_value, id_value], order_clause(id_sql, id_sql, descending)),
+        (f"{sort_sql} {op} ?", [sort_value], order_clause(sort_sql, id_sql, descending)),
+    ]
+
+def order_clause(sort_sql: str, id_sql: str, descending: bool) -> str:
+    direction = "DESC" if descending else "ASC"
+    if sort_sql == id_sql:
+        return f"{id_sql} {direction}"
+    return f"{sort_sql} {direction}, {id_sql} {direction}"
\ No newline at end of file
@@ -4,30 +4,68 @@ from tkinter import messagebox
 from dto.pessoa import Pessoa
 from dto.candidatura import Candidatura
 from functions import data_helpers
+import database_setup
+from . import pagination
+from .spatial_index import SpatialIndex
 import os
 from pathlib import Path
 import config
 
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
 class PersonRepository:
-    def __init__(self, conn: sqlite3.Connection):
-        self.conn = conn
+    # Acima deste número de resultados a busca textual deixa de ordenar por bm25 (que precisa pontuar
+    # cada resultado) e passa a listar os mais recentes, que o FTS5 entrega direto na ordem do índice.
+    FTS_RANK_LIMIT = 2000
+
+    # Expressões de ordenação da paginação por chave. NULL vira '' para que a comparação com a chave
+    # funcione; os índices de expressão correspondentes são criados no schema (v22).
+    SEEK_SORT_KEYS = {"ID": "p.id_pessoa", "Nome": "p.nome", "Apelido": "COALESCE(p.apelido, '')", "Celular": "COALESCE(p.celular, '')", "Cidade": "COALESCE(c.cidade, '')"}
+
+    # Colunas e junção da listagem do mapa (pessoa + candidatura mais recente), comuns às consultas geográficas
+    GEO_COLUMNS = "p.*, c.id_candidatura, c.ano_eleicao, c.sq_candidato, c.nome_urna, c.numero_urna, c.partido, c.cargo, c.votos, c.situacao"
+    GEO_CANDIDATURA_JOIN = "LEFT JOIN pessoa_candidatura_recente pcr ON p.id_pessoa = pcr.id_pessoa LEFT JOIN candidaturas c ON pcr.id_candidatura = c.id_candidatura"
+    # Máximo de IDs por consulta IN (...) ao carregar os resultados das buscas por raio/proximidade
+    GEO_FETCH_BATCH = 500
+
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
+        self.spatial = SpatialIndex(pool, "pessoas", "id_pessoa")
+
+    def _fts_match_count(self, fts_query: str, limit: int | None = None) -> int:
+        """Conta os resultados da busca textual, parando em `limit` quando informado."""
+        cursor = self.pool.reader().cursor()
+        if limit is None:
+            cursor.execute("SELECT COUNT(*) FROM pessoas_fts WHERE pessoas_fts MATCH ?", (fts_query,))
+        else:
+            cursor.execute("SELECT COUNT(*) FROM (SELECT 1 FROM pessoas_fts WHERE pessoas_fts MATCH ? LIMIT ?)", (fts_query, limit))
+        return cursor.fetchone()[0]
+
+    def _fts_order_sql(self, filters: dict) -> str:
+        """Ordenação por relevância da busca textual (bm25), ou pelos mais recentes quando há resultados demais."""
+        fts_query = data_helpers.build_fts_query(filters.get('search_term'))
+        if self._fts_match_count(fts_query, self.FTS_RANK_LIMIT + 1) <= self.FTS_RANK_LIMIT:
+            # bm25: quanto menor, mais relevante. Nome pesa mais que apelido, que pesa mais que nome de urna.
+            return "bm25(pessoas_fts, 10.0, 5.0, 2.0), p.id_pessoa DESC"
+        return "pessoas_fts.rowid DESC"
 
     def _build_from_where_clauses(self, **filters) -> tuple[str, list]:
-        from_clause = """
-            FROM pessoas p
-            LEFT JOIN (
-                SELECT *, ROW_NUMBER() OVER (PARTITION BY id_pessoa ORDER BY ano_eleicao DESC) as rn
-                FROM candidaturas
-            ) c ON p.id_pessoa = c.id_pessoa AND c.rn = 1
-        """
-        
         where_clauses = []
         params = []
+        fts_join = ""
         
         search_term = filters.get('search_term')
         if search_term:
-            where_clauses.append("(p.nome LIKE ? OR p.apelido LIKE ?)")
-            params.extend([f"%{search_term}%", f"%{search_term}%"])
+            fts_query = data_helpers.build_fts_query(search_term)
+            if fts_query:
+                fts_join = "JOIN pessoas_fts ON pessoas_fts.rowid = p.id_pessoa"
+                where_clauses.append("pessoas_fts MATCH ?")
+                params.append(fts_query)
+            else:
+                where_clauses.append("(p.nome LIKE ? OR p.apelido LIKE ?)")
+                params.extend([f"%{search_term}%", f"%{search_term}%"])
         
         cidade = filters.get('cidade')
         if cidade and cidade.upper() != "TODAS":
@@ -49,6 +87,16 @@ class PersonRepository:
             params.append(cargo)
         # --- FIM DAS MUDANÇAS ---
 
+        # Com filtro sobre a candidatura, pessoas sem candidatura nunca entram no resultado: o JOIN interno
+        # permite ao SQLite começar pelos índices de 'candidaturas' em vez de percorrer todas as pessoas.
+        join_type = "JOIN" if any(clause.startswith("c.") for clause in where_clauses) else "LEFT JOIN"
+        from_clause = f"""
+            FROM pessoas p
+            {fts_join}
+            {join_type} pessoa_candidatura_recente pcr ON p.id_pessoa = pcr.id_pessoa
+            {join_type} candidaturas c ON pcr.id_candidatura = c.id_candidatura
+        """
+
         where_sql = ""
         if where_clauses:
             where_sql = " WHERE " + " AND ".join(where_clauses)
@@ -65,23 +113,77 @@ class PersonRepository:
             sort_column_sql = sort_map.get(sort_by, "p.id_pessoa")
             sort_direction = "DESC" if sort_desc else "ASC"
             
-            query += f" ORDER BY {sort_column_sql} {sort_direction} LIMIT ? OFFSET ?"
+            if sort_by == "Relevância" and "pessoas_fts" in from_where_sql:
+                query += f" ORDER BY {self._fts_order_sql(filters)} LIMIT ? OFFSET ?"
+            else:
+                query += f" ORDER BY {sort_column_sql} {sort_direction} LIMIT ? OFFSET ?"
             offset = (page - 1) * items_per_page
             params.extend([items_per_page, offset])
 
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute(query, tuple(params))
             return [Pessoa.from_dict(dict(row)) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             logging.error(f"Erro ao buscar lista paginada de pessoas: {e}", exc_info=True)
             return []
 
+    def get_pessoas_page(self, items_per_page: int = 50, sort_by: str = "ID", sort_desc: bool = True, cursor: str | None = None, backwards: bool = False, **filters) -> tuple[list[Pessoa], str | None, str | None]:
+        """
+        Paginação por chave (seek): a página começa logo após o registro indicado pelo `cursor`
+        (ou logo antes dele, com backwards=True), sem OFFSET. Sem cursor, retorna a primeira página,
+        ou a última quando backwards=True.
+        Retorna (pessoas, cursor_do_primeiro_registro, cursor_do_último_registro).
+        """
+        try:
+            from_where_sql, params = self._build_from_where_clauses(**filters)
+            selection = "p.*, c.id_candidatura, c.ano_eleicao, c.sq_candidato, c.nome_urna, c.numero_urna, c.partido, c.cargo, c.votos, c.situacao, c.cidade as cidade_candidatura_recente, CASE WHEN c.sq_candidato IS NOT NULL THEN 1 ELSE 0 END as is_candidate"
+            cursor_data = pagination.decode_cursor(cursor) or {}
+            db_cursor = self.pool.reader().cursor()
+
+            if sort_by == "Relevância" and "pessoas_fts" in from_where_sql:
+                # A ordem por relevância não tem uma chave indexável: o cursor guarda a posição do registro.
+                limit, offset = items_per_page, 0
+                if "o" in cursor_data and backwards:
+                    limit, offset = min(items_per_page, cursor_data["o"]), max(0, cursor_data["o"] - items_per_page)
+                elif "o" in cursor_data:
+                    offset = cursor_data["o"] + 1
+                elif backwards:
+                    offset = max(0, self.count_pessoas(**filters) - items_per_page)
+                db_cursor.execute(f"SELECT {selection} {from_where_sql} ORDER BY {self._fts_order_sql(filters)} LIMIT ? OFFSET ?", (*params, limit, offset))
+                pessoas = [Pessoa.from_dict(dict(row)) for row in db_cursor.fetchall()]
+                if not pessoas: return [], None, None
+                return pessoas, pagination.encode_cursor({"o": offset}), pagination.encode_cursor({"o": offset + len(pessoas) - 1})
+
+            sort_sql = self.SEEK_SORT_KEYS.get(sort_by, "p.id_pessoa")
+            descending = sort_desc != backwards
+            key = cursor_data.get("k") if cursor_data.get("s") == sort_by else None
+            rows = []
+            for seek_sql, seek_params, order_sql in pagination.seek_steps(sort_sql, "p.id_pessoa", descending, key):
+                step_sql = from_where_sql
+                if seek_sql:
+                    step_sql += (" AND " if " WHERE " in from_where_sql else " WHERE ") + seek_sql
+                query = f"SELECT {selection}, {sort_sql} as sort_key {step_sql} ORDER BY {order_sql} LIMIT ?"
+                db_cursor.execute(query, (*params, *seek_params, items_per_page - len(rows)))
+                rows.extend(db_cursor.fetchall())
+                if len(rows) >= items_per_page: break
+            if backwards: rows.reverse()
+            if not rows: return [], None, None
+
+            def row_cursor(row): return pagination.encode_cursor({"s": sort_by, "k": [row['sort_key'], row['id_pessoa']]})
+            return [Pessoa.from_dict(dict(row)) for row in rows], row_cursor(rows[0]), row_cursor(rows[-1])
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao buscar página de pessoas: {e}", exc_info=True)
+            return [], None, None
+
     def count_pessoas(self, **filters) -> int:
         try:
             from_where_sql, params = self._build_from_where_clauses(**filters)
+            if len(params) == 1 and from_where_sql.rstrip().endswith("WHERE pessoas_fts MATCH ?"):
+                # Só a busca textual está ativa: o índice FTS tem exatamente uma linha por pessoa, então a contagem é feita nele
+                return self._fts_match_count(params[0])
             query = f"SELECT COUNT(p.id_pessoa) {from_where_sql}"
 
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute(query, tuple(params))
             result = cursor.fetchone()
             return result[0] if result else 0
@@ -89,21 +191,30 @@ class PersonRepository:
             logging.error(f"Erro ao contar pessoas: {e}", exc_info=True)
             return 0
     
+    def count_pessoas_bounded(self, limit: int, **filters) -> int:
+        """Conta as pessoas que atendem aos filtros, parando em `limit` + 1 (mais barato que a contagem exata)."""
+        try:
+            from_where_sql, params = self._build_from_where_clauses(**filters)
+            cursor = self.pool.reader().cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM (SELECT 1 {from_where_sql} LIMIT ?)", (*params, limit + 1))
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao contar pessoas (limitado): {e}", exc_info=True)
+            return 0
+
     def get_person_details(self, person_id: int) -> Pessoa | None:
         try:
             selection = "p.*, c.id_candidatura, c.ano_eleicao, c.sq_candidato, c.nome_urna, c.numero_urna, c.partido, c.cargo, c.votos, c.situacao, o.nome_fantasia as nome_organizacao_trabalho, t.nome as nome_tratamento"
             base_query = """
                 FROM pessoas p
-                LEFT JOIN (
-                    SELECT *, ROW_NUMBER() OVER (PARTITION BY id_pessoa ORDER BY ano_eleicao DESC) as rn
-                    FROM candidaturas
-                ) c ON p.id_pessoa = c.id_pessoa AND c.rn = 1
+                LEFT JOIN pessoa_candidatura_recente pcr ON p.id_pessoa = pcr.id_pessoa
+                LEFT JOIN candidaturas c ON pcr.id_candidatura = c.id_candidatura
                 LEFT JOIN organizacoes o ON p.id_organizacao_trabalho = o.id_organizacao
                 LEFT JOIN tratamentos t ON p.id_tratamento = t.id
                 WHERE p.id_pessoa = ?
             """
             query = f"SELECT {selection} {base_query}"
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute(query, (person_id,))
             person_row = cursor.fetchone()
             if not person_row: return None
@@ -120,12 +231,17 @@ class PersonRepository:
 
     def search_candidaturas(self, search_term: str, criteria: str, ano_ref: int | str) -> list[Candidatura]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT p.*, c.* FROM pessoas p JOIN candidaturas c ON p.id_pessoa = c.id_pessoa"
             params, where_clauses = [], []
             if criteria == 'Nome':
-                where_clauses.append("(p.nome LIKE ? OR p.apelido LIKE ?)")
-                params.extend([f'%{search_term}%', f'%{search_term}%'])
+                fts_query = data_helpers.build_fts_query(search_term)
+                if fts_query:
+                    where_clauses.append("p.id_pessoa IN (SELECT rowid FROM pessoas_fts WHERE pessoas_fts MATCH ?)")
+                    params.append(fts_query)
+                else:
+                    where_clauses.append("(p.nome LIKE ? OR p.apelido LIKE ?)")
+                    params.extend([f'%{search_term}%', f'%{search_term}%'])
             elif criteria == 'Partido':
                 where_clauses.append("c.partido LIKE ?")
                 params.append(f'%{search_term}%')
@@ -150,7 +266,7 @@ class PersonRepository:
         Esta função é otimizada para o módulo Cerimonial.
         """
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cidade_key = data_helpers.normalize_city_key(cidade)
             
             situacao_placeholders = ','.join(['?'] * len(situacoes))
@@ -177,9 +293,30 @@ class PersonRepository:
             logging.error(f"Erro ao buscar candidaturas por cidade exata ({cidade}/{ano}/{cargo}): {e}", exc_info=True)
             return []        
 
+    def rebuild_candidaturas_recentes(self) -> bool:
+        """
+        Recalcula por completo a tabela 'pessoa_candidatura_recente'.
+        Os gatilhos já a mantêm atualizada linha a linha; esta rotina é chamada após cargas em massa
+        (importações e correção de duplicatas) para garantir a consistência de uma só vez.
+        Dentro de uma transação maior, use `_rebuild_candidaturas_recentes(cursor)`, que propaga o erro.
+        """
+        try:
+            with self.pool.writer() as conn:
+                self._rebuild_candidaturas_recentes(conn.cursor())
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao reconstruir a tabela de candidaturas recentes: {e}", exc_info=True)
+            return False
+
+    def _rebuild_candidaturas_recentes(self, cursor):
+        """Recalcula 'pessoa_candidatura_recente' na transação do cursor; um erro desfaz também o DELETE, junto com a transação de quem chamou."""
+        cursor.execute("DELETE FROM pessoa_candidatura_recente")
+        cursor.execute(database_setup.REBUILD_CANDIDATURA_RECENTE_SQL)
+        logging.info(f"Tabela 'pessoa_candidatura_recente' reconstruída com {cursor.rowcount} registros.")
+
     def get_candidaturas_for_pessoa(self, id_pessoa: int) -> list[dict]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT * FROM candidaturas WHERE id_pessoa = ? ORDER BY ano_eleicao DESC"
             cursor.execute(query, (id_pessoa,))
             return [dict(row) for row in cursor.fetchall()]
@@ -199,8 +336,8 @@ class PersonRepository:
         if 'cpf' in data and data['cpf'] == '': data['cpf'] = None
         
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 if pessoa.id_pessoa == 0:
                     valid_data = {k: v for k, v in data.items() if v is not None and v != ''}
                     columns = ', '.join(valid_data.keys())
@@ -224,8 +361,8 @@ class PersonRepository:
     def delete_pessoa(self, id_pessoa: int) -> bool:
         if not id_pessoa: return False
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("DELETE FROM pessoas WHERE id_pessoa = ?", (id_pessoa,))
                 return cursor.rowcount > 0
         except sqlite3.Error:
@@ -233,8 +370,8 @@ class PersonRepository:
 
     def update_pessoa_photo_path(self, person_id: int, photo_path: str | None) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("UPDATE pessoas SET caminho_foto = ? WHERE id_pessoa = ?", (photo_path, person_id))
             return True
         except sqlite3.Error:
@@ -242,7 +379,7 @@ class PersonRepository:
 
     def get_relacionamentos_for_pessoa(self, person_id: int) -> list[dict]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             query = "SELECT r.id_relacionamento, r.tipo_relacao, r.id_pessoa_destino, p.nome as nome_pessoa_destino FROM relacionamentos r JOIN pessoas p ON r.id_pessoa_destino = p.id_pessoa WHERE r.id_pessoa_origem = ?"
             cursor.execute(query, (person_id,))
             return [dict(row) for row in cursor.fetchall()]
@@ -256,8 +393,8 @@ class PersonRepository:
             "Irmão/Irmã": "Irmão/Irmã", "Assessor(a)": "Assessorado(a)", "Assessorado(a)": "Assessor(a)", "Sócio(a)": "Sócio(a)"
         }
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("INSERT OR IGNORE INTO relacionamentos (id_pessoa_origem, id_pessoa_destino, tipo_relacao) VALUES (?, ?, ?)", (id_origem, id_destino, tipo_relacao))
                 tipo_reciproco = mapa_reciproco.get(tipo_relacao)
                 if tipo_reciproco and tipo_reciproco != "Pai/Mãe":
@@ -269,8 +406,8 @@ class PersonRepository:
 
     def delete_relacionamento(self, id_relacionamento: int) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("DELETE FROM relacionamentos WHERE id_relacionamento = ?", (id_relacionamento,))
             return cursor.rowcount > 0
         except sqlite3.Error as e:
@@ -278,7 +415,7 @@ class PersonRepository:
 
     def get_list_ids_for_pessoa(self, person_id: int) -> list[int]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT id_lista FROM pessoa_listas_assoc WHERE id_pessoa = ?", (person_id,))
             return [row['id_lista'] for row in cursor.fetchall()]
         except sqlite3.Error:
@@ -286,8 +423,8 @@ class PersonRepository:
 
     def update_list_associations_for_pessoa(self, person_id: int, list_ids: list[int]):
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("DELETE FROM pessoa_listas_assoc WHERE id_pessoa = ?", (person_id,))
                 if list_ids:
                     associations_to_insert = [(person_id, list_id) for list_id in list_ids]
@@ -298,14 +435,10 @@ class PersonRepository:
             
     def get_all_geocoded_pessoas(self) -> list[Pessoa]:
         try:
-            cursor = self.conn.cursor()
-            query = """
-                SELECT p.*, c.id_candidatura, c.ano_eleicao, c.sq_candidato, c.nome_urna, c.numero_urna, c.partido, c.cargo, c.votos, c.situacao
-                FROM pessoas p
-                LEFT JOIN (
-                    SELECT *, ROW_NUMBER() OVER (PARTITION BY id_pessoa ORDER BY ano_eleicao DESC) as rn
-                    FROM candidaturas
-                ) c ON p.id_pessoa = c.id_pessoa AND c.rn = 1
+            cursor = self.pool.reader().cursor()
+            query = f"""
+                SELECT {self.GEO_COLUMNS}
+                FROM pessoas p {self.GEO_CANDIDATURA_JOIN}
                 WHERE p.latitude IS NOT NULL AND p.longitude IS NOT NULL AND p.geo_visivel = 1
             """
             cursor.execute(query)
@@ -313,14 +446,55 @@ class PersonRepository:
         except sqlite3.Error as e:
             logging.error(f"Erro ao buscar pessoas geocodificadas: {e}")
             return []
+
+    def get_geocoded_pessoas_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: int | None = None) -> list[Pessoa]:
+        """Pessoas exibíveis no mapa dentro da caixa (graus), pelo índice espacial."""
+        try:
+            cursor = self.pool.reader().cursor()
+            query = f"""
+                SELECT {self.GEO_COLUMNS}
+                FROM {self.spatial.geo_table} g JOIN pessoas p ON p.id_pessoa = g.id {self.GEO_CANDIDATURA_JOIN}
+                WHERE {self.spatial.bbox_filter_sql()} AND p.latitude BETWEEN ? AND ? AND p.longitude BETWEEN ? AND ?
+                LIMIT ?
+            """
+            cursor.execute(query, (min_lat, max_lat, min_lon, max_lon, min_lat, max_lat, min_lon, max_lon, -1 if limit is None else limit))
+            return [Pessoa.from_dict(dict(row)) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao buscar pessoas na área do mapa: {e}")
+            return []
+
+    def get_pessoas_within_radius(self, lat: float, lon: float, radius_km: float, limit: int | None = None) -> list[tuple[Pessoa, float]]:
+        """[(pessoa, distância_km)] a até `radius_km` do ponto, da mais próxima à mais distante."""
+        try:
+            return self._get_geocoded_pessoas_by_distance(self.spatial.within_radius(lat, lon, radius_km, limit))
+        except sqlite3.Error as e:
+            logging.error(f"Erro na busca de pessoas por raio: {e}")
+            return []
+
+    def get_nearest_pessoas(self, lat: float, lon: float, k: int = 10) -> list[tuple[Pessoa, float]]:
+        """[(pessoa, distância_km)] das `k` pessoas mais próximas do ponto, da mais próxima à mais distante."""
+        try:
+            return self._get_geocoded_pessoas_by_distance(self.spatial.nearest(lat, lon, k))
+        except sqlite3.Error as e:
+            logging.error(f"Erro na busca das pessoas mais próximas: {e}")
+            return []
+
+    def _get_geocoded_pessoas_by_distance(self, hits: list[tuple[int, float]]) -> list[tuple[Pessoa, float]]:
+        cursor = self.pool.reader().cursor()
+        pessoas = {}
+        for start in range(0, len(hits), self.GEO_FETCH_BATCH):
+            ids = [id_pessoa for id_pessoa, _ in hits[start:start + self.GEO_FETCH_BATCH]]
+            cursor.execute(f"SELECT {self.GEO_COLUMNS} FROM pessoas p {self.GEO_CANDIDATURA_JOIN} WHERE p.id_pessoa IN ({','.join('?' * len(ids))})", ids)
+            pessoas.update((row['id_pessoa'], Pessoa.from_dict(dict(row))) for row in cursor.fetchall())
+        return [(pessoas[id_pessoa], distance) for id_pessoa, distance in hits if id_pessoa in pessoas]
     
     # --- MÉTODO ALTERADO ---
     def clear_person_photo_path(self, person_id: int) -> bool:
         """Define o caminho_foto de uma pessoa como NULL e apaga o arquivo físico."""
         photo_path_to_delete = None
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 # 1. Busca o caminho do arquivo antes de apagar do DB
                 cursor.execute("SELECT caminho_foto FROM pessoas WHERE id_pessoa = ?", (person_id,))
                 result = cursor.fetchone()
@@ -0,0 +1,131 @@
+import sqlite3
+import logging
+import threading
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+    from .misc_repository import MiscRepository
+
+class ReferenceDataCache:
+    """
+    Cache dos dados de referência lidos a todo momento pela interface e pelas importações: tabelas de
+    lookup (tratamentos, profissões, ...), anos de eleição, cidades e configurações do aplicativo.
+
+    Cada conjunto é carregado do banco na primeira consulta e reaproveitado até `invalidate()`, que é
+    chamado pelo evento 'data_changed' e ao final das importações. As tabelas de lookup têm mapas nos
+    dois sentidos (id -> nome e nome -> id), e `get_or_create_ids` cria de uma vez os nomes que faltam.
+    """
+    # Tabela de lookup -> coluna de id (todas têm 'nome' UNIQUE)
+    LOOKUP_TABLES = {"tratamentos": "id", "profissoes": "id", "escolaridades": "id", "temas": "id_tema", "tags": "id_tag"}
+    # Limite de parâmetros por consulta 'IN (...)' ao buscar os ids criados
+    BATCH_SIZE = 500
+    _MISSING = object()
+
+    def __init__(self, pool: 'ConnectionPool', misc_repo: 'MiscRepository'):
+        self.pool = pool
+        self.misc_repo = misc_repo
+        self._lock = threading.Lock()
+        self._lookups: dict[str, tuple[dict[int, str], dict[str, int]]] = {}
+        self._anos: list[str] | None = None
+        self._cidades: list[str] | None = None
+        self._cidades_por_ano: dict[int, list[str]] = {}
+        self._settings: dict[str, str | None] = {}
+
+    # --- Tabelas de lookup ---
+    def _lookup(self, table_name: str) -> tuple[dict[int, str], dict[str, int]]:
+        with self._lock:
+            maps = self._lookups.get(table_name)
+        if maps is None:
+            rows = self.misc_repo.get_lookup_table_data(table_name)
+            # Ordenado por nome, como em get_lookup_table_data
+            maps = ({row['id']: row['nome'] for row in rows}, {row['nome']: row['id'] for row in rows})
+            with self._lock:
+                maps = self._lookups.setdefault(table_name, maps)
+        return maps
+
+    def lookup_names(self, table_name: str) -> list[str]:
+        """Nomes da tabela de lookup em ordem alfabética."""
+        return list(self._lookup(table_name)[1])
+
+    def id_to_name(self, table_name: str) -> dict[int, str]:
+        return dict(self._lookup(table_name)[0])
+
+    def name_to_id(self, table_name: str) -> dict[str, int]:
+        return dict(self._lookup(table_name)[1])
+
+    def get_or_create_ids(self, cursor, table_name: str, names) -> dict[str, int]:
+        """
+        Retorna {nome: id} para os nomes pedidos (vazios são ignorados), criando de uma vez os que ainda não
+        existem. Usa o cursor da transação de escrita de quem chama; se ela for desfeita, chame `invalidate()`.
+        """
+        id_col = self.LOOKUP_TABLES.get(table_name)
+        if not id_col: return {}
+        by_id, by_name = self._lookup(table_name)
+        wanted = {name for name in names if name}
+        result = {name: by_name[name] for name in wanted if name in by_name}
+        missing = sorted(wanted - result.keys())
+        if not missing: return result
+
+        cursor.executemany(f"INSERT OR IGNORE INTO {table_name} (nome) VALUES (?)", [(name,) for name in missing])
+        for start in range(0, len(missing), self.BATCH_SIZE):
+            batch = missing[start:start + self.BATCH_SIZE]
+            cursor.execute(f"SELECT {id_col} AS id, nome FROM {table_name} WHERE nome IN ({', '.join(['?'] * len(batch))})", batch)
+            for row in cursor.fetchall():
+                result[row['nome']] = row['id']
+        with self._lock:
+            # Novos nomes entram no fim: lookup_names só volta à ordem alfabética depois de invalidate()
+            for name in missing:
+                if name in result:
+                    by_name[name] = result[name]
+                    by_id[result[name]] = name
+        logging.info(f"{len(missing)} novos registros criados na tabela '{table_name}'.")
+        return result
+
+    # --- Anos e cidades ---
+    def get_anos_de_eleicao(self) -> list[str]:
+        if self._anos is None:
+            self._anos = self.misc_repo.get_anos_de_eleicao()
+        return list(self._anos)
+
+    def get_city_list(self) -> list[str]:
+        if self._cidades is None:
+            self._cidades = self.misc_repo.get_city_list_from_db()
+        return list(self._cidades)
+
+    def get_cidades_por_ano(self, ano: int) -> list[str]:
+        cidades = self._cidades_por_ano.get(ano)
+        if cidades is None:
+            cidades = self._cidades_por_ano[ano] = self.misc_repo.get_cidades_por_ano(ano)
+        return list(cidades)
+
+    # --- Configurações ---
+    def get_app_setting(self, key: str) -> str | None:
+        value = self._settings.get(key, self._MISSING)
+        if value is self._MISSING:
+            try:
+                cursor = self.pool.reader().cursor()
+                cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
+                result = cursor.fetchone()
+                value = self._settings[key] = result['value'] if result else None
+            except sqlite3.Error as e:
+                logging.error(f"Erro ao buscar configuração '{key}': {e}")
+                return None
+        return value
+
+    def save_app_setting(self, key: str, value: str) -> bool:
+        """Grava pelo MiscRepository e atualiza o valor em cache."""
+        saved = self.misc_repo.save_app_setting(key, value)
+        with self._lock:
+            if saved: self._settings[key] = value
+            else: self._settings.pop(key, None)
+        return saved
+
+    def invalidate(self, **kwargs):
+        """Descarta todos os dados em cache. Registrado como ouvinte do evento 'data_changed'."""
+        with self._lock:
+            self._lookups.clear()
+            self._anos = None
+            self._cidades = None
+            self._cidades_por_ano.clear()
+            self._settings.clear()
\ No newline at end of file
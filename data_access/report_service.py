@@ -10,22 +10,25 @@ import config
 from dto.pessoa import Pessoa
 from dto.candidatura import Candidatura
 from functions import data_helpers
+from .reference_cache import ReferenceDataCache
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
     from .person_repository import PersonRepository
     from .misc_repository import MiscRepository
 
 class ReportService:
-    def __init__(self, conn: sqlite3.Connection, person_repo: 'PersonRepository', misc_repo: 'MiscRepository'):
-        self.conn = conn
+    def __init__(self, pool: 'ConnectionPool', person_repo: 'PersonRepository', misc_repo: 'MiscRepository', reference_cache: ReferenceDataCache | None = None):
+        self.pool = pool
         self.person_repo = person_repo
         self.misc_repo = misc_repo
+        self.reference_cache = reference_cache or ReferenceDataCache(pool, misc_repo)
 
     def get_recent_activities(self, limit=20) -> list[dict]:
         activities = []
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             queries = {
                 "Pessoa": "SELECT 'Pessoa' AS tipo, COALESCE(apelido, nome) AS descricao, data_criacao AS data FROM pessoas",
                 "Organização": "SELECT 'Organização' AS tipo, nome_fantasia AS descricao, data_criacao AS data FROM organizacoes",
@@ -66,18 +69,14 @@ class ReportService:
             target_mmdd_strings = [(today + timedelta(days=i)).strftime('%m-%d') for i in range(days)]
             placeholders = ','.join(['?'] * len(target_mmdd_strings))
             
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             
             query = f"""
                 SELECT p.*, c.*
                 FROM pessoas p
-                JOIN candidaturas c ON p.id_pessoa = c.id_pessoa
-                WHERE (c.ano_eleicao, c.id_pessoa) IN (
-                    SELECT MAX(ano_eleicao), id_pessoa 
-                    FROM candidaturas 
-                    GROUP BY id_pessoa
-                )
-                AND p.data_nascimento IS NOT NULL AND p.data_nascimento != ''
+                JOIN pessoa_candidatura_recente pcr ON p.id_pessoa = pcr.id_pessoa
+                JOIN candidaturas c ON pcr.id_candidatura = c.id_candidatura
+                WHERE p.data_nascimento IS NOT NULL AND p.data_nascimento != ''
                 AND c.situacao IN ('ELEITO', 'ELEITO POR QP', 'ELEITO POR MÉDIA', 'REELEITO')
                 AND SUBSTR(p.data_nascimento, 4, 2) || '-' || SUBSTR(p.data_nascimento, 1, 2) IN ({placeholders})
             """
@@ -113,7 +112,7 @@ class ReportService:
         data = {"prefeito": None, "vice": None, "vereadores": [], "prefeitura": {}, "candidato_destaque": None, "ranking_2022": {}}
         
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cidade_key = data_helpers.normalize_city_key(cidade)
             is_federal_or_state_election = ano % 4 == 2
 
@@ -135,7 +134,7 @@ class ReportService:
             else:
                 data['ranking_2022'] = self.get_ranking_por_cargo(cidade_key, ano)
 
-            id_pessoa_proprietario = self.misc_repo.get_app_setting('proprietario_id_pessoa')
+            id_pessoa_proprietario = self.reference_cache.get_app_setting('proprietario_id_pessoa')
             if id_pessoa_proprietario:
                 proprietario_obj = self.person_repo.get_person_details(int(id_pessoa_proprietario))
                 
@@ -203,7 +202,7 @@ class ReportService:
     def get_ranking_por_cargo(self, cidade_key: str, ano: int) -> dict[str, list[Candidatura]]:
         ranking_data = defaultdict(list)
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT DISTINCT c.cargo FROM votos_por_municipio v JOIN candidaturas c ON v.sq_candidato = c.sq_candidato WHERE v.ano_eleicao = ? AND v.cidade = ? AND c.cargo IS NOT NULL", (ano, cidade_key))
             cargos = [row['cargo'] for row in cursor.fetchall() if row['cargo'] not in ['PRESIDENTE', 'VICE-PRESIDENTE']]
 
@@ -230,7 +229,7 @@ class ReportService:
     def get_eleitoral_dashboard_data(self, cidade: str, ano: int) -> dict:
         data = {"party_composition": [], "top_vereadores": []}
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cidade_key = data_helpers.normalize_city_key(cidade)
             
             query_party = "SELECT cand.partido, COUNT(*) as count FROM candidaturas cand WHERE cand.cidade = ? AND cand.ano_eleicao = ? AND cand.cargo = 'VEREADOR' AND cand.situacao IN ('ELEITO', 'ELEITO POR QP', 'ELEITO POR MÉDIA', 'REELEITO') GROUP BY cand.partido ORDER BY count DESC"
@@ -256,7 +255,7 @@ class ReportService:
     def get_dashboard_stats(self) -> dict:
         stats = { 'total_pessoas': 0, 'total_organizacoes': 0, 'total_atendimentos_pendentes': 0, 'total_proposicoes_ano': 0, 'votos_sim': 0 }
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT COUNT(id_pessoa) FROM pessoas"); stats['total_pessoas'] = cursor.fetchone()[0]
             cursor.execute("SELECT COUNT(id_organizacao) FROM organizacoes"); stats['total_organizacoes'] = cursor.fetchone()[0]
             cursor.execute("SELECT COUNT(id_atendimento) FROM atendimentos WHERE status IN ('Aberto', 'Em Andamento')"); stats['total_atendimentos_pendentes'] = cursor.fetchone()[0]
@@ -295,7 +294,7 @@ class ReportService:
                         SUBSTR(mes_ano, 4, 4), SUBSTR(mes_ano, 1, 2)
                     LIMIT ?;
                 """
-                cursor = self.conn.cursor()
+                cursor = self.pool.reader().cursor()
                 cursor.execute(query, (start_date.strftime('%Y-%m-%d 00:00:00'), months_ago))
 
                 month_map = {1: 'JAN', 2: 'FEV', 3: 'MAR', 4: 'ABR', 5: 'MAI', 6: 'JUN', 7: 'JUL', 8: 'AGO', 9: 'SET', 10: 'OUT', 11: 'NOV', 12: 'DEZ'}
@@ -318,7 +317,7 @@ class ReportService:
         Retorna uma lista de dicionários, ex: [{'ano_eleicao': 2024, 'cargo': 'VEREADOR', 'contagem': 150}]
         """
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             # Seleciona apenas os cargos mais relevantes para evitar poluir o gráfico
             cargos_relevantes = ('PREFEITO', 'VICE-PREFEITO', 'VEREADOR', 'DEPUTADO ESTADUAL', 'DEPUTADO FEDERAL')
             
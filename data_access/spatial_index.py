@@ -0,0 +1,89 @@
+"""
+Consultas espaciais sobre o R*Tree '<tabela>_geo' (database_setup._create_spatial_index), mantido por triggers
+a partir de latitude/longitude das pessoas e organizações exibíveis no mapa.
+
+O R*Tree encontra os candidatos de uma caixa em tempo logarítmico (ele guarda float32 arredondado para fora, então
+a caixa nunca perde pontos); a distância real (haversine) é calculada em lote com NumPy só sobre esses candidatos,
+com as coordenadas originais da tabela. A busca por raio usa a caixa que envolve o círculo; a dos k mais
+próximos amplia a caixa, pela densidade observada, até que o k-ésimo ponto esteja dentro do círculo consultado.
+"""
+import math
+import numpy as np
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
+EARTH_RADIUS_KM = 6371.0088
+# Metade da circunferência da Terra: nenhum ponto fica mais longe que isso
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+# Raio inicial da busca dos mais próximos
+INITIAL_KNN_RADIUS_KM = 2.0
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distâncias, em km, do ponto (lat, lon) a cada ponto dos vetores (graus)."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) que contém o círculo; perto dos polos ou do antimeridiano, todas as longitudes."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0
+    # Maior afastamento em longitude ocorre na latitude mais próxima do polo dentro da caixa
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(max(abs(min_lat), abs(max_lat))))))
+    if dlon >= 180 or lon - dlon < -180 or lon + dlon > 180:
+        return min_lat, -180.0, max_lat, 180.0
+    return min_lat, lon - dlon, max_lat, lon + dlon
+
+class SpatialIndex:
+    def __init__(self, pool: 'ConnectionPool', table_name: str, id_column: str):
+        self.pool = pool
+        self.table_name = table_name
+        self.id_column = id_column
+        self.geo_table = f"{table_name}_geo"
+
+    def bbox_filter_sql(self, alias: str = "g") -> str:
+        """Condição do R*Tree (sobreposição com a caixa) para quem junta o índice à tabela; parâmetros: min_lat, max_lat, min_lon, max_lon."""
+        return f"{alias}.max_lat >= ? AND {alias}.min_lat <= ? AND {alias}.max_lon >= ? AND {alias}.min_lon <= ?"
+
+    def candidates(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ids, latitudes, longitudes) dos pontos do índice dentro da caixa."""
+        cursor = self.pool.reader().cursor()
+        cursor.execute(f"""
+            SELECT g.id, t.latitude, t.longitude FROM {self.geo_table} g JOIN {self.table_name} t ON t.{self.id_column} = g.id
+            WHERE {self.bbox_filter_sql()}
+        """, (min_lat, max_lat, min_lon, max_lon))
+        rows = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 3)
+        return rows[:, 0].astype(np.int64), rows[:, 1], rows[:, 2]
+
+    def within_radius(self, lat: float, lon: float, radius_km: float, limit: int | None = None) -> list[tuple[int, float]]:
+        """[(id, distância_km)] dos pontos a até `radius_km` de (lat, lon), do mais próximo ao mais distante."""
+        ids, lats, lons = self.candidates(*radius_bbox(lat, lon, radius_km))
+        distances = haversine_km(lat, lon, lats, lons)
+        inside = np.flatnonzero(distances <= radius_km)
+        order = inside[np.argsort(distances[inside], kind="stable")][:limit]
+        return list(zip(ids[order].tolist(), distances[order].tolist()))
+
+    def nearest(self, lat: float, lon: float, k: int) -> list[tuple[int, float]]:
+        """[(id, distância_km)] dos `k` pontos mais próximos de (lat, lon), do mais próximo ao mais distante."""
+        if k <= 0: return []
+        radius = INITIAL_KNN_RADIUS_KM
+        while True:
+            ids, lats, lons = self.candidates(*radius_bbox(lat, lon, radius))
+            if len(ids) >= k or radius >= MAX_RADIUS_KM:
+                if not len(ids): return []
+                distances = haversine_km(lat, lon, lats, lons)
+                top = np.argpartition(distances, k - 1)[:k] if len(ids) > k else np.arange(len(ids))
+                top = top[np.argsort(distances[top], kind="stable")]
+                # A caixa contém o círculo do raio consultado: se o k-ésimo está dentro dele, ninguém fora da caixa é mais próximo
+                if radius >= MAX_RADIUS_KM or distances[top[-1]] <= radius:
+                    return list(zip(ids[top].tolist(), distances[top].tolist()))
+                radius = float(distances[top[-1]])
+            else:
+                # Amplia pela densidade observada (área proporcional ao raio²), pelo menos dobrando
+                radius *= max(2.0, 1.2 * math.sqrt(k / max(len(ids), 1)))
+            radius = min(radius, MAX_RADIUS_KM)
\ No newline at end of file
@@ -4,13 +4,17 @@ from datetime import datetime, timedelta
 import logging
 from dto.user import User
 
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .connection_pool import ConnectionPool
+
 class UserRepository:
-    def __init__(self, conn: sqlite3.Connection):
-        self.conn = conn
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
 
     def verify_user(self, username: str, password_str: str) -> User | None:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT * FROM usuarios WHERE nome_usuario = ?", (username,))
             user_row = cursor.fetchone()
             if user_row:
@@ -25,7 +29,7 @@ class UserRepository:
     def verify_login_token(self, token: str) -> User | None:
         if not token: return None
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT * FROM usuarios WHERE login_token = ?", (token,))
             user_row = cursor.fetchone()
             if user_row:
@@ -42,21 +46,21 @@ class UserRepository:
 
     def _clear_token_for_user(self, user: User):
         try:
-            with self.conn:
-                self.conn.execute("UPDATE usuarios SET login_token = NULL, token_validade = NULL WHERE id_usuario = ?", (user.id_usuario,))
+            with self.pool.writer() as conn:
+                conn.execute("UPDATE usuarios SET login_token = NULL, token_validade = NULL WHERE id_usuario = ?", (user.id_usuario,))
         except sqlite3.Error as e:
             logging.error(f"Erro ao limpar token para usuário {user.nome_usuario}: {e}", exc_info=True)
 
     def save_session_token(self, user_id: int, token: str, valid_until_str: str):
         try:
-            with self.conn:
-                self.conn.execute("UPDATE usuarios SET login_token = ?, token_validade = ? WHERE id_usuario = ?", (token, valid_until_str, user_id))
+            with self.pool.writer() as conn:
+                conn.execute("UPDATE usuarios SET login_token = ?, token_validade = ? WHERE id_usuario = ?", (token, valid_until_str, user_id))
         except sqlite3.Error as e:
             logging.error(f"Erro ao salvar token de sessão no DB: {e}", exc_info=True)
 
     def get_all_users(self) -> list[User]:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT * FROM usuarios ORDER BY nivel_acesso, nome_usuario")
             return [User.from_dict(dict(row)) for row in cursor.fetchall()]
         except sqlite3.Error as e:
@@ -65,7 +69,7 @@ class UserRepository:
 
     def get_user_by_id(self, user_id: int) -> User | None:
         try:
-            cursor = self.conn.cursor()
+            cursor = self.pool.reader().cursor()
             cursor.execute("SELECT * FROM usuarios WHERE id_usuario = ?", (user_id,))
             row = cursor.fetchone()
             return User.from_dict(dict(row)) if row else None
@@ -75,8 +79,8 @@ class UserRepository:
 
     def save_user(self, user: User) -> User | None:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 if user.id_usuario == 0:
                     if not user.hash_senha: raise ValueError("Senha é obrigatória para novos usuários.")
                     sql = "INSERT INTO usuarios (nome_usuario, hash_senha, nome_completo, data_nascimento, telefone, email, caminho_foto, nivel_acesso) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
@@ -98,8 +102,8 @@ class UserRepository:
 
     def delete_user(self, user_id: int) -> bool:
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
                 cursor.execute("DELETE FROM usuarios WHERE id_usuario = ?", (user_id,))
                 return cursor.rowcount > 0
         except sqlite3.Error as e:
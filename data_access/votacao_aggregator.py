@@ -0,0 +1,153 @@
+"""
+Agregação dos votos do CSV de votação do TSE (votacao_candidato_munzona), em um ou mais processos.
+
+O corpo do arquivo é dividido em faixas de bytes alinhadas em fim de linha (pelo menos uma por processo
+e no máximo CHECKPOINT_BYTES cada). Cada faixa é lida por um processo, que soma os votos por
+(sq_candidato, cidade_key); quem chama recebe o parcial de cada faixa assim que ela termina (e pode
+gravá-lo como checkpoint) e depois junta os parciais na ordem das faixas, o que reproduz exatamente o
+resultado da leitura sequencial (inclusive o cargo e a cidade "da primeira linha" de cada candidato).
+O cancelamento é repassado aos processos por um multiprocessing.Event, verificado a cada bloco lido.
+"""
+import os
+import logging
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from functions import data_helpers, csv_stream
+
+VOTACAO_COLUMNS = ['SQ_CANDIDATO', 'NM_MUNICIPIO', 'QT_VOTOS_NOMINAIS', 'DS_CARGO', 'ANO_ELEICAO']
+
+# Abaixo disso o custo de subir os processos não compensa
+MIN_BYTES_PER_WORKER = 16 * 1024 * 1024
+# Tamanho máximo de uma faixa: é o trabalho perdido, no pior caso, ao cancelar ou cair
+CHECKPOINT_BYTES = 64 * 1024 * 1024
+
+def aggregate_range(filepath: str, start: int | None = None, end: int | None = None, on_chunk=None):
+    """
+    Soma os votos de uma faixa do arquivo (ou do arquivo inteiro). `on_chunk(bytes_lidos)` é chamado a
+    cada bloco e pode retornar False para interromper a leitura, caso em que a função retorna None.
+    Retorna (totais, cargos, ano): totais[(sq_candidato, cidade_key)] = votos, na ordem em que cada par
+    aparece, e cargos[sq_candidato] = cargo da primeira linha do candidato.
+    """
+    totais = {}
+    cargos = {}
+    ano_eleicao = None
+    city_keys = {}
+    last_position = start or 0
+
+    for rows, position in csv_stream.iter_row_chunks(filepath, VOTACAO_COLUMNS, start=start, end=end):
+        for sq_cand, cidade_original, votos, cargo, ano in rows:
+            if not ano_eleicao: ano_eleicao = data_helpers.safe_int(ano)
+            sq_cand = sq_cand.strip()
+            cidade_key = city_keys.get(cidade_original)
+            if cidade_key is None:
+                cidade_key = city_keys[cidade_original] = data_helpers.normalize_city_key(cidade_original)
+            if not sq_cand or not cidade_key: continue
+
+            if sq_cand not in cargos: cargos[sq_cand] = cargo.strip()
+            key = (sq_cand, cidade_key)
+            totais[key] = totais.get(key, 0) + (int(votos) if votos.isdigit() else data_helpers.safe_int(votos.strip()))
+
+        if on_chunk and on_chunk(position - last_position) is False:
+            return None
+        last_position = position
+
+    return totais, cargos, ano_eleicao
+
+def merge_partials(partials: list) -> tuple[dict, dict, int | None]:
+    """Junta os parciais (na ordem das faixas) no formato usado pela fase de gravação da importação."""
+    votos_agregados = defaultdict(lambda: defaultdict(int))
+    cargos = {}
+    ano_eleicao = None
+    for totais, cargos_parciais, ano_parcial in partials:
+        if not ano_eleicao: ano_eleicao = ano_parcial
+        for (sq_cand, cidade_key), votos in totais.items():
+            votos_agregados[sq_cand][cidade_key] += votos
+        for sq_cand, cargo in cargos_parciais.items():
+            cargos.setdefault(sq_cand, cargo)
+    candidato_info = {sq_cand: {'cargo': cargo, 'ano': ano_eleicao} for sq_cand, cargo in cargos.items()}
+    return votos_agregados, candidato_info, ano_eleicao
+
+# --- Estado de cada processo de trabalho (definido pelo initializer do pool) ---
+_cancel_event = None
+_bytes_counter = None
+
+def _init_worker(cancel_event, bytes_counter):
+    global _cancel_event, _bytes_counter
+    _cancel_event = cancel_event
+    _bytes_counter = bytes_counter
+
+def _worker_on_chunk(bytes_read: int) -> bool:
+    with _bytes_counter.get_lock():
+        _bytes_counter.value += bytes_read
+    return not _cancel_event.is_set()
+
+def _aggregate_range_worker(filepath: str, start: int, end: int):
+    return aggregate_range(filepath, start, end, _worker_on_chunk)
+
+def plan_ranges(filepath: str, workers: int) -> list[tuple[int, int]]:
+    total_bytes = csv_stream.source_size(filepath)
+    parts = max(workers, -(-total_bytes // CHECKPOINT_BYTES))
+    return csv_stream.split_byte_ranges(filepath, parts)
+
+def aggregate_ranges(filepath: str, ranges: list, workers: int, stop_event, on_range_done, on_progress=None, done: set | None = None) -> bool:
+    """
+    Agrega as faixas de `ranges` cujo índice não está em `done`, usando até `workers` processos.
+    `on_range_done(índice, parcial)` é chamado na thread de quem chamou, à medida que cada faixa termina.
+    `on_progress(bytes_lidos, total_bytes)` considera as faixas de `done` como já lidas.
+    Retorna False se `stop_event` foi sinalizado antes de todas as faixas terminarem.
+    """
+    done = done or set()
+    pending_ranges = [(i, start, end) for i, (start, end) in enumerate(ranges) if i not in done]
+    total_bytes = sum(end - start for start, end in ranges)
+    bytes_done = total_bytes - sum(end - start for _, start, end in pending_ranges)
+    workers = max(1, min(workers, len(pending_ranges), total_bytes // MIN_BYTES_PER_WORKER))
+
+    if workers == 1:
+        for index, start, end in pending_ranges:
+            def on_chunk(n):
+                nonlocal bytes_done
+                bytes_done += n
+                if on_progress: on_progress(bytes_done, total_bytes)
+                return not stop_event.is_set()
+            partial = aggregate_range(filepath, start, end, on_chunk)
+            if partial is None: return False
+            on_range_done(index, partial)
+        return True
+
+    logging.info(f"Agregando '{os.path.basename(filepath)}': {len(pending_ranges)} faixas em {workers} processos.")
+    # 'spawn' em todas as plataformas: fork a partir de um processo com threads (Tk, pool de conexões) não é seguro
+    ctx = multiprocessing.get_context('spawn')
+    cancel_event = ctx.Event()
+    bytes_counter = ctx.Value('q', bytes_done)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(cancel_event, bytes_counter)) as executor:
+        futures = {executor.submit(_aggregate_range_worker, filepath, start, end): index for index, start, end in pending_ranges}
+        pending = set(futures)
+        completed = True
+        try:
+            while pending:
+                finished, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                if stop_event.is_set(): cancel_event.set()
+                for future in finished:
+                    partial = future.result()
+                    if partial is None: completed = False
+                    else: on_range_done(futures[future], partial)
+                if on_progress: on_progress(bytes_counter.value, total_bytes)
+        except BaseException:
+            cancel_event.set()
+            for future in pending: future.cancel()
+            raise
+    return completed and not stop_event.is_set()
+
+def aggregate_votacao(filepath: str, workers: int, stop_event, on_progress=None):
+    """
+    Agrega o arquivo inteiro, sem checkpoints. Retorna (votos_agregados, candidato_info, ano_eleicao),
+    ou None se `stop_event` for sinalizado.
+    """
+    partials = {}
+    ranges = plan_ranges(filepath, workers)
+    if not aggregate_ranges(filepath, ranges, workers, stop_event, partials.__setitem__, on_progress):
+        return None
+    return merge_partials([partials[i] for i in range(len(ranges))])
\ No newline at end of file
@@ -8,7 +8,7 @@ import logging
 import config
 from functions import data_helpers
 
-SCHEMA_VERSION = 18
+SCHEMA_VERSION = 30
 
 def get_db_version(cursor):
     try:
@@ -100,6 +100,56 @@ def migrate_schema(cursor, from_version, to_version):
 
         logging.info("Correção e padronização de nomes de cidades concluída.")
 
+    if from_version < 19:
+        logging.info("Migrando para a versão 19: Criando índices secundários para os filtros mais usados...")
+        _create_indexes(cursor)
+
+    if from_version < 20:
+        logging.info("Migrando para a versão 20: Criando tabela 'pessoa_candidatura_recente' e seus gatilhos...")
+        _create_candidatura_recente(cursor)
+
+    if from_version < 21:
+        logging.info("Migrando para a versão 21: Criando índice de busca textual (FTS5) de pessoas...")
+        _create_pessoas_fts(cursor)
+
+    if from_version < 22:
+        logging.info("Migrando para a versão 22: Criando índices para a paginação por chave das listas de contatos...")
+        _create_indexes(cursor)
+
+    if from_version < 23:
+        logging.info("Migrando para a versão 23: Criando contadores de alteração por tabela...")
+        _create_change_counters(cursor)
+
+    if from_version < 24:
+        logging.info("Migrando para a versão 24: Criando tabelas de controle de importações retomáveis...")
+        _create_import_jobs(cursor)
+
+    if from_version < 25:
+        logging.info("Migrando para a versão 25: Criando o registro de conteúdo das importações (importação incremental)...")
+        _create_import_ledger(cursor)
+
+    if from_version < 26:
+        logging.info("Migrando para a versão 26: Criando a tabela de perfil do eleitorado (faixa etária e escolaridade)...")
+        _create_eleitorado_perfil(cursor)
+
+    if from_version < 27:
+        logging.info("Migrando para a versão 27: Criando o cache de geocodificação por endereço...")
+        _create_geocode_cache(cursor)
+
+    if from_version < 28:
+        logging.info("Migrando para a versão 28: Criando os centroides dos municípios e o nível de precisão das coordenadas...")
+        add_column_if_not_exists(cursor, "pessoas", "geo_precisao TEXT")
+        add_column_if_not_exists(cursor, "organizacoes", "geo_precisao TEXT")
+        _create_municipio_centroides(cursor)
+
+    if from_version < 29:
+        logging.info("Migrando para a versão 29: Criando a fila persistente de geocodificação...")
+        _create_geocode_jobs(cursor)
+
+    if from_version < 30:
+        logging.info("Migrando para a versão 30: Criando o índice espacial (R*Tree) das coordenadas...")
+        _create_spatial_index(cursor)
+
 
 def setup_database():
     db_exists = os.path.exists(config.DB_PATH_CONFIG)
@@ -114,6 +164,17 @@ def setup_database():
         if not db_exists:
             logging.warning(f"Banco de dados inexistente. Criando do zero para a versão {SCHEMA_VERSION}...")
             _create_all_tables(cursor)
+            _create_indexes(cursor)
+            _create_candidatura_recente(cursor)
+            _create_pessoas_fts(cursor)
+            _create_change_counters(cursor)
+            _create_import_jobs(cursor)
+            _create_import_ledger(cursor)
+            _create_eleitorado_perfil(cursor)
+            _create_geocode_cache(cursor)
+            _create_municipio_centroides(cursor)
+            _create_geocode_jobs(cursor)
+            _create_spatial_index(cursor)
             _populate_lookup_data(cursor)
             set_db_version(cursor, SCHEMA_VERSION)
             conn.commit()
@@ -138,8 +199,8 @@ def setup_database():
 
 def _create_all_tables(cursor):
     logging.info(f"Criando schema completo das tabelas (v{SCHEMA_VERSION})...")
-    cursor.execute('''CREATE TABLE pessoas (id_pessoa INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, apelido TEXT, cpf TEXT UNIQUE, data_nascimento TEXT, genero TEXT, email TEXT, celular TEXT, telefone_residencial TEXT, caminho_foto TEXT, notas_pessoais TEXT, voto TEXT, id_tratamento INTEGER, id_profissao INTEGER, id_escolaridade INTEGER, id_organizacao_trabalho INTEGER, rg TEXT, titulo_eleitor TEXT UNIQUE, sg_uf_nascimento TEXT, cd_genero TEXT, cd_grau_instrucao TEXT, cd_ocupacao TEXT, cd_estado_civil TEXT, ds_estado_civil TEXT, cd_cor_raca TEXT, ds_cor_raca TEXT, endereco TEXT, numero TEXT, complemento TEXT, bairro TEXT, cep TEXT, cidade TEXT, uf TEXT, latitude REAL, longitude REAL, geo_visivel INTEGER DEFAULT 0, data_criacao TEXT DEFAULT (STRFTIME('%Y-%m-%d %H:%M:%S', 'now')))''') 
-    cursor.execute('''CREATE TABLE organizacoes (id_organizacao INTEGER PRIMARY KEY AUTOINCREMENT, nome_fantasia TEXT NOT NULL, razao_social TEXT, cnpj TEXT UNIQUE, email TEXT, telefone TEXT, website TEXT, id_unidade_vinculada INTEGER, data_inicio_atividade TEXT, notas TEXT, cep TEXT, endereco TEXT, numero TEXT, complemento TEXT, bairro TEXT, cidade TEXT, uf TEXT, id_municipio INTEGER, tipo_organizacao TEXT, latitude REAL, longitude REAL, geo_visivel INTEGER DEFAULT 0, data_criacao TEXT DEFAULT (STRFTIME('%Y-%m-%d %H:%M:%S', 'now')), FOREIGN KEY (id_municipio) REFERENCES municipios(id) ON DELETE SET NULL)''')
+    cursor.execute('''CREATE TABLE pessoas (id_pessoa INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, apelido TEXT, cpf TEXT UNIQUE, data_nascimento TEXT, genero TEXT, email TEXT, celular TEXT, telefone_residencial TEXT, caminho_foto TEXT, notas_pessoais TEXT, voto TEXT, id_tratamento INTEGER, id_profissao INTEGER, id_escolaridade INTEGER, id_organizacao_trabalho INTEGER, rg TEXT, titulo_eleitor TEXT UNIQUE, sg_uf_nascimento TEXT, cd_genero TEXT, cd_grau_instrucao TEXT, cd_ocupacao TEXT, cd_estado_civil TEXT, ds_estado_civil TEXT, cd_cor_raca TEXT, ds_cor_raca TEXT, endereco TEXT, numero TEXT, complemento TEXT, bairro TEXT, cep TEXT, cidade TEXT, uf TEXT, latitude REAL, longitude REAL, geo_visivel INTEGER DEFAULT 0, data_criacao TEXT DEFAULT (STRFTIME('%Y-%m-%d %H:%M:%S', 'now')), geo_precisao TEXT)''') 
+    cursor.execute('''CREATE TABLE organizacoes (id_organizacao INTEGER PRIMARY KEY AUTOINCREMENT, nome_fantasia TEXT NOT NULL, razao_social TEXT, cnpj TEXT UNIQUE, email TEXT, telefone TEXT, website TEXT, id_unidade_vinculada INTEGER, data_inicio_atividade TEXT, notas TEXT, cep TEXT, endereco TEXT, numero TEXT, complemento TEXT, bairro TEXT, cidade TEXT, uf TEXT, id_municipio INTEGER, tipo_organizacao TEXT, latitude REAL, longitude REAL, geo_visivel INTEGER DEFAULT 0, data_criacao TEXT DEFAULT (STRFTIME('%Y-%m-%d %H:%M:%S', 'now')), geo_precisao TEXT, FOREIGN KEY (id_municipio) REFERENCES municipios(id) ON DELETE SET NULL)''')
     cursor.execute('''CREATE TABLE candidaturas (id_candidatura INTEGER PRIMARY KEY AUTOINCREMENT, id_pessoa INTEGER NOT NULL, ano_eleicao INTEGER NOT NULL, sq_candidato TEXT, nome_urna TEXT, numero_urna TEXT, partido TEXT, cargo TEXT, cidade TEXT, uf TEXT, votos INTEGER DEFAULT 0, situacao TEXT, cd_eleicao TEXT, ds_eleicao TEXT, dt_eleicao TEXT, tp_abrangencia TEXT, sg_ue TEXT, cd_cargo TEXT, nm_social_candidato TEXT, nr_partido TEXT, cd_sit_tot_turno TEXT, FOREIGN KEY (id_pessoa) REFERENCES pessoas(id_pessoa) ON DELETE CASCADE, UNIQUE (sq_candidato, ano_eleicao, cidade))''')
     cursor.execute('''CREATE TABLE votos_por_municipio (id_voto_municipio INTEGER PRIMARY KEY AUTOINCREMENT, sq_candidato TEXT NOT NULL, ano_eleicao INTEGER NOT NULL, cidade TEXT NOT NULL, votos INTEGER DEFAULT 0, FOREIGN KEY (sq_candidato) REFERENCES candidaturas(sq_candidato) ON DELETE CASCADE, UNIQUE (sq_candidato, ano_eleicao, cidade))''')
     cursor.execute('''CREATE TABLE municipios (id INTEGER PRIMARY KEY AUTOINCREMENT, cidade_key TEXT UNIQUE, cidade TEXT, uf TEXT, sg_ue TEXT, cod_ibge TEXT, populacao INTEGER, dens_demo REAL, gentilico TEXT, area REAL, idhm_geral REAL, idhm_long REAL, idhm_renda REAL, idhm_educ REAL, aniversario TEXT)''')
@@ -162,6 +223,208 @@ def _create_all_tables(cursor):
     cursor.execute('''CREATE TABLE app_settings (key TEXT PRIMARY KEY, value TEXT)''')
     cursor.execute('''CREATE TABLE schema_info (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)''')
 
+# Índices secundários: (nome, tabela, colunas). Criados junto com o schema e pelas migrações v19 e v22.
+SECONDARY_INDEXES = [
+    ("idx_candidaturas_pessoa_ano", "candidaturas", "id_pessoa, ano_eleicao DESC"),
+    ("idx_candidaturas_cidade_ano_cargo", "candidaturas", "cidade, ano_eleicao, cargo, situacao"),
+    ("idx_candidaturas_ano_cargo", "candidaturas", "ano_eleicao, cargo"),
+    ("idx_votos_municipio_cidade_ano", "votos_por_municipio", "cidade, ano_eleicao"),
+    ("idx_atendimentos_status_prioridade", "atendimentos", "status, prioridade"),
+    ("idx_atendimentos_pessoa", "atendimentos", "id_pessoa"),
+    ("idx_atendimentos_organizacao", "atendimentos", "id_organizacao"),
+    ("idx_atendimento_updates_atendimento", "atendimento_updates", "id_atendimento"),
+    ("idx_eventos_data", "eventos", "data_evento"),
+    ("idx_pessoas_data_criacao", "pessoas", "data_criacao"),
+    ("idx_organizacoes_municipio", "organizacoes", "id_municipio"),
+    ("idx_pessoa_tags_assoc_tag", "pessoa_tags_assoc", "id_tag"),
+    ("idx_pessoa_listas_assoc_lista", "pessoa_listas_assoc", "id_lista"),
+    ("idx_proposicao_temas_assoc_tema", "proposicao_temas_assoc", "id_tema"),
+    ("idx_relacionamentos_destino", "relacionamentos", "id_pessoa_destino"),
+    # Ordenações da paginação por chave (ver PersonRepository.SEEK_SORT_KEYS)
+    ("idx_pessoas_nome", "pessoas", "nome"),
+    ("idx_pessoas_apelido_sort", "pessoas", "COALESCE(apelido, '')"),
+    ("idx_pessoas_celular_sort", "pessoas", "COALESCE(celular, '')"),
+    ("idx_organizacoes_nome_fantasia", "organizacoes", "nome_fantasia"),
+]
+
+def _create_indexes(cursor):
+    for index_name, table_name, columns in SECONDARY_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+    cursor.execute("ANALYZE")
+    logging.info(f"{len(SECONDARY_INDEXES)} índices secundários verificados/criados.")
+
+# Última candidatura de cada pessoa (maior ano_eleicao; empate resolvido pelo maior id_candidatura).
+# Mantida pelos gatilhos abaixo a cada INSERT/UPDATE/DELETE em 'candidaturas'.
+def _candidatura_recente_refresh_sql(id_pessoa_ref: str) -> str:
+    return f"""
+        DELETE FROM pessoa_candidatura_recente WHERE id_pessoa = {id_pessoa_ref};
+        INSERT INTO pessoa_candidatura_recente (id_pessoa, id_candidatura)
+            SELECT id_pessoa, id_candidatura FROM candidaturas WHERE id_pessoa = {id_pessoa_ref}
+            ORDER BY ano_eleicao DESC, id_candidatura DESC LIMIT 1;
+    """
+
+REBUILD_CANDIDATURA_RECENTE_SQL = """
+    INSERT INTO pessoa_candidatura_recente (id_pessoa, id_candidatura)
+    SELECT id_pessoa, id_candidatura FROM (
+        SELECT id_pessoa, id_candidatura, ROW_NUMBER() OVER (PARTITION BY id_pessoa ORDER BY ano_eleicao DESC, id_candidatura DESC) as rn
+        FROM candidaturas
+    ) WHERE rn = 1
+"""
+
+def _create_candidatura_recente(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS pessoa_candidatura_recente (id_pessoa INTEGER PRIMARY KEY, id_candidatura INTEGER NOT NULL UNIQUE)")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_candidaturas_recente_insert AFTER INSERT ON candidaturas
+        BEGIN {_candidatura_recente_refresh_sql("NEW.id_pessoa")} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_candidaturas_recente_update AFTER UPDATE OF id_pessoa, ano_eleicao ON candidaturas
+        BEGIN {_candidatura_recente_refresh_sql("OLD.id_pessoa")} {_candidatura_recente_refresh_sql("NEW.id_pessoa")} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_candidaturas_recente_delete AFTER DELETE ON candidaturas
+        BEGIN {_candidatura_recente_refresh_sql("OLD.id_pessoa")} END
+    """)
+    cursor.execute("DELETE FROM pessoa_candidatura_recente")
+    cursor.execute(REBUILD_CANDIDATURA_RECENTE_SQL)
+    logging.info(f"Tabela 'pessoa_candidatura_recente' preenchida com {cursor.rowcount} registros.")
+
+# Índice de busca textual por nome, apelido e nomes de urna. O tokenizador remove acentos
+# ("JOAO" encontra "João") e os índices de prefixo aceleram a busca enquanto o usuário digita.
+# O rowid da tabela virtual é o id_pessoa; os gatilhos mantêm o índice sincronizado.
+def _nomes_urna_sql(id_pessoa_ref: str) -> str:
+    return f"(SELECT group_concat(DISTINCT nome_urna) FROM candidaturas WHERE id_pessoa = {id_pessoa_ref})"
+
+def _create_pessoas_fts(cursor):
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS pessoas_fts USING fts5(
+            nome, apelido, nome_urna, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_pessoas_fts_insert AFTER INSERT ON pessoas
+        BEGIN
+            INSERT INTO pessoas_fts (rowid, nome, apelido, nome_urna) VALUES (NEW.id_pessoa, NEW.nome, NEW.apelido, {_nomes_urna_sql("NEW.id_pessoa")});
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_pessoas_fts_update AFTER UPDATE OF nome, apelido ON pessoas
+        BEGIN
+            UPDATE pessoas_fts SET nome = NEW.nome, apelido = NEW.apelido WHERE rowid = NEW.id_pessoa;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_pessoas_fts_delete AFTER DELETE ON pessoas
+        BEGIN
+            DELETE FROM pessoas_fts WHERE rowid = OLD.id_pessoa;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_candidaturas_fts_insert AFTER INSERT ON candidaturas
+        BEGIN
+            UPDATE pessoas_fts SET nome_urna = {_nomes_urna_sql("NEW.id_pessoa")} WHERE rowid = NEW.id_pessoa;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_candidaturas_fts_update AFTER UPDATE OF nome_urna, id_pessoa ON candidaturas
+        BEGIN
+            UPDATE pessoas_fts SET nome_urna = {_nomes_urna_sql("OLD.id_pessoa")} WHERE rowid = OLD.id_pessoa;
+            UPDATE pessoas_fts SET nome_urna = {_nomes_urna_sql("NEW.id_pessoa")} WHERE rowid = NEW.id_pessoa;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_candidaturas_fts_delete AFTER DELETE ON candidaturas
+        BEGIN
+            UPDATE pessoas_fts SET nome_urna = {_nomes_urna_sql("OLD.id_pessoa")} WHERE rowid = OLD.id_pessoa;
+        END
+    """)
+    cursor.execute("DELETE FROM pessoas_fts")
+    cursor.execute(f"INSERT INTO pessoas_fts (rowid, nome, apelido, nome_urna) SELECT p.id_pessoa, p.nome, p.apelido, {_nomes_urna_sql('p.id_pessoa')} FROM pessoas p")
+    cursor.execute("INSERT INTO pessoas_fts (pessoas_fts) VALUES ('optimize')")
+    logging.info(f"Índice de busca textual de pessoas criado com {cursor.execute('SELECT COUNT(*) FROM pessoas_fts').fetchone()[0]} registros.")
+
+# Contadores incrementados a cada alteração relevante para as contagens das listas de contatos.
+# O CountCache compara esses valores para saber se uma contagem em cache ainda é válida,
+# inclusive quando a alteração veio de uma importação que não dispara o evento 'data_changed'.
+# (tabela, colunas cujo UPDATE conta como alteração)
+CHANGE_COUNTED_TABLES = [
+    ("pessoas", "nome, apelido"),
+    ("candidaturas", "id_pessoa, ano_eleicao, sq_candidato, nome_urna, cargo, cidade"),
+    ("organizacoes", "nome_fantasia, razao_social"),
+]
+
+def _create_change_counters(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS table_change_counters (table_name TEXT PRIMARY KEY, counter INTEGER NOT NULL DEFAULT 0)")
+    for table_name, update_columns in CHANGE_COUNTED_TABLES:
+        cursor.execute("INSERT OR IGNORE INTO table_change_counters (table_name, counter) VALUES (?, 0)", (table_name,))
+        bump_sql = f"UPDATE table_change_counters SET counter = counter + 1 WHERE table_name = '{table_name}';"
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_counter_insert AFTER INSERT ON {table_name} BEGIN {bump_sql} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_counter_update AFTER UPDATE OF {update_columns} ON {table_name} BEGIN {bump_sql} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_counter_delete AFTER DELETE ON {table_name} BEGIN {bump_sql} END")
+    logging.info(f"Contadores de alteração criados para {len(CHANGE_COUNTED_TABLES)} tabelas.")
+
+def _create_import_jobs(cursor):
+    # Uma linha por importação: impressão digital do arquivo, fase, posição (em bytes) já gravada e estado
+    # ('em_andamento', 'concluido' ou 'descartado'); 'checkpoint' guarda em JSON o que cada importação precisa para retomar.
+    cursor.execute('''CREATE TABLE IF NOT EXISTS import_jobs (id_job INTEGER PRIMARY KEY AUTOINCREMENT, tipo TEXT NOT NULL, arquivo TEXT NOT NULL, fingerprint TEXT NOT NULL, fase TEXT NOT NULL, byte_offset INTEGER NOT NULL DEFAULT 0, total_bytes INTEGER NOT NULL DEFAULT 0, estado TEXT NOT NULL DEFAULT 'em_andamento', checkpoint TEXT, data_criacao TEXT DEFAULT CURRENT_TIMESTAMP, data_atualizacao TEXT DEFAULT CURRENT_TIMESTAMP)''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_import_jobs_tipo_fingerprint ON import_jobs (tipo, fingerprint, estado)")
+    # Parciais da agregação do CSV de votação, por faixa do arquivo, até a finalização da importação
+    cursor.execute('''CREATE TABLE IF NOT EXISTS import_votos_parciais (id_job INTEGER NOT NULL, faixa INTEGER NOT NULL, seq INTEGER NOT NULL, sq_candidato TEXT NOT NULL, cidade TEXT NOT NULL, votos INTEGER NOT NULL, cargo TEXT, PRIMARY KEY (id_job, faixa, seq), FOREIGN KEY (id_job) REFERENCES import_jobs(id_job) ON DELETE CASCADE) WITHOUT ROWID''')
+    logging.info("Tabelas de controle de importação criadas.")
+
+def _create_import_ledger(cursor):
+    # Último conteúdo importado de cada arquivo de origem ('fonte' = nome do arquivo, estável entre as republicações do TSE)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS import_ledger_arquivos (tipo TEXT NOT NULL, fonte TEXT NOT NULL, file_hash TEXT NOT NULL, fingerprint TEXT NOT NULL, linhas INTEGER NOT NULL DEFAULT 0, data_importacao TEXT DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (tipo, fonte)) WITHOUT ROWID''')
+    # Resumo (digest) de cada linha pela chave natural; 'id_job' é a última importação em que a chave apareceu no arquivo
+    cursor.execute('''CREATE TABLE IF NOT EXISTS import_ledger_linhas (tipo TEXT NOT NULL, fonte TEXT NOT NULL, chave TEXT NOT NULL, digest INTEGER NOT NULL, id_job INTEGER, PRIMARY KEY (tipo, fonte, chave)) WITHOUT ROWID''')
+    logging.info("Registro de conteúdo das importações criado.")
+
+def _create_eleitorado_perfil(cursor):
+    # Distribuição do eleitorado de cada município/ano por dimensão ('faixa_etaria', 'escolaridade'), do perfil_eleitorado do TSE
+    cursor.execute('''CREATE TABLE IF NOT EXISTS eleitorado_perfil (id_municipio INTEGER NOT NULL, ano INTEGER NOT NULL, dimensao TEXT NOT NULL, categoria TEXT NOT NULL, total INTEGER NOT NULL, PRIMARY KEY (id_municipio, ano, dimensao, categoria)) WITHOUT ROWID''')
+    logging.info("Tabela de perfil do eleitorado criada.")
+
+def _create_geocode_cache(cursor):
+    # Resultado da geocodificação de cada endereço normalizado (geocode_cache_repository.normalize_address).
+    # Latitude/longitude NULL registram um endereço não encontrado (cache negativo, válido por GeocodeCacheRepository.NEGATIVE_TTL_DAYS).
+    cursor.execute('''CREATE TABLE IF NOT EXISTS geocode_cache (endereco_key TEXT PRIMARY KEY, latitude REAL, longitude REAL, precisao TEXT, data_consulta TEXT DEFAULT CURRENT_TIMESTAMP) WITHOUT ROWID''')
+    logging.info("Tabela de cache de geocodificação criada.")
+
+def _create_municipio_centroides(cursor):
+    # Centro de cada município para a geocodificação offline (offline_geocoder); 'origem' = 'ibge' ou 'geocodificado' (aprendido da API)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS municipio_centroides (cidade_key TEXT NOT NULL, uf TEXT NOT NULL, cod_ibge TEXT, latitude REAL NOT NULL, longitude REAL NOT NULL, origem TEXT NOT NULL, PRIMARY KEY (cidade_key, uf)) WITHOUT ROWID''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_municipio_centroides_cod_ibge ON municipio_centroides (cod_ibge)")
+    logging.info("Tabela de centroides dos municípios criada.")
+
+def _create_geocode_jobs(cursor):
+    # Fila de geocodificação dos contatos salvos (geocode_queue): uma linha por entidade ('pessoa' ou 'organizacao'),
+    # 'estado' = 'pendente', 'em_andamento' ou 'falhou'; 'proximo_em' adia as novas tentativas após erros transitórios.
+    cursor.execute('''CREATE TABLE IF NOT EXISTS geocode_jobs (id_job INTEGER PRIMARY KEY AUTOINCREMENT, tipo TEXT NOT NULL, id_entidade INTEGER NOT NULL, estado TEXT NOT NULL DEFAULT 'pendente', tentativas INTEGER NOT NULL DEFAULT 0, proximo_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, erro TEXT, data_criacao TEXT DEFAULT CURRENT_TIMESTAMP, UNIQUE (tipo, id_entidade))''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_geocode_jobs_estado_proximo ON geocode_jobs (estado, proximo_em)")
+    logging.info("Fila de geocodificação criada.")
+
+# Tabelas com coordenadas indexadas no R*Tree '<tabela>_geo' (spatial_index), com a coluna de ID de cada uma
+GEO_INDEXED_TABLES = [
+    ("pessoas", "id_pessoa"),
+    ("organizacoes", "id_organizacao"),
+]
+
+def _create_spatial_index(cursor):
+    # Só entram as linhas exibíveis no mapa (latitude/longitude preenchidas e geo_visivel = 1); os triggers mantêm o
+    # índice em dia. O R*Tree guarda float32 arredondado para fora, então as consultas refinam pelas colunas originais.
+    for table_name, id_column in GEO_INDEXED_TABLES:
+        geo_table = f"{table_name}_geo"
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {geo_table} USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+        condition = "{r}.latitude IS NOT NULL AND {r}.longitude IS NOT NULL AND {r}.geo_visivel = 1"
+        insert_sql = f"INSERT INTO {geo_table} (id, min_lat, max_lat, min_lon, max_lon) SELECT NEW.{id_column}, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude WHERE {condition.format(r='NEW')};"
+        delete_sql = f"DELETE FROM {geo_table} WHERE id = OLD.{id_column};"
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_geo_insert AFTER INSERT ON {table_name} BEGIN {insert_sql} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_geo_update AFTER UPDATE OF latitude, longitude, geo_visivel ON {table_name} BEGIN {delete_sql} {insert_sql} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_geo_delete AFTER DELETE ON {table_name} BEGIN {delete_sql} END")
+        cursor.execute(f"DELETE FROM {geo_table}")
+        cursor.execute(f"INSERT INTO {geo_table} (id, min_lat, max_lat, min_lon, max_lon) SELECT {id_column}, latitude, latitude, longitude, longitude FROM {table_name} WHERE {condition.format(r=table_name)}")
+    logging.info(f"Índice espacial criado para {len(GEO_INDEXED_TABLES)} tabelas.")
+
 def _populate_lookup_data(cursor):
     lookup_data = {
         "tratamentos": [("Sr.",), ("Sra.",), ("Dr.",), ("Dra.",), ("Deputado",), ("Vereador",), ("Prefeito",), ("Ex-Prefeito",)],
@@ -0,0 +1,17 @@
+# --- START OF FILE dto/merge_plan.py ---
+
+from dataclasses import dataclass, field
+
+@dataclass(slots=True)
+class MergePlan:
+    """Fusão planejada de um grupo de pessoas duplicadas: os duplicados são absorvidos pelo registro mestre."""
+    id_mestre: int
+    ids_duplicados: list[int] = field(default_factory=list)
+    chaves: list[str] = field(default_factory=list) # Chaves que ligaram o grupo (ex: 'cpf_123...', 'nome_nasc_...')
+    nomes: dict[int, str] = field(default_factory=dict) # id_pessoa -> nome, para a pré-visualização
+
+    @property
+    def ids(self) -> list[int]:
+        return [self.id_mestre, *self.ids_duplicados]
+
+# --- END OF FILE dto/merge_plan.py ---
\ No newline at end of file
@@ -28,6 +28,7 @@ class Organizacao:
     latitude: float | None = None
     longitude: float | None = None
     geo_visivel: int = 0  # Padrão é 0 (não visível)
+    geo_precisao: str | None = None  # 'endereco', 'aproximado' ou 'cidade' (offline_geocoder)
     
     tags: list[str] = field(default_factory=list, repr=False)
     listas: list[str] = field(default_factory=list, repr=False)
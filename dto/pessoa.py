@@ -40,6 +40,7 @@ class Pessoa:
     latitude: float | None = None
     longitude: float | None = None
     geo_visivel: int = 1 
+    geo_precisao: str | None = None  # 'endereco', 'aproximado' ou 'cidade' (offline_geocoder)
 
     # --- MUDANÇA: Campos da ÚLTIMA candidatura (campos de conveniência/atalho) ---
     # Estes campos são preenchidos por JOINs e representam a candidatura mais recente.
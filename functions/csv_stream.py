@@ -0,0 +1,149 @@
+"""
+Leitura em fluxo dos CSVs do TSE (separados por ';', entre aspas, em latin-1).
+
+O arquivo é lido uma única vez, em blocos binários cortados no último fim de linha. Cada bloco é
+decodificado e passado ao `csv.reader` (em C), e de cada linha só são extraídas, como tupla, as
+colunas pedidas, localizadas pelo cabeçalho. O progresso é informado pela posição em bytes, o que
+dispensa a leitura prévia do arquivo inteiro só para contar as linhas. O corpo do arquivo também
+pode ser dividido em faixas de bytes alinhadas em fim de linha, para ser lido em paralelo.
+Os CSVs de dentro de um ZIP do TSE (functions.zip_source) são lidos da mesma forma, direto do ZIP.
+"""
+import os
+import csv
+import operator
+import zipfile
+from contextlib import contextmanager
+
+from functions import zip_source
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+def normalize_header(fields: list[str]) -> list[str]:
+    if fields:
+        # Remove o BOM, lido como U+FEFF em UTF-8 ou como 'ï»¿' em latin-1
+        fields = [fields[0].lstrip('\ufeff').removeprefix('\u00ef\u00bb\u00bf'), *fields[1:]]
+    return [f.strip().replace('"', '').upper() for f in fields]
+
+def resolve_columns(header: list[str], columns: list[str]) -> list[int]:
+    """Retorna a posição de cada coluna pedida no cabeçalho. Levanta ValueError se alguma não existir."""
+    positions = {name: i for i, name in enumerate(header)}
+    missing = [c for c in columns if c not in positions]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes no arquivo: {', '.join(missing)}")
+    return [positions[c] for c in columns]
+
+def read_header(f, encoding: str = 'latin-1', delimiter: str = ';') -> list[str]:
+    """Lê e normaliza a linha de cabeçalho de um arquivo aberto em modo binário."""
+    line = f.readline().decode(encoding)
+    return normalize_header(next(csv.reader([line], delimiter=delimiter), []))
+
+def source_size(filepath: str) -> int:
+    """Tamanho em bytes do arquivo, ou o tamanho lógico (descompactado) de uma origem ZIP."""
+    return zip_source.source_size(filepath) if zip_source.is_zip_source(filepath) else os.path.getsize(filepath)
+
+@contextmanager
+def open_binary(filepath: str):
+    """Abre o arquivo em modo binário; numa origem ZIP, abre o primeiro CSV escolhido (para ler o cabeçalho)."""
+    if not zip_source.is_zip_source(filepath):
+        with open(filepath, 'rb') as f:
+            yield f
+        return
+    info, _ = zip_source.members_with_offsets(filepath)[0]
+    with zipfile.ZipFile(zip_source.source_path(filepath)) as zf, zf.open(info) as f:
+        yield f
+
+def _row_picker(indices: list[int]):
+    if len(indices) == 1:
+        index = indices[0]
+        return lambda row: (row[index],)
+    return operator.itemgetter(*indices)
+
+def split_byte_ranges(filepath: str, parts: int) -> list[tuple[int, int]]:
+    """
+    Divide o corpo do arquivo (depois do cabeçalho) em até `parts` faixas [início, fim) de tamanhos
+    parecidos, todas começando no início de uma linha.
+    """
+    if zip_source.is_zip_source(filepath):
+        # Dentro do ZIP não há acesso direto a uma posição: cada CSV escolhido é uma faixa
+        return [(base, base + info.file_size) for info, base in zip_source.members_with_offsets(filepath) if info.file_size]
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        f.readline()
+        bounds = [f.tell()]
+        body_size = size - bounds[0]
+        for i in range(1, max(1, parts)):
+            target = bounds[0] + body_size * i // parts
+            if target <= bounds[-1]: continue
+            # Volta um byte para que um alvo que já cai no início de uma linha seja mantido
+            f.seek(target - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size: break
+            if position > bounds[-1]: bounds.append(position)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def iter_row_chunks(filepath: str, columns: list[str], encoding: str = 'latin-1', delimiter: str = ';', chunk_size: int = CHUNK_SIZE,
+                    start: int | None = None, end: int | None = None):
+    """
+    Gera (linhas, posição_em_bytes) para cada bloco lido, em que `linhas` é uma lista de tuplas com os
+    valores das `columns` na ordem pedida (sem as aspas, mas sem aplicar strip) e `posição_em_bytes` é
+    o quanto do arquivo já foi consumido. Linhas mais curtas que o cabeçalho (linhas em branco,
+    registros truncados) são descartadas. Com `start`/`end` (de `split_byte_ranges`), lê só essa faixa;
+    o cabeçalho é sempre lido do início do arquivo para localizar as colunas.
+    """
+    if zip_source.is_zip_source(filepath):
+        yield from _iter_zip_row_chunks(filepath, columns, encoding, delimiter, chunk_size, start, end)
+        return
+    with open(filepath, 'rb') as f:
+        indices = resolve_columns(read_header(f, encoding, delimiter), columns)
+        if start is not None: f.seek(start)
+        remaining = (end - f.tell()) if end is not None else None
+        yield from _iter_blocks(f, indices, encoding, delimiter, chunk_size, remaining)
+
+def _iter_zip_row_chunks(source: str, columns: list[str], encoding: str, delimiter: str, chunk_size: int, start: int | None, end: int | None):
+    """
+    Lê os CSVs da origem ZIP em sequência, descompactando em fluxo, cada um com o seu cabeçalho. As
+    posições são lógicas (zip_source); `start` dentro de um CSV (retomada) é alcançado descompactando e
+    descartando o trecho anterior, e `end` deve cair no fim de um CSV (faixas de `split_byte_ranges`).
+    """
+    members = zip_source.members_with_offsets(source)
+    with zipfile.ZipFile(zip_source.source_path(source)) as zf:
+        for info, base in members:
+            if end is not None and base >= end: break
+            if start is not None and start >= base + info.file_size: continue
+            with zf.open(info) as f:
+                indices = resolve_columns(read_header(f, encoding, delimiter), columns)
+                skip = (start - base - f.tell()) if start is not None else 0
+                while skip > 0:
+                    skipped = len(f.read(min(chunk_size, skip)))
+                    if not skipped: break
+                    skip -= skipped
+                yield from _iter_blocks(f, indices, encoding, delimiter, chunk_size, None, base)
+
+def _iter_blocks(f, indices: list[int], encoding: str, delimiter: str, chunk_size: int, remaining: int | None, base: int = 0):
+    pick = _row_picker(indices)
+    min_width = max(indices) + 1
+    pending = b''
+    while True:
+        if remaining is None:
+            block = f.read(chunk_size)
+        else:
+            block = f.read(min(chunk_size, remaining)) if remaining > 0 else b''
+            remaining -= len(block)
+        if block:
+            data = pending + block
+            cut = data.rfind(b'\n') + 1
+            if cut == 0:
+                pending = data
+                continue
+            data, pending = data[:cut], data[cut:]
+        else:
+            data, pending = pending, b''
+            if not data: break
+
+        # Cada bloco termina num fim de linha, então é decodificado sozinho, sem caracteres partidos entre blocos.
+        # split('\n') e não splitlines(): em latin-1 o byte 0x85 vira U+0085, que splitlines trata como quebra de linha
+        reader = csv.reader(data.decode(encoding).split('\n'), delimiter=delimiter)
+        rows = [pick(row) for row in reader if len(row) >= min_width]
+        yield rows, base + f.tell() - len(pending)
\ No newline at end of file
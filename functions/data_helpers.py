@@ -1,4 +1,5 @@
 import unicodedata
+import re
 from datetime import datetime
 from pathlib import Path
 import os
@@ -21,6 +22,17 @@ def normalize_city_key(text):
     nfkd_form = unicodedata.normalize('NFD', text.upper())
     return "".join([c for c in nfkd_form if not unicodedata.combining(c)]).strip()
 
+def build_fts_query(text: str) -> str:
+    """
+    Converte o texto digitado pelo usuário em uma expressão MATCH do FTS5 em que cada palavra
+    é buscada como prefixo ("jo sil" -> '"jo"* "sil"*'). As palavras vão entre aspas para que
+    operadores do FTS5 (AND, OR, NOT, NEAR, parênteses) digitados pelo usuário sejam tratados como texto.
+    Retorna string vazia se não houver nenhuma palavra pesquisável.
+    """
+    if not isinstance(text, str): return ""
+    tokens = re.findall(r"\w+", text)
+    return " ".join(f'"{token}"*' for token in tokens)
+
 def normalize_csv_row(row):
     return {k.strip().upper(): v.strip() if v else '' for k, v in row.items() if k}
 
@@ -0,0 +1,125 @@
+"""
+Agrupamento de pessoas duplicadas com union-find (conjuntos disjuntos).
+
+Cada pessoa gera chaves de identificação (CPF, título de eleitor, nome normalizado + nascimento);
+pessoas que compartilham qualquer chave são unidas no mesmo conjunto, direta ou transitivamente.
+Com compressão de caminho e união por tamanho, o agrupamento é praticamente linear no número de
+pessoas. O resultado é uma lista de `MergePlan`, que pode ser exibida antes de ser aplicada.
+"""
+from functions import data_helpers
+from dto.merge_plan import MergePlan
+
+# Colunas necessárias para agrupar e escolher o mestre (o restante da linha só é lido na fusão)
+PLAN_COLUMNS = ('id_pessoa', 'nome', 'cpf', 'titulo_eleitor', 'data_nascimento')
+UNIQUE_COLUMNS = ('cpf', 'titulo_eleitor')
+
+class DisjointSet:
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def add(self, item):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item):
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        # Compressão de caminho: todos os nós visitados passam a apontar direto para a raiz
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b: return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+    def groups(self) -> dict:
+        """Retorna {raiz: [membros]} apenas dos conjuntos com mais de um membro, na ordem de inserção."""
+        members = {}
+        for item in self.parent:
+            members.setdefault(self.find(item), []).append(item)
+        return {root: items for root, items in members.items() if len(items) > 1}
+
+def exact_keys(pessoa: dict) -> list[str]:
+    """Chaves de identidade exata: CPF, título de eleitor e nome normalizado + data de nascimento."""
+    keys = []
+    if pessoa.get('cpf'): keys.append(f"cpf_{pessoa['cpf']}")
+    if pessoa.get('titulo_eleitor'): keys.append(f"titulo_{pessoa['titulo_eleitor']}")
+    if pessoa.get('nome') and pessoa.get('data_nascimento'):
+        keys.append(f"nome_nasc_{data_helpers.normalize_city_key(pessoa['nome'])}_{pessoa['data_nascimento']}")
+    return keys
+
+def cluster(pessoas: list[dict], key_funcs=(exact_keys,), links=()) -> tuple[DisjointSet, dict]:
+    """
+    Une as pessoas que compartilham alguma chave, além dos pares de `links` ((id_a, id_b, nota), da
+    busca aproximada). Retorna o DisjointSet (por id_pessoa) e {chave: id_pessoa de um dos membros}
+    das chaves que ligaram mais de uma pessoa (os pares aparecem como 'semelhanca_<a>_<b>_<nota>').
+    """
+    dsu = DisjointSet()
+    first_by_key = {}
+    linking_keys = {}
+    for pessoa in pessoas:
+        id_pessoa = pessoa['id_pessoa']
+        dsu.add(id_pessoa)
+        for key_func in key_funcs:
+            for key in key_func(pessoa):
+                first = first_by_key.setdefault(key, id_pessoa)
+                if first != id_pessoa:
+                    dsu.union(first, id_pessoa)
+                    linking_keys[key] = first
+    for id_a, id_b, score in links:
+        if id_a in dsu.parent and id_b in dsu.parent:
+            dsu.union(id_a, id_b)
+            linking_keys[f"semelhanca_{id_a}_{id_b}_{score:.2f}"] = id_a
+    return dsu, linking_keys
+
+def choose_master(rows: list[dict]) -> dict:
+    """Mestre do grupo (linhas em ordem de id): o primeiro com CPF, senão o primeiro com título, senão o mais antigo."""
+    return (next((r for r in rows if r.get('cpf')), None)
+            or next((r for r in rows if r.get('titulo_eleitor')), None)
+            or rows[0])
+
+def merge_fields(master: dict, duplicates: list[dict], is_taken=None) -> dict:
+    """
+    Campos vazios do mestre preenchidos com o primeiro valor não vazio dos duplicados (na ordem dada).
+    `is_taken(coluna, valor)` é consultado para as colunas únicas (CPF, título): se o valor já pertencer
+    a outro registro fora do grupo, ele não é copiado.
+    """
+    campos = {}
+    for duplicado in duplicates:
+        for col, val in duplicado.items():
+            if col == 'id_pessoa' or not val or master.get(col) or campos.get(col): continue
+            if col in UNIQUE_COLUMNS and is_taken and is_taken(col, val): continue
+            campos[col] = val
+    return campos
+
+def build_merge_plans(pessoas: list[dict], key_funcs=(exact_keys,), links=()) -> list[MergePlan]:
+    """Agrupa as pessoas (dicts com PLAN_COLUMNS) e retorna um MergePlan por grupo de duplicatas, em ordem de id."""
+    by_id = {p['id_pessoa']: p for p in pessoas}
+    dsu, linking_keys = cluster(pessoas, key_funcs, links)
+
+    keys_by_root = {}
+    for key, id_pessoa in linking_keys.items():
+        keys_by_root.setdefault(dsu.find(id_pessoa), []).append(key)
+
+    plans = []
+    for root, ids in dsu.groups().items():
+        rows = [by_id[i] for i in sorted(ids)]
+        master = choose_master(rows)
+        plans.append(MergePlan(
+            id_mestre=master['id_pessoa'],
+            ids_duplicados=[r['id_pessoa'] for r in rows if r is not master],
+            chaves=keys_by_root.get(root, []),
+            nomes={r['id_pessoa']: r.get('nome') or "" for r in rows},
+        ))
+    plans.sort(key=lambda plan: min(plan.ids))
+    return plans
\ No newline at end of file
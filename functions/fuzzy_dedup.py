@@ -0,0 +1,154 @@
+"""
+Detecção aproximada de pessoas duplicadas ("JOSE CARLOS DA SILVA" x "JOSÉ CARLOS SILVA").
+
+As pessoas são separadas em blocos pela chave fonética (em português) do primeiro e do último nome
+e pelo ano de nascimento; só pares do mesmo bloco são comparados, então o custo cresce com o tamanho
+dos blocos, e não com o quadrado do número de pessoas. Dentro do bloco, a nota do par é a maior entre
+Jaro-Winkler e a semelhança de trigramas dos nomes (sem as partículas "DA", "DE", ...), ajustada por
+e-mail e telefones. Os pares aprovados viram ligações para `dedup_engine.build_merge_plans`.
+"""
+import re
+import logging
+import functools
+from collections import defaultdict
+
+from functions import data_helpers
+
+# Colunas lidas além de dedup_engine.PLAN_COLUMNS
+FUZZY_COLUMNS = ('email', 'celular', 'telefone_residencial')
+
+MATCH_THRESHOLD = 0.90
+CONTACT_BONUS = 0.05
+# Abaixo desta semelhança de trigramas o Jaro-Winkler (mais caro) nem é calculado
+MIN_TRIGRAM_SIMILARITY = 0.5
+# Blocos maiores que isso (nomes muito comuns nascidos no mesmo ano) são ignorados
+MAX_BLOCK_SIZE = 300
+
+PARTICLES = {"DA", "DAS", "DE", "DI", "DO", "DOS", "DU", "E", "D"}
+
+_PHONETIC_RULES = [(re.compile(pattern), repl) for pattern, repl in (
+    (r"[^A-Z]", ""),
+    (r"PH", "F"), (r"TH", "T"), (r"LH", "L"), (r"NH", "N"), (r"SCH|SH|CH", "X"),
+    (r"SC(?=[EI])", "S"), (r"QU(?=[EI])", "K"), (r"GU(?=[EI])", "G"), (r"QU", "K"),
+    (r"C(?=[EI])", "S"), (r"G(?=[EI])", "J"), (r"[CQ]", "K"),
+    (r"Y", "I"), (r"W", "V"), (r"Z", "S"), (r"H", ""),
+    (r"M(?=[^AEIOU]|$)", "N"),
+    (r"(.)\1+", r"\1"),
+)]
+_VOWELS = re.compile(r"[AEIOU]")
+_YEAR = re.compile(r"(?:19|20)\d{2}")
+_DIGITS = re.compile(r"\D")
+
+def name_tokens(nome: str) -> list[str]:
+    """Palavras do nome normalizado (maiúsculas, sem acentos), sem as partículas."""
+    return [t for t in re.split(r"[^A-Z]+", data_helpers.normalize_city_key(nome or "")) if t and t not in PARTICLES]
+
+@functools.lru_cache(maxsize=65536)
+def phonetic_pt(word: str) -> str:
+    """Chave fonética simplificada para português: unifica grafias como SOUZA/SOUSA, FELIPE/PHILIPPE, KATIA/CATIA."""
+    for pattern, repl in _PHONETIC_RULES:
+        word = pattern.sub(repl, word)
+    # Mantém a primeira letra e só as consoantes do resto
+    return word[:1] + _VOWELS.sub("", word[1:])
+
+def birth_year(data_nascimento) -> str | None:
+    match = _YEAR.search(data_nascimento or "")
+    return match.group(0) if match else None
+
+def jaro_winkler(a: str, b: str, prefix_scale: float = 0.1) -> float:
+    if a == b: return 1.0
+    len_a, len_b = len(a), len(b)
+    if not len_a or not len_b: return 0.0
+    window = max(max(len_a, len_b) // 2 - 1, 0)
+    matched_b = [False] * len_b
+    matches_a = []
+    for i, ch in enumerate(a):
+        for j in range(max(0, i - window), min(len_b, i + window + 1)):
+            if not matched_b[j] and b[j] == ch:
+                matched_b[j] = True
+                matches_a.append(ch)
+                break
+    m = len(matches_a)
+    if not m: return 0.0
+    matches_b = [b[j] for j in range(len_b) if matched_b[j]]
+    transpositions = sum(x != y for x, y in zip(matches_a, matches_b)) / 2
+    jaro = (m / len_a + m / len_b + (m - transpositions) / m) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y: break
+        prefix += 1
+    return jaro + prefix * prefix_scale * (1 - jaro)
+
+def trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def _prepare(pessoa: dict) -> dict | None:
+    tokens = name_tokens(pessoa.get('nome'))
+    if not tokens: return None
+    nome = " ".join(tokens)
+    fones = {d[-8:] for d in (_DIGITS.sub("", pessoa.get(c) or "") for c in ('celular', 'telefone_residencial')) if len(d) >= 8}
+    email = (pessoa.get('email') or "").strip().lower()
+    nome_fonetico = (phonetic_pt(tokens[0]), phonetic_pt(tokens[-1]))
+    ano = birth_year(pessoa.get('data_nascimento'))
+    # Sem data de nascimento só há par com e-mail ou telefone em comum, então esses entram nos blocos de cada contato
+    blocos = [(*nome_fonetico, ano)] if ano else [(*nome_fonetico, f"@{contato}") for contato in ([email] if email else []) + sorted(fones)]
+    return {
+        'id': pessoa['id_pessoa'], 'nome': nome, 'trigramas': trigrams(nome), 'blocos': blocos,
+        'nasc': (pessoa.get('data_nascimento') or "").strip(), 'cpf': pessoa.get('cpf'), 'titulo': pessoa.get('titulo_eleitor'),
+        'email': email, 'fones': fones,
+    }
+
+def score_pair(a: dict, b: dict) -> float:
+    """Nota de 0 a 1 (aproximadamente) de que os dois registros preparados são a mesma pessoa; 0 se forem incompatíveis."""
+    # Documentos ou datas de nascimento diferentes: pessoas diferentes, por mais parecidos que sejam os nomes
+    if (a['cpf'] and b['cpf'] and a['cpf'] != b['cpf']) or (a['titulo'] and b['titulo'] and a['titulo'] != b['titulo']):
+        return 0.0
+    if a['nasc'] and b['nasc'] and a['nasc'] != b['nasc']:
+        return 0.0
+
+    contato_igual = (a['email'] and a['email'] == b['email']) or bool(a['fones'] & b['fones'])
+    # Sem data de nascimento dos dois lados, o nome sozinho não basta: exige e-mail ou telefone em comum
+    if not a['nasc'] and not contato_igual:
+        return 0.0
+    contato_diferente = (a['email'] and b['email'] and a['email'] != b['email']) or (a['fones'] and b['fones'] and not a['fones'] & b['fones'])
+
+    tri_a, tri_b = a['trigramas'], b['trigramas']
+    score = 2 * len(tri_a & tri_b) / (len(tri_a) + len(tri_b))
+    if MIN_TRIGRAM_SIMILARITY <= score < 1.0:
+        score = max(score, jaro_winkler(a['nome'], b['nome']))
+
+    if contato_igual: score += CONTACT_BONUS
+    elif contato_diferente: score -= CONTACT_BONUS
+    return score
+
+def find_similar_pairs(pessoas: list[dict], threshold: float = MATCH_THRESHOLD, stop_event=None) -> list[tuple[int, int, float]]:
+    """
+    Retorna os pares (id_a, id_b, nota) com nota >= threshold, comparando só dentro de cada bloco.
+    `pessoas` são dicts com dedup_engine.PLAN_COLUMNS + FUZZY_COLUMNS. Retorna o que tiver encontrado
+    até o momento se `stop_event` for sinalizado.
+    """
+    blocks = defaultdict(list)
+    for pessoa in pessoas:
+        prepared = _prepare(pessoa)
+        if not prepared: continue
+        for bloco in prepared['blocos']:
+            blocks[bloco].append(prepared)
+
+    pairs = {}
+    skipped = 0
+    for n, members in enumerate(blocks.values()):
+        if n % 1000 == 0 and stop_event is not None and stop_event.is_set(): break
+        if len(members) < 2: continue
+        if len(members) > MAX_BLOCK_SIZE:
+            skipped += 1
+            continue
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if (a['id'], b['id']) in pairs: continue
+                score = score_pair(a, b)
+                if score >= threshold:
+                    pairs[(a['id'], b['id'])] = round(min(score, 1.0), 2)
+    if skipped:
+        logging.warning(f"Busca aproximada de duplicatas: {skipped} blocos com mais de {MAX_BLOCK_SIZE} pessoas foram ignorados.")
+    return [(id_a, id_b, score) for (id_a, id_b), score in pairs.items()]
\ No newline at end of file
@@ -0,0 +1,123 @@
+# --- START OF FILE functions/import_benchmark.py ---
+"""
+Benchmark da leitura do CSV de votação do TSE (votacao_candidato_munzona).
+
+Compara a leitura antiga (contagem prévia das linhas + csv.DictReader + limpeza de todas as colunas)
+com a agregação em passada única de `votacao_aggregator.aggregate_votacao`, em um processo e em vários,
+sobre um arquivo informado ou sobre um arquivo sintético com o cabeçalho completo do TSE. Também
+confere se todas as leituras produzem exatamente os mesmos totais.
+
+Uso:
+    python -m functions.import_benchmark [--arquivo votacao_candidato_munzona_2022_SP.csv] [--linhas 1000000] [--processos 8]
+"""
+import os
+import csv
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+from functions import data_helpers
+from data_access import votacao_aggregator
+
+HEADER = ("DT_GERACAO;HH_GERACAO;ANO_ELEICAO;CD_TIPO_ELEICAO;NM_TIPO_ELEICAO;NR_TURNO;CD_ELEICAO;DS_ELEICAO;DT_ELEICAO;"
+          "TP_ABRANGENCIA;SG_UF;SG_UE;NM_UE;CD_MUNICIPIO;NM_MUNICIPIO;NR_ZONA;CD_CARGO;DS_CARGO;SQ_CANDIDATO;NR_CANDIDATO;"
+          "NM_CANDIDATO;NM_URNA_CANDIDATO;NM_SOCIAL_CANDIDATO;CD_SITUACAO_CANDIDATURA;DS_SITUACAO_CANDIDATURA;"
+          "CD_DETALHE_SITUACAO_CAND;DS_DETALHE_SITUACAO_CAND;CD_SITUACAO_JULGAMENTO;DS_SITUACAO_JULGAMENTO;"
+          "CD_SITUACAO_CASSACAO;DS_SITUACAO_CASSACAO;CD_SITUACAO_DICONSTITUICAO;DS_SITUACAO_DICONSTITUICAO;TP_AGREMIACAO;"
+          "NR_PARTIDO;SG_PARTIDO;NM_PARTIDO;NR_FEDERACAO;NM_FEDERACAO;SG_FEDERACAO;DS_COMPOSICAO_FEDERACAO;SQ_COLIGACAO;"
+          "NM_COLIGACAO;DS_COMPOSICAO_COLIGACAO;ST_VOTO_EM_TRANSITO;QT_VOTOS_NOMINAIS;NM_TIPO_DESTINACAO_VOTOS;"
+          "QT_VOTOS_NOMINAIS_VALIDOS;CD_SIT_TOT_TURNO;DS_SIT_TOT_TURNO").split(";")
+
+CIDADES = ["SÃO PAULO", "CAMPINAS", "SANTOS", "SÃO JOSÉ DOS CAMPOS", "RIBEIRÃO PRETO", "SOROCABA", "BAURU", "FRANCA",
+           "MARÍLIA", "JUNDIAÍ", "PIRACICABA", "SANTA BÁRBARA D'OESTE", "ARAÇATUBA", "PRESIDENTE PRUDENTE"]
+CARGOS = ["DEPUTADO FEDERAL", "DEPUTADO ESTADUAL", "SENADOR", "GOVERNADOR"]
+
+def build_synthetic_file(path: str, n_rows: int, seed: int = 42):
+    rnd = random.Random(seed)
+    candidatos = [(str(250001600000 + i), rnd.choice(CARGOS), f"CANDIDATO SINTÉTICO {i}") for i in range(3000)]
+    cidades = [(str(60000 + i * 17), c) for i, c in enumerate(CIDADES)]
+    with open(path, 'w', encoding='latin-1', newline='') as f:
+        f.write(";".join(f'"{h}"' for h in HEADER) + "\r\n")
+        for _ in range(n_rows):
+            sq, cargo, nome = rnd.choice(candidatos)
+            cd_mun, cidade = rnd.choice(cidades)
+            values = dict.fromkeys(HEADER, "#NULO#")
+            values.update({
+                "DT_GERACAO": "19/12/2022", "HH_GERACAO": "13:16:01", "ANO_ELEICAO": "2022", "NR_TURNO": "1",
+                "DS_ELEICAO": "Eleição Geral Federal 2022", "SG_UF": "SP", "SG_UE": "SP", "NM_UE": "SÃO PAULO",
+                "CD_MUNICIPIO": cd_mun, "NM_MUNICIPIO": cidade, "NR_ZONA": str(rnd.randint(1, 420)), "DS_CARGO": cargo,
+                "SQ_CANDIDATO": sq, "NM_CANDIDATO": nome, "NM_URNA_CANDIDATO": nome, "DS_SITUACAO_CANDIDATURA": "APTO",
+                "NM_PARTIDO": "PARTIDO SINTÉTICO", "DS_COMPOSICAO_COLIGACAO": "PARTIDO A / PARTIDO B",
+                "QT_VOTOS_NOMINAIS": str(rnd.randint(0, 5000)), "DS_SIT_TOT_TURNO": "NÃO ELEITO",
+            })
+            f.write(";".join(f'"{values[h]}"' for h in HEADER) + "\r\n")
+
+def legacy_aggregate(filepath: str):
+    """Leitura usada antes da passada única, mantida aqui apenas como referência de desempenho."""
+    with open(filepath, 'r', encoding='latin-1', buffering=1024*1024) as f:
+        total_rows = sum(1 for _ in f) - 1
+
+    votos_agregados = defaultdict(lambda: defaultdict(int))
+    candidato_info_cache_csv = {}
+    ano_eleicao_arquivo = None
+    with open(filepath, 'r', encoding='latin-1', buffering=1024*1024) as f:
+        reader = csv.DictReader(f, delimiter=';')
+        header = [h.strip().upper().replace('"', '') for h in reader.fieldnames]
+        reader.fieldnames = header
+        col_keys = [k.replace('"', '') for k in header]
+        for row in reader:
+            values = [v.strip().replace('"', '') if v else '' for v in row.values()]
+            norm_row = dict(zip(col_keys, values))
+            sq_cand = norm_row.get('SQ_CANDIDATO')
+            cidade_original = norm_row.get('NM_MUNICIPIO')
+            cidade_key = data_helpers.normalize_city_key(cidade_original) if cidade_original else ''
+            if not ano_eleicao_arquivo: ano_eleicao_arquivo = data_helpers.safe_int(norm_row.get('ANO_ELEICAO'))
+            if not sq_cand or not cidade_key: continue
+            if sq_cand not in candidato_info_cache_csv:
+                candidato_info_cache_csv[sq_cand] = {'cargo': norm_row.get('DS_CARGO'), 'ano': ano_eleicao_arquivo}
+            votos_agregados[sq_cand][cidade_key] += data_helpers.safe_int(norm_row.get('QT_VOTOS_NOMINAIS'))
+    return votos_agregados, candidato_info_cache_csv, ano_eleicao_arquivo, total_rows
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark da leitura do CSV de votação do TSE.")
+    parser.add_argument("--arquivo", help="CSV de votação real (por padrão, gera um arquivo sintético)")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="Linhas do arquivo sintético")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="Processos da agregação paralela")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = args.arquivo
+        if not filepath:
+            filepath = os.path.join(tmp, "votacao_sintetica.csv")
+            print(f"Gerando arquivo sintético com {args.linhas:,} linhas...")
+            build_synthetic_file(filepath, args.linhas)
+        print(f"Arquivo: {filepath} ({os.path.getsize(filepath) / 1048576:,.1f} MB)")
+
+        (legacy_votos, legacy_info, legacy_ano, total_rows), legacy_time = _timed(lambda: legacy_aggregate(filepath))
+        results = [("Leitura antiga", legacy_time, (legacy_votos, legacy_info, legacy_ano))]
+        for workers in sorted({1, max(1, args.processos)}):
+            result, elapsed = _timed(lambda: votacao_aggregator.aggregate_votacao(filepath, workers, threading.Event()))
+            results.append((f"{workers} processo(s)", elapsed, result))
+
+    same = True
+    for label, elapsed, (votos, info, ano) in results:
+        print(f"{label:<16} {elapsed:7.2f} s  ({total_rows / elapsed:12,.0f} linhas/s)  ganho {legacy_time / elapsed:5.1f}x")
+        same = same and (ano == legacy_ano and {k: dict(v) for k, v in votos.items()} == {k: dict(v) for k, v in legacy_votos.items()}
+                         and {k: v['cargo'] for k, v in info.items()} == {k: v['cargo'] for k, v in legacy_info.items()}
+                         and [list(v) for v in votos.values()] == [list(v) for v in legacy_votos.values()])
+    print("Totais idênticos aos da leitura antiga." if same else "ATENÇÃO: os totais divergem da leitura antiga!")
+    return 0 if same else 1
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
+
+# --- END OF FILE functions/import_benchmark.py ---
\ No newline at end of file
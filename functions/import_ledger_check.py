@@ -0,0 +1,126 @@
+# --- START OF FILE functions/import_ledger_check.py ---
+"""
+Verificação de regressão da importação cadastral incremental (ledger por nome de arquivo).
+
+Importa, num banco temporário, dois arquivos de candidatos com o mesmo nome ('dados.csv') em pastas
+diferentes e de anos diferentes, e confere que o segundo não remove as candidaturas do primeiro. Depois
+reimporta o segundo arquivo sem uma das linhas e confere que exatamente essa candidatura é removida.
+
+Uso:
+    python -m functions.import_ledger_check [--candidatos 300]
+"""
+import sys
+import os
+import logging
+import argparse
+import tempfile
+import threading
+
+import config
+import database_setup
+from data_access.connection_pool import ConnectionPool
+from data_access.person_repository import PersonRepository
+from data_access.misc_repository import MiscRepository
+from data_access.import_service import ImportService
+
+HEADER = ("DT_GERACAO;HH_GERACAO;ANO_ELEICAO;NM_TIPO_ELEICAO;SG_UF;SG_UE;NM_UE;DS_CARGO;SQ_CANDIDATO;NR_CANDIDATO;"
+          "NM_CANDIDATO;NM_URNA_CANDIDATO;NR_CPF_CANDIDATO;DS_EMAIL;SG_PARTIDO;DT_NASCIMENTO;NR_TITULO_ELEITORAL_CANDIDATO;"
+          "DS_GENERO;DS_GRAU_INSTRUCAO;DS_OCUPACAO;DS_SIT_TOT_TURNO").split(";")
+
+class _ProgressStub:
+    """Janela de progresso mínima: executa os callbacks na hora e guarda o resultado da operação."""
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self.message, self.error = None, None
+
+    def after(self, _ms, callback):
+        callback()
+
+    def update_progress(self, _text, _value):
+        pass
+
+    def operation_finished(self, message, error=None):
+        self.message, self.error = message, error
+
+def write_cadastral_file(path: str, ano: int, n_candidatos: int, skip: set[int] = frozenset()):
+    """Arquivo de candidatos no formato do TSE; o candidato i é a mesma pessoa (CPF/título) em todos os anos."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='latin-1', newline='') as f:
+        f.write(";".join(f'"{h}"' for h in HEADER) + "\r\n")
+        for i in range(n_candidatos):
+            if i in skip: continue
+            values = dict.fromkeys(HEADER, "#NULO#")
+            values.update({
+                "ANO_ELEICAO": str(ano), "NM_TIPO_ELEICAO": "ELEIÇÃO ORDINÁRIA", "SG_UF": "SP", "SG_UE": "71072",
+                "NM_UE": "SÃO PAULO", "DS_CARGO": "VEREADOR", "SQ_CANDIDATO": f"{ano}{i:08d}", "NR_CANDIDATO": str(10000 + i),
+                "NM_CANDIDATO": f"CANDIDATO {i}", "NM_URNA_CANDIDATO": f"URNA {i}", "NR_CPF_CANDIDATO": f"{i:011d}",
+                "SG_PARTIDO": "PS", "DT_NASCIMENTO": "01/01/1970", "NR_TITULO_ELEITORAL_CANDIDATO": f"{i:012d}",
+                "DS_GENERO": "FEMININO", "DS_GRAU_INSTRUCAO": "SUPERIOR COMPLETO", "DS_OCUPACAO": "OUTROS",
+                "DS_SIT_TOT_TURNO": "SUPLENTE",
+            })
+            f.write(";".join(f'"{values[h]}"' for h in HEADER) + "\r\n")
+
+def _import(service: ImportService, filepath: str) -> str:
+    progress = _ProgressStub()
+    service.importar_dados_cadastrais(filepath, progress)
+    if progress.error: raise RuntimeError(f"Importação de {filepath} falhou: {progress.error}")
+    return progress.message
+
+def _count_candidaturas(pool: ConnectionPool, ano: int) -> int:
+    return pool.reader().execute("SELECT COUNT(*) FROM candidaturas WHERE ano_eleicao = ?", (ano,)).fetchone()[0]
+
+def run_checks(tmp_dir: str, n_candidatos: int) -> list[str]:
+    db_path = os.path.join(tmp_dir, "import_ledger_check.db")
+    # Schema completo da versão atual, criado como no primeiro uso do aplicativo
+    config.DB_PATH_CONFIG = db_path
+    database_setup.setup_database()
+
+    pool = ConnectionPool(db_path)
+    failures = []
+    try:
+        service = ImportService(pool, PersonRepository(pool), MiscRepository(pool))
+        arquivo_2020 = os.path.join(tmp_dir, "a", "dados.csv")
+        arquivo_2022 = os.path.join(tmp_dir, "b", "dados.csv")
+
+        write_cadastral_file(arquivo_2020, 2020, n_candidatos)
+        _import(service, arquivo_2020)
+        write_cadastral_file(arquivo_2022, 2022, n_candidatos)
+        _import(service, arquivo_2022)
+        for ano in (2020, 2022):
+            total = _count_candidaturas(pool, ano)
+            if total != n_candidatos:
+                failures.append(f"arquivo homônimo de outro ano: {total} candidaturas de {ano} (esperado {n_candidatos})")
+
+        # Republicação do arquivo de 2022 sem o candidato 0: só ele sai, 2020 fica intacto
+        write_cadastral_file(arquivo_2022, 2022, n_candidatos, skip={0})
+        _import(service, arquivo_2022)
+        for ano, esperado in ((2020, n_candidatos), (2022, n_candidatos - 1)):
+            total = _count_candidaturas(pool, ano)
+            if total != esperado:
+                failures.append(f"republicação sem uma linha: {total} candidaturas de {ano} (esperado {esperado})")
+        if pool.reader().execute("SELECT 1 FROM candidaturas WHERE sq_candidato = ?", ("202200000000",)).fetchone():
+            failures.append("republicação sem uma linha: a candidatura retirada do arquivo continua no banco")
+    finally:
+        pool.close_all()
+    return failures
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica a remoção de candidaturas na reimportação cadastral.")
+    parser.add_argument("--candidatos", type=int, default=300, help="Candidatos por arquivo sintético")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        failures = run_checks(tmp_dir, args.candidatos)
+
+    if failures:
+        print(f"{len(failures)} falha(s) na importação incremental:")
+        for failure in failures: print(f" - {failure}")
+        return 1
+    print("A reimportação só remove candidaturas do ano/município do arquivo importado.")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    sys.exit(main())
+
+# --- END OF FILE functions/import_ledger_check.py ---
\ No newline at end of file
@@ -0,0 +1,217 @@
+# --- START OF FILE functions/query_plan_check.py ---
+"""
+Verificação de regressão dos planos de consulta dos repositórios.
+
+Cria um banco sintético grande num diretório temporário, executa os métodos de leitura dos
+repositórios/serviços capturando o SQL realmente enviado ao SQLite e roda EXPLAIN QUERY PLAN
+em cada comando. Qualquer varredura completa de tabela (SCAN sem índice) que não esteja
+explicitamente permitida para aquela consulta é reportada como falha.
+
+Uso:
+    python -m functions.query_plan_check [--pessoas 20000]
+"""
+import sys
+import os
+import re
+import random
+import sqlite3
+import logging
+import tempfile
+import argparse
+from datetime import datetime, timedelta
+
+import database_setup
+from data_access.connection_pool import ConnectionPool
+from data_access.person_repository import PersonRepository
+from data_access.organization_repository import OrganizationRepository
+from data_access.crm_repository import CrmRepository
+from data_access.misc_repository import MiscRepository
+from data_access.user_repository import UserRepository
+from data_access.report_service import ReportService
+from data_access.geocode_cache_repository import GeocodeCacheRepository
+from data_access.geocode_queue import GeocodeJobQueue
+
+CIDADES = ["SAO PAULO", "CAMPINAS", "SANTOS", "SOROCABA", "RIBEIRAO PRETO", "BAURU", "FRANCA", "MARILIA", "JUNDIAI", "PIRACICABA"]
+CARGOS = ["PREFEITO", "VICE-PREFEITO", "VEREADOR", "DEPUTADO ESTADUAL", "DEPUTADO FEDERAL"]
+SITUACOES = ["ELEITO", "NÃO ELEITO", "SUPLENTE", "ELEITO POR QP", "REELEITO"]
+ANOS = [2016, 2018, 2020, 2022, 2024]
+
+def build_synthetic_db(db_path: str, n_pessoas: int = 20000, seed: int = 42):
+    """Cria o schema completo (com índices) e popula um volume representativo de dados."""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    database_setup._create_all_tables(cursor)
+    database_setup._populate_lookup_data(cursor)
+
+    cursor.executemany("INSERT INTO municipios (cidade_key, cidade, uf, sg_ue) VALUES (?, ?, 'SP', ?)",
+                       [(c, c.title(), str(60000 + i)) for i, c in enumerate(CIDADES)])
+
+    hoje = datetime.now()
+    pessoas = []
+    for i in range(1, n_pessoas + 1):
+        nasc = datetime(1950, 1, 1) + timedelta(days=rnd.randrange(0, 20000))
+        criacao = hoje - timedelta(days=rnd.randrange(0, 900))
+        pessoas.append((i, f"PESSOA {i}", f"APELIDO {i}", nasc.strftime("%d/%m/%Y"), f"119{i:08d}", rnd.choice(CIDADES),
+                        rnd.random() * -5 - 20, rnd.random() * -5 - 45, rnd.random() < 0.3, criacao.strftime("%Y-%m-%d %H:%M:%S")))
+    cursor.executemany("INSERT INTO pessoas (id_pessoa, nome, apelido, data_nascimento, celular, cidade, latitude, longitude, geo_visivel, data_criacao) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", pessoas)
+
+    candidaturas, votos = [], []
+    for id_pessoa in range(1, n_pessoas + 1, 2):
+        for ano in rnd.sample(ANOS, rnd.randint(1, 3)):
+            sq = f"{ano}{id_pessoa:08d}"
+            cidade = rnd.choice(CIDADES)
+            candidaturas.append((id_pessoa, ano, sq, f"URNA {id_pessoa}", rnd.choice(CARGOS), cidade, rnd.randrange(0, 50000), rnd.choice(SITUACOES), f"P{rnd.randrange(30)}"))
+            if ano % 4 == 2:
+                votos.extend((sq, ano, c, rnd.randrange(0, 5000)) for c in rnd.sample(CIDADES, 3))
+    cursor.executemany("INSERT INTO candidaturas (id_pessoa, ano_eleicao, sq_candidato, nome_urna, cargo, cidade, votos, situacao, partido) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", candidaturas)
+    cursor.executemany("INSERT OR IGNORE INTO votos_por_municipio (sq_candidato, ano_eleicao, cidade, votos) VALUES (?, ?, ?, ?)", votos)
+
+    cursor.executemany("INSERT INTO organizacoes (nome_fantasia, cidade, id_municipio, tipo_organizacao, latitude, longitude, geo_visivel) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       [(f"ORGANIZACAO {i}", rnd.choice(CIDADES), rnd.randint(1, len(CIDADES)), "Prefeitura" if i % 50 == 0 else "Empresa", -22.0, -47.0, i % 3 == 0) for i in range(1, n_pessoas // 10)])
+    cursor.executemany("INSERT INTO atendimentos (id_pessoa, titulo, data_abertura, status, prioridade) VALUES (?, ?, ?, ?, ?)",
+                       [(rnd.randint(1, n_pessoas), f"ATENDIMENTO {i}", (hoje - timedelta(days=rnd.randrange(400))).strftime("%Y-%m-%d"),
+                         rnd.choice(["Aberto", "Em Andamento", "Concluído", "Concluído", "Concluído", "Cancelado"]),
+                         rnd.choice(["Baixa", "Normal", "Normal", "Normal", "Alta", "Urgente"])) for i in range(n_pessoas // 4)])
+    cursor.executemany("INSERT INTO eventos (titulo, data_evento) VALUES (?, ?)",
+                       [(f"EVENTO {i}", (hoje + timedelta(days=rnd.randrange(-700, 100))).strftime("%Y-%m-%d")) for i in range(n_pessoas // 10)])
+    cursor.execute("INSERT INTO app_settings (key, value) VALUES ('proprietario_id_pessoa', '1')")
+
+    database_setup._create_indexes(cursor)
+    database_setup._create_candidatura_recente(cursor)
+    database_setup._create_pessoas_fts(cursor)
+    database_setup._create_geocode_cache(cursor)
+    database_setup._create_geocode_jobs(cursor)
+    database_setup._create_spatial_index(cursor)
+    conn.commit()
+    conn.close()
+
+def _full_scans(conn: sqlite3.Connection, sql: str) -> set[str]:
+    """Retorna os nomes (tabela ou alias) varridos sem índice no plano do comando."""
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+    subqueries = {m.group(1) for d in plan for m in [re.match(r"(?:MATERIALIZE|CO-ROUTINE) (\S+)", d)] if m}
+    scans = set()
+    for detail in plan:
+        m = re.match(r"SCAN (?:TABLE )?(\S+)(.*)", detail)
+        if not m or m.group(1).startswith("(") or m.group(1) in subqueries: continue
+        if "USING" in m.group(2) or "VIRTUAL TABLE" in m.group(2): continue
+        scans.add(m.group(1))
+    return scans
+
+def build_checks(repos: dict) -> list[tuple[str, callable, set[str]]]:
+    """
+    Lista de (descrição, chamada, varreduras permitidas).
+    As varreduras permitidas cobrem listagens completas ou filtros que, por natureza, não usam índice
+    (LIKE '%termo%', expressões sobre colunas). Qualquer outra varredura é tratada como regressão.
+    """
+    person, org, crm, misc, user, report = (repos[k] for k in ("person", "organization", "crm", "misc", "user", "report"))
+    hoje = datetime.now()
+    return [
+        ("Pessoas: página inicial", lambda: person.get_paginated_pessoas(page=1, items_per_page=200), {"p"}),
+        ("Pessoas: contagem sem filtro", lambda: person.count_pessoas(), {"p"}),
+        ("Pessoas: filtro por cidade/ano/cargo", lambda: person.get_paginated_pessoas(cidade="CAMPINAS", ano_eleicao="2024", cargo="VEREADOR"), set()),
+        ("Pessoas: busca por nome", lambda: person.get_paginated_pessoas(search_term="PESSOA 12", sort_by="Relevância"), set()),
+        ("Pessoas: contagem da busca", lambda: person.count_pessoas(search_term="apel 12"), set()),
+        ("Pessoas: página seguinte por chave (Nome)", lambda: person.get_pessoas_page(200, "Nome", False, cursor=person.get_pessoas_page(200, "Nome", False)[2]), set()),
+        ("Pessoas: página anterior por chave (Apelido)", lambda: person.get_pessoas_page(200, "Apelido", True, cursor=person.get_pessoas_page(200, "Apelido", True)[2], backwards=True), set()),
+        ("Pessoas: página seguinte por chave (Celular)", lambda: person.get_pessoas_page(200, "Celular", False, cursor=person.get_pessoas_page(200, "Celular", False)[2]), set()),
+        ("Pessoas: página por chave (Cidade)", lambda: person.get_pessoas_page(200, "Cidade", False), {"p"}),
+        ("Pessoas: detalhes", lambda: person.get_person_details(1), set()),
+        ("Pessoas: candidaturas", lambda: person.get_candidaturas_for_pessoa(1), set()),
+        ("Pessoas: relacionamentos", lambda: person.get_relacionamentos_for_pessoa(1), set()),
+        ("Pessoas: listas", lambda: person.get_list_ids_for_pessoa(1), set()),
+        ("Pessoas: geocodificadas", lambda: person.get_all_geocoded_pessoas(), {"p"}),
+        ("Pessoas: área do mapa (R*Tree)", lambda: person.get_geocoded_pessoas_in_bbox(-23.0, -47.5, -22.0, -46.5, limit=500), set()),
+        ("Pessoas: mais próximas", lambda: person.get_nearest_pessoas(-22.9, -47.06, k=20), set()),
+        ("Pessoas: por raio", lambda: person.get_pessoas_within_radius(-22.9, -47.06, 15.0), set()),
+        ("Candidaturas: cidade exata", lambda: person.get_candidaturas_por_cidade_exata("CAMPINAS", 2024, "VEREADOR", ["ELEITO", "REELEITO"]), set()),
+        ("Candidaturas: busca por nome", lambda: person.search_candidaturas("URNA 13", "Nome", 2024), set()),
+        ("Candidaturas: busca por partido", lambda: person.search_candidaturas("P1", "Partido", 2024), set()),
+        ("Organizações: página inicial", lambda: org.get_all_organizacoes(), {"organizacoes"}),
+        ("Organizações: página seguinte por chave", lambda: org.get_organizacoes_page(limit=50, cursor=org.get_organizacoes_page(limit=50)[2]), set()),
+        ("Organizações: contagem", lambda: org.count_organizacoes(), set()),
+        ("Organizações: detalhes", lambda: org.get_organization_details(1), set()),
+        ("Organizações: geocodificadas", lambda: org.get_all_geocoded_organizacoes(), {"organizacoes"}),
+        ("Organizações: área do mapa (R*Tree)", lambda: org.get_geocoded_organizacoes_in_bbox(-22.5, -47.5, -21.5, -46.5), set()),
+        ("Organizações: mais próximas", lambda: org.get_nearest_organizacoes(-22.0, -47.0, k=5), set()),
+        ("Organizações: por raio", lambda: org.get_organizacoes_within_radius(-22.0, -47.0, 1.0, limit=50), set()),
+        ("Atendimentos: por pessoa", lambda: crm.get_atendimentos_for_pessoa(1), set()),
+        ("Atendimentos: urgentes", lambda: crm.get_urgent_atendimentos(), set()),
+        ("Atendimentos: todos", lambda: crm.get_all_atendimentos(), {"a"}),
+        ("Atendimentos: por ID", lambda: crm.get_atendimento_by_id(1), set()),
+        ("Atendimentos: atualizações", lambda: crm.get_updates_for_atendimento(1), set()),
+        ("Eventos: mês", lambda: crm.get_eventos_for_month(hoje.year, hoje.month), set()),
+        ("Eventos: próximos", lambda: crm.get_upcoming_events(), set()),
+        ("Eventos: dia", lambda: crm.get_events_for_day(hoje.date()), set()),
+        ("Configurações: app_setting", lambda: misc.get_app_setting("proprietario_id_pessoa"), set()),
+        ("Candidaturas: anos de eleição", lambda: misc.get_anos_de_eleicao(), set()),
+        ("Candidaturas: cidades por ano municipal", lambda: misc.get_cidades_por_ano(2024), set()),
+        ("Candidaturas: cidades por ano geral", lambda: misc.get_cidades_por_ano(2022), set()),
+        ("Municípios: código TSE", lambda: misc.get_municipio_cod_tse("CAMPINAS"), set()),
+        ("Usuários: login", lambda: user.verify_user("admin", "admin"), set()),
+        ("Relatórios: cerimonial municipal", lambda: report.get_cerimonial_data("CAMPINAS", 2024), set()),
+        ("Relatórios: ranking por cargo", lambda: report.get_ranking_por_cargo("CAMPINAS", 2022), set()),
+        ("Relatórios: aniversariantes", lambda: report.get_upcoming_birthdays(), {"p"}),
+        ("Relatórios: estatísticas do painel", lambda: report.get_dashboard_stats(), {"pessoas", "proposicoes"}),
+        ("Relatórios: novos contatos por mês", lambda: report.get_new_contacts_per_month(), set()),
+        ("Relatórios: candidatos por cargo/ano", lambda: report.get_candidate_count_by_role_year(), set()),
+        ("Geocodificação: cache por endereço", lambda: repos["geocode_cache"].get_many(["RUA A, 1, CAMPINAS, SP", "CAMPINAS, SP"]), set()),
+        ("Geocodificação: próximo trabalho da fila", lambda: repos["geo_queue"].seconds_until_next(), set()),
+    ]
+
+def run_checks(db_path: str) -> list[str]:
+    pool = ConnectionPool(db_path)
+    try:
+        repos = {
+            "person": PersonRepository(pool), "organization": OrganizationRepository(pool), "crm": CrmRepository(pool),
+            "misc": MiscRepository(pool), "user": UserRepository(pool), "geocode_cache": GeocodeCacheRepository(pool),
+            "geo_queue": GeocodeJobQueue(pool, geo_service=None),
+        }
+        repos["report"] = ReportService(pool, repos["person"], repos["misc"])
+
+        conn = pool.reader()
+        failures = []
+        for description, call, allowed in build_checks(repos):
+            captured = []
+            conn.set_trace_callback(captured.append)
+            try:
+                call()
+            finally:
+                conn.set_trace_callback(None)
+
+            # Comandos internos das tabelas virtuais (ex.: tabelas-sombra do FTS5) também passam pelo trace; são ignorados.
+            statements = [sql for sql in captured if sql.lstrip().upper().startswith(("SELECT", "WITH")) and "'main'." not in sql]
+            if not statements:
+                failures.append(f"{description}: nenhuma consulta capturada.")
+            for sql in statements:
+                unexpected = _full_scans(conn, sql) - allowed
+                if unexpected:
+                    failures.append(f"{description}: varredura completa em {sorted(unexpected)}\n    {' '.join(sql.split())}")
+        return failures
+    finally:
+        pool.close_all()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica se as consultas dos repositórios usam índices.")
+    parser.add_argument("--pessoas", type=int, default=20000, help="Quantidade de pessoas no banco sintético.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "query_plan_check.db")
+        logging.info(f"Criando banco sintético com {args.pessoas} pessoas em {db_path}...")
+        build_synthetic_db(db_path, args.pessoas)
+        failures = run_checks(db_path)
+
+    if failures:
+        print(f"{len(failures)} consulta(s) com regressão de plano:")
+        for failure in failures: print(f" - {failure}")
+        return 1
+    print("Todos os planos de consulta usam índices onde esperado.")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    sys.exit(main())
+
+# --- END OF FILE functions/query_plan_check.py ---
\ No newline at end of file
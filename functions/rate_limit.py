@@ -0,0 +1,47 @@
+"""
+Limitador de taxa (token bucket) compartilhado entre threads, usado para respeitar a cota de requisições
+por segundo de APIs externas (ex.: geocodificação do Google).
+"""
+import time
+import threading
+
+class TokenBucket:
+    """
+    Até `rate` retiradas por segundo, com rajadas de até `capacity` (padrão: um segundo de cota).
+    `pause(segundos)` esvazia o balde e segura todas as threads, para quando a API pede que se espere.
+    """
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("A taxa do limitador deve ser positiva.")
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Retira uma ficha e retorna 0, ou retorna quantos segundos esperar antes de tentar de novo."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, stop_event: threading.Event | None = None) -> bool:
+        """Bloqueia até haver uma ficha. Retorna False se `stop_event` for sinalizado durante a espera."""
+        while (wait := self._reserve()) > 0:
+            if stop_event is None: time.sleep(wait)
+            elif stop_event.wait(wait): return False
+        return stop_event is None or not stop_event.is_set()
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
\ No newline at end of file
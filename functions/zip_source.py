@@ -0,0 +1,74 @@
+"""
+Arquivos ZIP do TSE (votacao_candidato_munzona_AAAA.zip, consulta_cand_AAAA.zip, perfil_eleitorado_AAAA.zip)
+como origem das importações, lidos direto do ZIP, sem extrair nada para o disco.
+
+Uma origem ZIP é o caminho do arquivo, opcionalmente seguido das UFs a importar: "consulta_cand_2024.zip"
+ou "consulta_cand_2024.zip::SP,MG". Os CSVs escolhidos (ver `csv_members`) formam um único arquivo lógico,
+na ordem em que estão no ZIP: as posições em bytes usadas no progresso, nas faixas de leitura paralela e
+nos checkpoints das importações são somas dos tamanhos descompactados. Como o nome da origem inclui as
+UFs, o registro de importação de "arquivo.zip::SP" é separado do de "arquivo.zip::MG".
+"""
+import re
+import zipfile
+
+SEPARATOR = "::"
+CSV_EXTENSIONS = ('.csv', '.txt')
+# Sufixo de UF dos CSVs por estado ("..._2024_SP.csv"); o arquivo nacional termina em "_BRASIL.csv"
+_UF_SUFFIX = re.compile(r'_([A-Za-z]{2}|BRASIL)\.(?:csv|txt)$', re.IGNORECASE)
+NACIONAL = "BRASIL"
+
+def make_source(zip_path: str, ufs=None) -> str:
+    ufs = normalize_ufs(ufs)
+    return f"{zip_path}{SEPARATOR}{','.join(ufs)}" if ufs else zip_path
+
+def normalize_ufs(ufs) -> tuple[str, ...]:
+    """'sp, mg' ou ['SP', 'MG'] -> ('MG', 'SP')."""
+    if isinstance(ufs, str): ufs = re.split(r'[\s,;]+', ufs)
+    return tuple(sorted({uf.strip().upper() for uf in ufs or () if uf.strip()}))
+
+def split_source(source: str) -> tuple[str, tuple[str, ...]]:
+    """Retorna (caminho do arquivo, UFs). Para origens que não são ZIP, as UFs vêm vazias."""
+    path, _, ufs = str(source).partition(SEPARATOR)
+    return path, normalize_ufs(ufs)
+
+def source_path(source: str) -> str:
+    return split_source(source)[0]
+
+def is_zip_source(source) -> bool:
+    return source_path(source).lower().endswith('.zip')
+
+def csv_members(zf: zipfile.ZipFile, ufs=()) -> list[zipfile.ZipInfo]:
+    """
+    CSVs do ZIP a importar. Com UFs, só os arquivos por estado dessas UFs; sem UFs, o arquivo nacional
+    (_BRASIL.csv, que repete todos os estados), ou todos os CSVs se não houver um. ZIPs sem arquivos por
+    estado (ex.: perfil_eleitorado_AAAA.csv, com a UF em cada linha) são lidos inteiros.
+    """
+    members = [info for info in zf.infolist() if not info.is_dir() and info.filename.lower().endswith(CSV_EXTENSIONS)]
+    by_uf = {}
+    for info in members:
+        match = _UF_SUFFIX.search(info.filename)
+        if match: by_uf.setdefault(match.group(1).upper(), []).append(info)
+    estados = [uf for uf in by_uf if uf != NACIONAL]
+    if ufs and estados:
+        return [info for uf in ufs for info in by_uf.get(uf, [])]
+    if NACIONAL in by_uf:
+        return by_uf[NACIONAL]
+    return members
+
+def members_with_offsets(source: str) -> list[tuple[zipfile.ZipInfo, int]]:
+    """(membro, posição lógica em que ele começa) de cada CSV da origem."""
+    path, ufs = split_source(source)
+    with zipfile.ZipFile(path) as zf:
+        members = csv_members(zf, ufs)
+    if not members:
+        raise ValueError(f"Nenhum CSV {'das UFs ' + ', '.join(ufs) + ' ' if ufs else ''}encontrado no arquivo '{path}'.")
+    offsets = []
+    base = 0
+    for info in members:
+        offsets.append((info, base))
+        base += info.file_size
+    return offsets
+
+def source_size(source: str) -> int:
+    """Tamanho lógico da origem: soma dos tamanhos descompactados dos CSVs escolhidos."""
+    return sum(info.file_size for info, _ in members_with_offsets(source))
\ No newline at end of file
@@ -1,10 +1,12 @@
 import sys
 import os
 import logging
+import multiprocessing
 from tkinter import messagebox
-import sqlite3
 from dotenv import load_dotenv # <-- Importa a biblioteca para ler o arquivo .env
 
+from data_access.connection_pool import ConnectionPool
+
 # --- Repositórios ---
 from data_access.user_repository import UserRepository
 from data_access.person_repository import PersonRepository
@@ -16,7 +18,10 @@ from data_access.misc_repository import MiscRepository
 from data_access.report_service import ReportService
 from data_access.import_service import ImportService
 from data_access.geo_service import GeoService
+from data_access.geocode_queue import GeocodeJobQueue
 from data_access.contact_service import ContactService
+from data_access.count_cache import CountCache
+from data_access.reference_cache import ReferenceDataCache
 
 # --- Carregamento Seguro da Chave de API ---
 load_dotenv() # Carrega as variáveis do arquivo .env para o ambiente
@@ -47,6 +52,8 @@ def setup_logging():
     root_logger.addHandler(console_handler)
 
 if __name__ == "__main__":
+    # Necessário para os processos de importação no executável empacotado (Windows)
+    multiprocessing.freeze_support()
     setup_logging()
     logging.info("\n" + "="*40 + "\nAplicação e-Votos iniciada.\n" + "="*40)
 
@@ -64,35 +71,43 @@ if __name__ == "__main__":
         messagebox.showerror("Erro Crítico de Inicialização", "Não foi possível configurar o banco de dados.")
         sys.exit(1)
 
-    conn = None
+    pool = None
+    geo_queue = None
     try:
-        conn = sqlite3.connect(config.DB_PATH_CONFIG, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        logging.info("Conexão com o banco de dados estabelecida.")
+        # Conexões de leitura por thread (WAL) e uma única conexão de escrita serializada
+        pool = ConnectionPool(config.DB_PATH_CONFIG)
+        logging.info("Pool de conexões com o banco de dados estabelecido.")
 
         # --- Etapa 1: Instanciação dos Repositórios ---
-        user_repo = UserRepository(conn)
-        person_repo = PersonRepository(conn)
-        org_repo = OrganizationRepository(conn)
-        crm_repo = CrmRepository(conn)
-        misc_repo = MiscRepository(conn)
+        user_repo = UserRepository(pool)
+        person_repo = PersonRepository(pool)
+        org_repo = OrganizationRepository(pool)
+        crm_repo = CrmRepository(pool)
+        misc_repo = MiscRepository(pool)
+        # Lookups, anos, cidades e configurações lidos uma vez e compartilhados (invalidado por 'data_changed')
+        reference_cache = ReferenceDataCache(pool, misc_repo)
         
         base_repos = {
             "user": user_repo,
             "person": person_repo,
             "organization": org_repo,
             "crm": crm_repo,
-            "misc": misc_repo
+            "misc": misc_repo,
+            "reference": reference_cache
         }
         
         # --- Etapa 2: Instanciação dos Serviços ---
         # A chave de API agora é lida de forma segura do ambiente
-        geo_service = GeoService(conn, api_key=MINHA_CHAVE_API_GOOGLE)
+        geo_service = GeoService(pool, api_key=MINHA_CHAVE_API_GOOGLE, reference_cache=reference_cache)
+        # Geocodificação dos contatos salvos, em segundo plano; retoma os trabalhos pendentes da última execução
+        geo_queue = GeocodeJobQueue(pool, geo_service)
+        geo_queue.start()
+        base_repos["geo_queue"] = geo_queue
         
         contact_service = ContactService(base_repos)
-        report_service = ReportService(conn, person_repo, misc_repo)
-        import_service = ImportService(conn, person_repo, misc_repo)
+        report_service = ReportService(pool, person_repo, misc_repo, reference_cache)
+        import_service = ImportService(pool, person_repo, misc_repo, reference_cache)
+        count_cache = CountCache(pool, person_repo, org_repo)
 
         # --- Etapa 3: Monta o dicionário final para a Aplicação ---
         repos = {
@@ -100,7 +115,8 @@ if __name__ == "__main__":
             "report": report_service,
             "import": import_service,
             "geo": geo_service,
-            "contact": contact_service
+            "contact": contact_service,
+            "count_cache": count_cache
         }
 
         saved_token = read_token_from_file()
@@ -119,6 +135,8 @@ if __name__ == "__main__":
         logging.critical(f"Erro fatal na aplicação: {e}", exc_info=True)
         messagebox.showerror("Erro Fatal", f"Ocorreu um erro inesperado. Verifique 'app.log'.\n\nDetalhes: {e}")
     finally:
-        if conn:
-            conn.close()
-            logging.info("Conexão com o banco de dados fechada no final do main.")
\ No newline at end of file
+        if geo_queue:
+            geo_queue.stop()
+        if pool:
+            pool.close_all()
+            logging.info("Conexões com o banco de dados fechadas no final do main.")
\ No newline at end of file
@@ -91,9 +91,9 @@ class CerimonialView(ctk.CTkFrame):
             self.city_listbox.insert(tk.END, city)
 
     def _populate_anos(self):
-        misc_repo = self.repos.get("misc")
-        if not misc_repo: return
-        self.anos_disponiveis = misc_repo.get_anos_de_eleicao()
+        reference_cache = self.repos.get("reference")
+        if not reference_cache: return
+        self.anos_disponiveis = reference_cache.get_anos_de_eleicao()
         if self.anos_disponiveis:
             self.ano_selector.configure(values=self.anos_disponiveis)
             self.ano_selector.set(self.anos_disponiveis[0])
@@ -103,9 +103,9 @@ class CerimonialView(ctk.CTkFrame):
 
     def on_ano_selected(self, selected_ano):
         self.selected_ano = int(selected_ano)
-        misc_repo = self.repos.get("misc")
-        if not misc_repo: return
-        self.cidades_disponiveis = misc_repo.get_cidades_por_ano(self.selected_ano)
+        reference_cache = self.repos.get("reference")
+        if not reference_cache: return
+        self.cidades_disponiveis = reference_cache.get_cidades_por_ano(self.selected_ano)
         self.print_button.configure(state="disabled")
         self._filter_city_list()
         self._load_last_city()
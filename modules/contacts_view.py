@@ -32,6 +32,11 @@ class ContactsView(ctk.CTkFrame):
         self.org_current_page = 1
         self.org_total_pages = 0
         self.org_items_per_page = 50
+        # Paginação por chave: cursores do primeiro/último registro exibidos e como buscar a página atual (cursor, backwards)
+        self.person_page_cursors = (None, None)
+        self.person_page_request = (None, False)
+        self.org_page_cursors = (None, None)
+        self.org_page_request = (None, False)
         self.org_last_sort_column = "ID"
         self.org_last_sort_reverse = False
         self.selected_contact_id = None
@@ -39,6 +44,9 @@ class ContactsView(ctk.CTkFrame):
         self.active_list_button = None
         self.current_view_mode = 'Pessoas'
         self._data_fetch_lock = threading.Lock()
+        self._count_generation = 0
+        self.person_count_exact = True
+        self.org_count_exact = True
         self._search_job_id = None
 
         # --- CORREÇÃO PRINCIPAL DA GRELHA ---
@@ -159,8 +167,8 @@ class ContactsView(ctk.CTkFrame):
         self.person_search_entry = ctk.CTkEntry(filters, placeholder_text="Buscar por nome ou apelido...")
         self.person_search_entry.grid(row=0, column=0, sticky="ew", padx=(0,5))
         self.person_search_entry.bind("<KeyRelease>", self._on_search_key_release)
-        misc_repo = self.repos.get("misc")
-        anos = ["Todos"] + (misc_repo.get_anos_de_eleicao() if misc_repo else [])
+        reference_cache = self.repos.get("reference")
+        anos = ["Todos"] + (reference_cache.get_anos_de_eleicao() if reference_cache else [])
         self.ano_eleicao_selector = ctk.CTkOptionMenu(filters, values=anos, command=self._on_filter_changed)
         self.ano_eleicao_selector.set("Todos")
         self.ano_eleicao_selector.grid(row=0, column=1, padx=5, sticky="ew")
@@ -168,7 +176,7 @@ class ContactsView(ctk.CTkFrame):
         self.cargo_selector = ctk.CTkOptionMenu(filters, values=cargos, command=self._on_filter_changed)
         self.cargo_selector.set("Todos")
         self.cargo_selector.grid(row=0, column=2, padx=5, sticky="ew")
-        cidades = ["TODAS"] + (misc_repo.get_city_list_from_db() if misc_repo else [])
+        cidades = ["TODAS"] + (reference_cache.get_city_list() if reference_cache else [])
         self.cidade_selector = CTkScrollableComboBox(filters, values=cidades, command=self._on_filter_changed)
         self.cidade_selector.set("TODAS")
         self.cidade_selector.grid(row=0, column=3, padx=(0,10), sticky="ew")
@@ -435,6 +443,14 @@ class ContactsView(ctk.CTkFrame):
             self._trigger_data_fetch()
 
     def _on_search_key_release(self, event=None):
+        if self.current_view_mode == 'Pessoas':
+            # Enquanto há texto na busca, os resultados vêm ordenados por relevância até o usuário clicar em uma coluna
+            if self.person_search_entry.get().strip():
+                if self.person_last_sort_column != "Relevância":
+                    self.person_last_sort_column, self.person_last_sort_reverse = "Relevância", False
+                    for col in self.person_tree["columns"]: self.person_tree.heading(col, text=col)
+            elif self.person_last_sort_column == "Relevância":
+                self.person_last_sort_column, self.person_last_sort_reverse = "ID", True
         if self._search_job_id: self.after_cancel(self._search_job_id)
         self._search_job_id = self.after(400, self._on_filter_changed)
 
@@ -479,23 +495,71 @@ class ContactsView(ctk.CTkFrame):
                     'cargo': self.cargo_selector.get() # <-- Linha relevante
                 }
                 
-                total_items = repo.count_pessoas(**filters)
-                paginated_data = repo.get_paginated_pessoas(page=self.person_current_page, items_per_page=self.person_items_per_page, sort_by=self.person_last_sort_column, sort_desc=self.person_last_sort_reverse, **filters)
-                self.after(0, self._update_ui_with_person_data, paginated_data, total_items)
+                total_items, count_exact = self._count_items('person', filters)
+                page_cursor, backwards, limit = self._get_page_request('person', total_items)
+                paginated_data, first_cursor, last_cursor = repo.get_pessoas_page(items_per_page=limit, sort_by=self.person_last_sort_column, sort_desc=self.person_last_sort_reverse, cursor=page_cursor, backwards=backwards, **filters)
+                self.after(0, self._update_ui_with_person_data, paginated_data, total_items, (first_cursor, last_cursor), count_exact)
             
             elif self.current_view_mode == 'Organizacoes':
                 repo = self.repos.get("organization")
                 if not repo: return
                 search_term = self.org_search_entry.get().strip()
-                offset = (self.org_current_page - 1) * self.org_items_per_page
-                total_items = repo.count_organizacoes(search_term)
-                paginated_data = repo.get_all_organizacoes(search_term=search_term, limit=self.org_items_per_page, offset=offset)
-                self.after(0, self._update_ui_with_org_data, paginated_data, total_items)
+                total_items, count_exact = self._count_items('org', {'search_term': search_term})
+                page_cursor, backwards, limit = self._get_page_request('org', total_items)
+                paginated_data, first_cursor, last_cursor = repo.get_organizacoes_page(search_term=search_term, limit=limit, cursor=page_cursor, backwards=backwards)
+                self.after(0, self._update_ui_with_org_data, paginated_data, total_items, (first_cursor, last_cursor), count_exact)
         finally:
             if self._data_fetch_lock.locked():
                 self._data_fetch_lock.release()
 
-    def _update_ui_with_person_data(self, data: list[Pessoa], total_items: int):
+    def _count_items(self, prefix: str, filters: dict) -> tuple[int, bool]:
+        """
+        Conta os registros da listagem atual. Com o cache de contagens, filtros muito amplos recebem primeiro
+        uma contagem limitada (exibida como "Página X de Y+") e a contagem exata é calculada em segundo plano.
+        """
+        self._count_generation += 1
+        count_cache = self.repos.get("count_cache")
+        if not count_cache:
+            if prefix == 'person': return self.repos["person"].count_pessoas(**filters), True
+            return self.repos["organization"].count_organizacoes(filters['search_term']), True
+
+        if prefix == 'person':
+            total_items, exact = count_cache.count_pessoas(**filters)
+            refine = lambda: count_cache.refine_count_pessoas(**filters)
+        else:
+            total_items, exact = count_cache.count_organizacoes(filters['search_term'])
+            refine = lambda: count_cache.refine_count_organizacoes(filters['search_term'])
+        if not exact:
+            generation = self._count_generation
+            def refine_thread():
+                exact_total = refine()
+                if self.winfo_exists():
+                    self.after(0, self._apply_exact_count, prefix, generation, exact_total)
+            threading.Thread(target=refine_thread, daemon=True).start()
+        return total_items, exact
+
+    def _apply_exact_count(self, prefix: str, generation: int, total_items: int):
+        # Descarta o resultado se outra busca (filtro, ordenação ou página) já foi disparada
+        if generation != self._count_generation: return
+        setattr(self, f"{prefix}_count_exact", True)
+        items_per_page = getattr(self, f"{prefix}_items_per_page")
+        setattr(self, f"{prefix}_total_pages", math.ceil(total_items / items_per_page) if items_per_page > 0 else 0)
+        self._update_pagination_controls('Pessoas' if prefix == 'person' else 'Organizacoes')
+
+    def _get_page_request(self, prefix: str, total_items: int) -> tuple[str | None, bool, int]:
+        """Retorna (cursor, backwards, limite) para buscar a página atual. A página 1 é sempre buscada do início."""
+        items_per_page = getattr(self, f"{prefix}_items_per_page")
+        current_page = getattr(self, f"{prefix}_current_page")
+        if current_page <= 1:
+            return None, False, items_per_page
+        page_cursor, backwards = getattr(self, f"{prefix}_page_request")
+        if backwards and page_cursor is None:
+            # Última página: busca só o resto, para que as páginas anteriores continuem alinhadas
+            remainder = total_items - (current_page - 1) * items_per_page
+            return None, True, remainder if 0 < remainder <= items_per_page else items_per_page
+        return page_cursor, backwards, items_per_page
+
+    def _update_ui_with_person_data(self, data: list[Pessoa], total_items: int, page_cursors: tuple = (None, None), count_exact: bool = True):
         tree = self.person_tree
         if not tree.winfo_exists(): return
 
@@ -518,12 +582,14 @@ class ContactsView(ctk.CTkFrame):
                 tree.insert('', 'end', text="Nenhum contato encontrado para os filtros selecionados.")
             else: return
 
+        self.person_page_cursors = page_cursors
+        self.person_count_exact = count_exact
         self.person_total_pages = math.ceil(total_items / self.person_items_per_page) if self.person_items_per_page > 0 else 0
         if total_items == 0: self.person_current_page = 0
         self._update_pagination_controls('Pessoas')
         self._clear_right_panel()
 
-    def _update_ui_with_org_data(self, data: list[Organizacao], total_items: int):
+    def _update_ui_with_org_data(self, data: list[Organizacao], total_items: int, page_cursors: tuple = (None, None), count_exact: bool = True):
         tree = self.org_tree
         if not tree.winfo_exists(): return
 
@@ -545,6 +611,8 @@ class ContactsView(ctk.CTkFrame):
                 tree.insert('', 'end', text="Nenhuma organização encontrada.")
             else: return
 
+        self.org_page_cursors = page_cursors
+        self.org_count_exact = count_exact
         self.org_total_pages = math.ceil(total_items / self.org_items_per_page) if self.org_items_per_page > 0 else 0
         if total_items == 0: self.org_current_page = 0
         self._update_pagination_controls('Organizacoes')
@@ -573,12 +641,20 @@ class ContactsView(ctk.CTkFrame):
         total_pages_attr = f"{prefix}_total_pages"
         current_page = getattr(self, page_attr)
         total_pages = getattr(self, total_pages_attr)
+        count_exact = getattr(self, f"{prefix}_count_exact")
         new_page = current_page
-        if direction == 'next' and current_page < total_pages: new_page += 1
+        if direction == 'next' and (current_page < total_pages or not count_exact): new_page += 1
         elif direction == 'prev' and current_page > 1: new_page -= 1
         elif direction == 'first' and current_page > 1: new_page = 1
-        elif direction == 'last' and total_pages > 0 and current_page != total_pages: new_page = total_pages
+        elif direction == 'last' and count_exact and total_pages > 0 and current_page != total_pages: new_page = total_pages
         if new_page != current_page:
+            # Cada página é buscada a partir do primeiro/último registro da página exibida (sem OFFSET)
+            first_cursor, last_cursor = getattr(self, f"{prefix}_page_cursors")
+            if direction == 'next': page_request = (last_cursor, False)
+            elif direction == 'prev': page_request = (first_cursor, True)
+            elif direction == 'last': page_request = (None, True)
+            else: page_request = (None, False)
+            setattr(self, f"{prefix}_page_request", page_request)
             setattr(self, page_attr, new_page)
             self._trigger_data_fetch()
 
@@ -603,14 +679,15 @@ class ContactsView(ctk.CTkFrame):
         widgets_attr = f"{prefix}_pagination_widgets"
         current_page = getattr(self, page_attr)
         total_pages = getattr(self, total_pages_attr)
+        count_exact = getattr(self, f"{prefix}_count_exact", True)
         widgets = getattr(self, widgets_attr, None)
         if widgets:
             btn_first, btn_prev, label, btn_next, btn_last = widgets
-            label.configure(text=f"Página {current_page} de {total_pages}")
+            label.configure(text=f"Página {current_page} de {total_pages}" + ("" if count_exact else "+"))
             btn_first.configure(state="normal" if current_page > 1 else "disabled")
             btn_prev.configure(state="normal" if current_page > 1 else "disabled")
-            btn_next.configure(state="normal" if current_page < total_pages else "disabled")
-            btn_last.configure(state="normal" if current_page < total_pages else "disabled")
+            btn_next.configure(state="normal" if current_page < total_pages or not count_exact else "disabled")
+            btn_last.configure(state="normal" if count_exact and current_page < total_pages else "disabled")
 
     def _update_treeview_sort_indicator(self, tree, col_name, reverse):
         sort_arrow = '▾' if not reverse else '▴'
@@ -1,7 +1,8 @@
 import customtkinter as ctk
-import threading
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageTk
 
 try:
@@ -12,12 +13,31 @@ except ImportError:
 import config
 from dto.pessoa import Pessoa
 from dto.organizacao import Organizacao
+from data_access.geocode_queue import TIPO_PESSOA, TIPO_ORGANIZACAO
+
+# O tkintermapview não avisa quando a visualização muda: a área visível é conferida a cada VIEWPORT_POLL_MS e os
+# marcadores são recarregados quando ela fica parada por VIEWPORT_DEBOUNCE_MS (fim do arrasto, da inércia ou do zoom).
+VIEWPORT_POLL_MS = 200
+VIEWPORT_DEBOUNCE_MS = 400
+# Margem carregada em volta da área visível, em fração da largura/altura, para que pequenos movimentos não busquem de novo
+VIEWPORT_MARGIN = 0.5
+# Máximo de marcadores de cada tipo na área; acima disso o mapa pede para aproximar
+MAX_MARKERS = 3000
 
 class GeolocalizacaoView(ctk.CTkFrame):
     def __init__(self, parent, repos: dict, app, initial_filters=None):
         super().__init__(parent, fg_color="transparent")
         self.repos = repos
         self.app = app 
+        self.markers = {} # (tipo, id) -> marcador no mapa; cada carga é comparada com ele em vez de recriar tudo
+        self._loaded_bbox = None # Área já carregada por completo (sem corte em MAX_MARKERS)
+        self._viewport = None
+        self._viewport_changed_at = None
+        self._watch_job = None
+        self._status_hide_job = None
+        # Uma busca por vez fora da thread da interface; cada pedido novo torna os anteriores obsoletos
+        self._fetch_generation = 0
+        self._fetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="GeolocalizacaoFetch")
         
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -34,12 +54,35 @@ class GeolocalizacaoView(ctk.CTkFrame):
         
         self.map_widget.add_left_click_map_command(self.on_marker_click)
 
-        self.load_markers_threaded()
+        # A primeira carga acontece quando o mapa tiver tamanho e posição definitivos
+        self._viewport_changed_at = time.monotonic()
+        self._watch_job = self.after(VIEWPORT_POLL_MS, self._watch_viewport)
 
     def on_data_updated(self):
         logging.info("GeolocalizacaoView: Atualizando marcadores devido ao evento 'data_changed'.")
         self.load_markers_threaded()
 
+    def on_entity_geocoded(self, tipo, id_entidade, latitude, longitude, **kwargs):
+        """Coordenadas de um contato chegaram da fila de geocodificação: cria, move ou remove só o marcador dele."""
+        if not hasattr(self, 'map_widget'): return
+        marker = self.markers.pop((tipo, id_entidade), None)
+        if marker: marker.delete()
+        if latitude is None or longitude is None: return
+
+        if tipo == TIPO_PESSOA and self.show_people_var.get():
+            self._add_marker(tipo, id_entidade, latitude, longitude, self.person_icon)
+        elif tipo == TIPO_ORGANIZACAO and self.show_orgs_var.get():
+            org_repo = self.repos.get("organization")
+            org = org_repo.get_organization_details(id_entidade) if org_repo else None
+            self._add_marker(tipo, id_entidade, latitude, longitude, self.pref_icon if org and org.tipo_organizacao == "Prefeitura" else self.org_icon)
+
+    def _add_marker(self, tipo, id_entidade, latitude, longitude, icon):
+        if tipo == TIPO_PESSOA:
+            command = lambda m, pid=id_entidade: self.app.dispatch("open_form", form_name="person", person_id=pid)
+        else:
+            command = lambda m, oid=id_entidade: self.app.dispatch("open_form", form_name="organization", org_id=oid)
+        self.markers[(tipo, id_entidade)] = self.map_widget.set_marker(float(latitude), float(longitude), icon=icon, command=command)
+
     def on_marker_click(self, coords):
         pass
 
@@ -84,80 +127,125 @@ class GeolocalizacaoView(ctk.CTkFrame):
         
         self.map_widget.grid(row=1, column=0, sticky="nsew")
         
+    def _current_viewport(self) -> tuple[float, float, float, float]:
+        """(min_lat, min_lon, max_lat, max_lon) da área visível do mapa."""
+        zoom = round(self.map_widget.zoom)
+        lat1, lon1 = tkintermapview.osm_to_decimal(*self.map_widget.upper_left_tile_pos, zoom)
+        lat2, lon2 = tkintermapview.osm_to_decimal(*self.map_widget.lower_right_tile_pos, zoom)
+        return min(lat1, lat2), min(lon1, lon2), max(lat1, lat2), max(lon1, lon2)
+
+    @staticmethod
+    def _expand_bbox(bbox, margin: float) -> tuple[float, float, float, float]:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        dlat, dlon = (max_lat - min_lat) * margin, (max_lon - min_lon) * margin
+        return max(min_lat - dlat, -90.0), max(min_lon - dlon, -180.0), min(max_lat + dlat, 90.0), min(max_lon + dlon, 180.0)
+
+    def _viewport_loaded(self, viewport) -> bool:
+        if not self._loaded_bbox: return False
+        min_lat, min_lon, max_lat, max_lon = self._loaded_bbox
+        return min_lat <= viewport[0] and min_lon <= viewport[1] and viewport[2] <= max_lat and viewport[3] <= max_lon
+
+    def _watch_viewport(self):
+        self._watch_job = None
+        try:
+            if self.winfo_ismapped():
+                viewport = self._current_viewport()
+                now = time.monotonic()
+                if viewport != self._viewport:
+                    self._viewport, self._viewport_changed_at = viewport, now
+                elif self._viewport_changed_at is not None and (now - self._viewport_changed_at) * 1000 >= VIEWPORT_DEBOUNCE_MS:
+                    self._viewport_changed_at = None
+                    if not self._viewport_loaded(viewport):
+                        self.load_markers_threaded()
+        except Exception as e:
+            logging.error(f"Erro ao acompanhar a área visível do mapa: {e}", exc_info=True)
+        self._watch_job = self.after(VIEWPORT_POLL_MS, self._watch_viewport)
+
     def load_markers_threaded(self):
+        """Busca (fora da thread da interface) os contatos da área visível mais a margem; pedidos anteriores ainda não aplicados são descartados."""
         self.status_label.pack(side="left", padx=10, pady=0)
         self.status_label.configure(text="Buscando contatos...")
-        
-        threading.Thread(target=self._fetch_data_for_map, daemon=True).start()
 
-    def _fetch_data_for_map(self):
+        self._fetch_generation += 1
+        bbox = self._expand_bbox(self._current_viewport(), VIEWPORT_MARGIN)
+        self._fetch_executor.submit(self._fetch_data_for_map, self._fetch_generation, bbox, self.show_people_var.get(), self.show_orgs_var.get())
+
+    def _fetch_data_for_map(self, generation: int, bbox, show_people: bool, show_orgs: bool):
+        if generation != self._fetch_generation: return # Já substituído por um pedido mais novo
         people_list = []
         orgs_list = []
         
         try:
             person_repo = self.repos.get("person")
-            if self.show_people_var.get() and person_repo:
-                people_list = person_repo.get_all_geocoded_pessoas()
+            if show_people and person_repo:
+                people_list = person_repo.get_geocoded_pessoas_in_bbox(*bbox, limit=MAX_MARKERS + 1)
 
             org_repo = self.repos.get("organization")
-            if self.show_orgs_var.get() and org_repo:
-                orgs_list = org_repo.get_all_geocoded_organizacoes()
+            if show_orgs and org_repo:
+                orgs_list = org_repo.get_geocoded_organizacoes_in_bbox(*bbox, limit=MAX_MARKERS + 1)
             
-            if self.winfo_exists():
-                self.after(0, self._update_map_with_data, people_list, orgs_list)
+            if generation == self._fetch_generation and self.winfo_exists():
+                self.after(0, self._update_map_with_data, generation, bbox, people_list, orgs_list)
         except Exception as e:
             logging.error(f"Erro ao buscar dados para o mapa: {e}", exc_info=True) 
 
-    def _update_map_with_data(self, people_list, orgs_list):
+    @staticmethod
+    def _marker_coords(entity, label: str) -> tuple[float, float] | None:
+        # Verifica se a latitude/longitude é um número real (ou string não vazia) antes de converter
+        if not ((isinstance(entity.latitude, (float, int)) or (isinstance(entity.latitude, str) and entity.latitude.strip())) and
+                (isinstance(entity.longitude, (float, int)) or (isinstance(entity.longitude, str) and entity.longitude.strip()))):
+            return None
         try:
-            self.status_label.configure(text="Atualizando mapa...")
-            self.map_widget.delete_all_marker()
-            
-            total_people = 0
-            if self.show_people_var.get():
-                for pessoa in people_list:
-                    command_pessoa = lambda m, pid=pessoa.id_pessoa: self.app.dispatch("open_form", form_name="person", person_id=pid)
-                    
-                    # --- CORREÇÃO AQUI: Verifica se a latitude/longitude é um número real antes de converter ---
-                    # Adicionalmente, verifica se não é string vazia.
-                    if (isinstance(pessoa.latitude, (float, int)) or (isinstance(pessoa.latitude, str) and pessoa.latitude.strip())) and \
-                       (isinstance(pessoa.longitude, (float, int)) or (isinstance(pessoa.longitude, str) and pessoa.longitude.strip())):
-                        
-                        try:
-                            self.map_widget.set_marker(float(pessoa.latitude), float(pessoa.longitude),
-                                                        icon=self.person_icon,
-                                                        command=command_pessoa)
-                        except ValueError as ve:
-                            logging.warning(f"Não foi possível converter Lat/Lon para float para Pessoa ID {pessoa.id_pessoa}: {pessoa.latitude}, {pessoa.longitude}. Erro: {ve}")
-                            continue # Pula este marcador se a conversão falhar
-                        
-                total_people = len(people_list)
-
-            total_orgs = 0
-            if self.show_orgs_var.get():
-                for org in orgs_list:
-                    icon_to_use = self.pref_icon if org.tipo_organizacao == "Prefeitura" else self.org_icon
-                    command_org = lambda m, oid=org.id_organizacao: self.app.dispatch("open_form", form_name="organization", org_id=oid)
-                    
-                    # --- CORREÇÃO AQUI: Verifica se a latitude/longitude é um número real antes de converter ---
-                    if (isinstance(org.latitude, (float, int)) or (isinstance(org.latitude, str) and org.latitude.strip())) and \
-                       (isinstance(org.longitude, (float, int)) or (isinstance(org.longitude, str) and org.longitude.strip())):
-                        try:
-                            self.map_widget.set_marker(float(org.latitude), float(org.longitude),
-                                                            icon=icon_to_use,
-                                                            command=command_org)
-                        except ValueError as ve:
-                            logging.warning(f"Não foi possível converter Lat/Lon para float para Org ID {org.id_organizacao}: {org.latitude}, {org.longitude}. Erro: {ve}")
-                            continue # Pula este marcador
-                total_orgs = len(orgs_list)
-
-            self.status_label.configure(text=f"{total_people} pessoas e {total_orgs} organizações no mapa.")
-            self.after(3000, lambda: self.status_label.pack_forget())
+            return float(entity.latitude), float(entity.longitude)
+        except ValueError as ve:
+            logging.warning(f"Não foi possível converter Lat/Lon para float para {label}: {entity.latitude}, {entity.longitude}. Erro: {ve}")
+            return None
+
+    def _update_map_with_data(self, generation: int, bbox, people_list, orgs_list):
+        if generation != self._fetch_generation: return # Resposta obsoleta: o mapa já pediu outra área
+        try:
+            truncated = len(people_list) > MAX_MARKERS or len(orgs_list) > MAX_MARKERS
+            people_list, orgs_list = people_list[:MAX_MARKERS], orgs_list[:MAX_MARKERS]
+
+            wanted = {} # (tipo, id) -> (lat, lon, ícone)
+            for pessoa in people_list:
+                coords = self._marker_coords(pessoa, f"Pessoa ID {pessoa.id_pessoa}")
+                if coords: wanted[(TIPO_PESSOA, pessoa.id_pessoa)] = (*coords, self.person_icon)
+            for org in orgs_list:
+                coords = self._marker_coords(org, f"Org ID {org.id_organizacao}")
+                if coords: wanted[(TIPO_ORGANIZACAO, org.id_organizacao)] = (*coords, self.pref_icon if org.tipo_organizacao == "Prefeitura" else self.org_icon)
+
+            # Só o que mudou é tocado: sai o que deixou a área, entra o que chegou, move o que mudou de lugar
+            removed = self.markers.keys() - wanted.keys()
+            for key in removed:
+                self.markers.pop(key).delete()
+            added = 0
+            for (tipo, id_entidade), (lat, lon, icon) in wanted.items():
+                marker = self.markers.get((tipo, id_entidade))
+                if marker is None:
+                    self._add_marker(tipo, id_entidade, lat, lon, icon)
+                    added += 1
+                elif tuple(marker.position) != (lat, lon):
+                    marker.set_position(lat, lon)
+
+            self._loaded_bbox = None if truncated else bbox
+            logging.debug(f"GeolocalizacaoView: {added} marcadores adicionados e {len(removed)} removidos.")
+
+            status = f"{len(people_list)} pessoas e {len(orgs_list)} organizações nesta área do mapa."
+            if truncated: status += " Aproxime o mapa para ver todos."
+            self.status_label.configure(text=status)
+            if self._status_hide_job: self.after_cancel(self._status_hide_job)
+            self._status_hide_job = self.after(3000, lambda: self.status_label.pack_forget())
         except Exception as e:
             # Capture any remaining exceptions during marker drawing
             logging.error(f"Erro ao desenhar marcadores: {e}", exc_info=True)
 
     def cleanup(self):
             """Libera recursos do mapa antes de fechar a janela."""
+            self._fetch_generation += 1
+            self._fetch_executor.shutdown(wait=False, cancel_futures=True)
+            if self._watch_job:
+                self.after_cancel(self._watch_job)
+                self._watch_job = None
             if hasattr(self, 'map_widget') and self.map_widget and self.map_widget.winfo_exists():
                 self.map_widget.destroy()            
\ No newline at end of file
@@ -0,0 +1,65 @@
+import customtkinter as ctk
+from tkinter import messagebox
+from functions import ui_helpers
+
+class MergePreviewWindow(ctk.CTkToplevel):
+    """Pré-visualização dos planos de fusão de duplicatas, antes de aplicá-los."""
+    MAX_LISTED_GROUPS = 500
+    MOTIVOS = {"cpf": "CPF", "titulo": "título", "nome": "nome + nascimento", "semelhanca": "nome semelhante"}
+
+    def __init__(self, parent, plans: list, on_confirm):
+        super().__init__(parent)
+        self.plans = plans
+        self.on_confirm = on_confirm
+
+        self.title("Pré-visualização da Correção de Duplicatas")
+        self.geometry("760x520")
+
+        self.transient(parent)
+        self.grab_set()
+        self.bind("<Escape>", lambda e: self.destroy())
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self._create_widgets()
+        self.after(50, lambda: ui_helpers.center_window(self))
+
+    def _create_widgets(self):
+        registros = sum(len(plan.ids_duplicados) for plan in self.plans)
+        resumo = (f"{len(self.plans)} grupos de duplicatas encontrados: {registros} registros serão fundidos aos seus registros mestres.\n"
+                  "ATENÇÃO: esta ação não pode ser desfeita. É recomendado criar um backup antes.")
+        ctk.CTkLabel(self, text=resumo, justify="left", wraplength=700).grid(row=0, column=0, sticky="w", padx=20, pady=(20, 10))
+
+        textbox = ctk.CTkTextbox(self, wrap="none")
+        textbox.grid(row=1, column=0, sticky="nsew", padx=20)
+        textbox.insert("end", self._format_plans())
+        textbox.configure(state="disabled")
+
+        button_frame = ctk.CTkFrame(self, fg_color="transparent")
+        button_frame.grid(row=2, column=0, sticky="se", padx=20, pady=10)
+        ctk.CTkButton(button_frame, text="Fundir Duplicatas", fg_color="#D32F2F", hover_color="#B71C1C", command=self._confirm).pack(side="right", padx=(10,0))
+        ctk.CTkButton(button_frame, text="Cancelar", fg_color="gray50", hover_color="gray40", command=self.destroy).pack(side="right")
+
+    def _format_plans(self) -> str:
+        lines = []
+        for plan in self.plans[:self.MAX_LISTED_GROUPS]:
+            duplicados = ", ".join(f"#{i} {plan.nomes.get(i, '')}" for i in plan.ids_duplicados)
+            motivos = ", ".join(dict.fromkeys(self._motivo(chave) for chave in plan.chaves))
+            lines.append(f"#{plan.id_mestre} {plan.nomes.get(plan.id_mestre, '')}  <-  {duplicados}   [{motivos}]")
+        if len(self.plans) > self.MAX_LISTED_GROUPS:
+            lines.append(f"... e mais {len(self.plans) - self.MAX_LISTED_GROUPS} grupos.")
+        return "\n".join(lines)
+
+    def _motivo(self, chave: str) -> str:
+        tipo = chave.split("_", 1)[0]
+        if tipo == "semelhanca":
+            # 'semelhanca_<id_a>_<id_b>_<nota>'
+            return f"{self.MOTIVOS[tipo]} ({chave.rsplit('_', 1)[-1]})"
+        return self.MOTIVOS.get(tipo, tipo)
+
+    def _confirm(self):
+        if not messagebox.askyesno("Confirmar Correção", f"Fundir {len(self.plans)} grupos de duplicatas agora?", icon="warning", parent=self):
+            return
+        self.destroy()
+        self.on_confirm(self.plans)
\ No newline at end of file
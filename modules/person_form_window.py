@@ -446,22 +446,22 @@ class PersonFormWindow(ctk.CTkToplevel):
         row_counter = 0
 
         ctk.CTkLabel(tab, text="Tratamento:").grid(row=row_counter, column=0, sticky="w", padx=10, pady=10)
-        misc_repo = self.repos.get("misc") 
-        tratamentos = [""] + ([t['nome'] for t in misc_repo.get_lookup_table_data("tratamentos")] if misc_repo else [])
+        reference_cache = self.repos.get("reference")
+        tratamentos = [""] + (reference_cache.lookup_names("tratamentos") if reference_cache else [])
         # --- ALTERAÇÃO: Usando a classe correta 'CTkAutocompleteComboBox' ---
         self.form_widgets['id_tratamento'] = CTkAutocompleteComboBox(tab, values=tratamentos)
         self.form_widgets['id_tratamento'].grid(row=row_counter, column=1, sticky="ew", padx=10, pady=10)
         row_counter += 1
 
         ctk.CTkLabel(tab, text="Profissão:").grid(row=row_counter, column=0, sticky="w", padx=10, pady=10)
-        profissoes = [""] + ([p['nome'] for p in misc_repo.get_lookup_table_data("profissoes")] if misc_repo else [])
+        profissoes = [""] + (reference_cache.lookup_names("profissoes") if reference_cache else [])
         # --- ALTERAÇÃO: Usando a classe correta 'CTkAutocompleteComboBox' ---
         self.form_widgets['id_profissao'] = CTkAutocompleteComboBox(tab, values=profissoes)
         self.form_widgets['id_profissao'].grid(row=row_counter, column=1, sticky="ew", padx=10, pady=10)
         row_counter += 1
 
         ctk.CTkLabel(tab, text="Escolaridade:").grid(row=row_counter, column=0, sticky="w", padx=10, pady=10)
-        escolaridades = [""] + ([e['nome'] for e in misc_repo.get_lookup_table_data("escolaridades")] if misc_repo else [])
+        escolaridades = [""] + (reference_cache.lookup_names("escolaridades") if reference_cache else [])
         # --- ALTERAÇÃO: Usando a classe correta 'CTkAutocompleteComboBox' ---
         self.form_widgets['id_escolaridade'] = CTkAutocompleteComboBox(tab, values=escolaridades)
         self.form_widgets['id_escolaridade'].grid(row=row_counter, column=1, sticky="ew", padx=10, pady=10)
@@ -545,12 +545,12 @@ class PersonFormWindow(ctk.CTkToplevel):
 
         self._load_photo(self.pessoa)
         
-        misc_repo = self.repos.get("misc")
-        if not misc_repo: return
+        reference_cache = self.repos.get("reference")
+        if not reference_cache: return
 
-        tratamento_map = {item['id']: item['nome'] for item in misc_repo.get_lookup_table_data("tratamentos")}
-        profissao_map = {item['id']: item['nome'] for item in misc_repo.get_lookup_table_data("profissoes")}
-        escolaridade_map = {item['id']: item['nome'] for item in misc_repo.get_lookup_table_data("escolaridades")}
+        tratamento_map = reference_cache.id_to_name("tratamentos")
+        profissao_map = reference_cache.id_to_name("profissoes")
+        escolaridade_map = reference_cache.id_to_name("escolaridades")
 
         for field_name, widget in self.form_widgets.items():
             # --- CORREÇÃO AQUI: Remove 'latitude' e 'longitude' da lista de exclusão do loop principal ---
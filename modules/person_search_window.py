@@ -59,8 +59,7 @@ class PersonSearchWindow(ctk.CTkToplevel):
             page=1, 
             items_per_page=100, # Mostra até 100 resultados
             search_term=search_term,
-            sort_by='Nome',     # Ordena por nome
-            sort_desc=False     # Em ordem crescente
+            sort_by='Relevância' # Ordena pela relevância da busca textual (bm25)
         )
         
         # Filtra para remover o ID excluído, se houver
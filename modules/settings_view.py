@@ -2,13 +2,19 @@ import customtkinter as ctk
 from tkinter import messagebox, filedialog
 import os
 import sys
+from functools import partial
 
 import config
 from .user_management_view import UserManagementView
 from popups.backup_options_window import BackupOptionsWindow
 from .progress_window import ProgressWindow
+from .merge_preview_window import MergePreviewWindow
 from popups.app_params_window import AppParamsWindow
 from functions.backup_helpers import execute_backup_thread, execute_restore_thread
+from functions import zip_source
+from data_access.batch_import import TYPE_LABELS, list_import_files
+
+TSE_FILE_TYPES = [("Arquivos do TSE (CSV ou ZIP)", "*.csv *.zip"), ("Arquivos CSV", "*.csv"), ("Arquivos ZIP do TSE", "*.zip")]
 
 class SettingsView(ctk.CTkFrame):
     def __init__(self, parent, repos: dict, app, initial_filters=None):
@@ -44,6 +50,16 @@ class SettingsView(ctk.CTkFrame):
             
             progress_win = ProgressWindow(self, "Geocodificando Base de Organizações...")
             progress_win.start_operation(geo_service.geocode_all_organizations)
+
+    def importar_centroides_municipios(self):
+        geo_service = self.repos.get("geo")
+        if not geo_service:
+            messagebox.showerror("Erro", "Serviço de geolocalização não encontrado.")
+            return
+        filepath = filedialog.askopenfilename(title="Selecione o arquivo de municípios do IBGE (com latitude e longitude)", filetypes=[("Arquivos CSV", "*.csv")])
+        if not filepath: return
+        progress_win = ProgressWindow(self, "Importando Centros dos Municípios...")
+        progress_win.start_operation(geo_service.importar_centroides_csv, filepath)
             
     def _create_widgets(self):
         header_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -73,6 +89,8 @@ class SettingsView(ctk.CTkFrame):
         btn_geocode.pack(pady=5, padx=20, anchor="w")
         btn_geocode_orgs = ctk.CTkButton(scrollable_frame, text="Geocodificar Base de Organizações...", command=self.geocode_all_organizations)
         btn_geocode_orgs.pack(pady=5, padx=20, anchor="w")
+        btn_centroides = ctk.CTkButton(scrollable_frame, text="Importar Centros dos Municípios (IBGE)...", command=self.importar_centroides_municipios)
+        btn_centroides.pack(pady=5, padx=20, anchor="w")
         
         btn_create_backup = ctk.CTkButton(scrollable_frame, text="Criar Backup Completo...", command=self.create_backup)
         btn_create_backup.pack(pady=5, padx=20, anchor="w")
@@ -90,6 +108,8 @@ class SettingsView(ctk.CTkFrame):
         btn_import_cadastrais.pack(pady=5, padx=20, anchor="w")
         btn_import_votacao = ctk.CTkButton(scrollable_frame, text="Importar Votação por Seção (CSV)...", command=self.import_election_csv)      
         btn_import_votacao.pack(pady=5, padx=20, anchor="w")
+        btn_import_lote = ctk.CTkButton(scrollable_frame, text="Importar Vários Arquivos do TSE (Pasta ou Seleção)...", command=self.importar_lote_tse)
+        btn_import_lote.pack(pady=5, padx=20, anchor="w")
 
     def _open_app_params_window(self):
         AppParamsWindow(self, self.repos, self.app)
@@ -122,16 +142,30 @@ class SettingsView(ctk.CTkFrame):
         progress_win.start_operation(import_service.sincronizar_cidades_contatos)
 
     def corrigir_duplicatas(self):
-        if not messagebox.askyesno("Confirmar Correção", "ATENÇÃO!\n\nEsta ação irá buscar e fundir contatos duplicados. É recomendado criar um backup antes.\n\nDeseja iniciar a correção?", icon="warning"):
-            return
-            
         import_service = self.repos.get("import")
         if not import_service:
             messagebox.showerror("Erro", "Serviço de importação não encontrado.")
             return
 
-        progress_win = ProgressWindow(self, "Corrigindo Duplicatas no Banco...")
-        progress_win.start_operation(import_service.corrigir_duplicatas_de_pessoas)
+        fuzzy = messagebox.askyesnocancel(
+            "Buscar Duplicatas",
+            "Incluir também nomes semelhantes (ex: 'JOSÉ CARLOS DA SILVA' e 'JOSE CARLOS SILVA') com a mesma data de nascimento?\n\n"
+            "Sim: busca por CPF, título, nome + nascimento e nomes semelhantes.\nNão: apenas CPF, título e nome + nascimento idênticos.")
+        if fuzzy is None: return
+
+        # Primeiro só calcula os grupos; a fusão é aplicada depois da pré-visualização
+        analysis_win = ProgressWindow(self, "Buscando Contatos Duplicados...")
+        analysis_win.start_operation(import_service.planejar_fusao_de_duplicatas, fuzzy, lambda plans: self._preview_merge_plans(plans, analysis_win))
+
+    def _preview_merge_plans(self, plans, analysis_win):
+        if analysis_win.winfo_exists(): analysis_win.destroy()
+        import_service = self.repos.get("import")
+
+        def apply(confirmed_plans):
+            progress_win = ProgressWindow(self, "Corrigindo Duplicatas no Banco...")
+            progress_win.start_operation(import_service.aplicar_fusao_de_duplicatas, confirmed_plans)
+
+        MergePreviewWindow(self, plans, on_confirm=apply)
 
     def restore_backup(self):
         backup_path = filedialog.askopenfilename(title="Selecione o arquivo de Backup (.zip)", filetypes=[("Arquivos de Backup", "*.zip")], initialdir=os.path.join(config.BASE_PATH, "backups"))
@@ -147,6 +181,20 @@ class SettingsView(ctk.CTkFrame):
         python = sys.executable
         os.execl(python, python, *sys.argv)
 
+    def _ask_zip_ufs(self) -> str | None:
+        """Pergunta de quais UFs ler os CSVs dos ZIPs do TSE. Retorna "" para o arquivo nacional e None se cancelado."""
+        dialog = ctk.CTkInputDialog(
+            title="Arquivo ZIP do TSE",
+            text="Importar os CSVs de quais UFs do ZIP? (ex.: SP ou SP, MG)\n\nDeixe em branco para usar o arquivo nacional (BRASIL).")
+        ufs = dialog.get_input()
+        return ufs.strip() if ufs is not None else None
+
+    def _to_import_source(self, filepath: str) -> str | None:
+        """Para um ZIP do TSE, pergunta as UFs e retorna a origem correspondente (functions.zip_source)."""
+        if not zip_source.is_zip_source(filepath): return filepath
+        ufs = self._ask_zip_ufs()
+        return zip_source.make_source(filepath, ufs) if ufs is not None else None
+
     def _execute_generic_import(self, method_name, title, file_dialog_title, file_dialog_types):
         import_service = self.repos.get("import")
         if not import_service:
@@ -160,6 +208,30 @@ class SettingsView(ctk.CTkFrame):
 
         filepath = filedialog.askopenfilename(title=file_dialog_title, filetypes=file_dialog_types)
         if not filepath: return
+        filepath = self._to_import_source(filepath)
+        if not filepath: return
+
+        # Importações grandes gravam o progresso em blocos; se este arquivo já teve uma importação interrompida, oferece retomá-la
+        pending_job = import_service.get_resumable_job(method_name, filepath) if hasattr(import_service, "get_resumable_job") else None
+        if pending_job:
+            resume = messagebox.askyesnocancel(
+                "Importação Interrompida",
+                f"Este arquivo já começou a ser importado ({pending_job['progresso']:.0%} concluído, fase '{pending_job['fase']}').\n\n"
+                "Sim: continuar de onde parou.\nNão: descartar o progresso e recomeçar do início.",
+                parent=self)
+            if resume is None: return
+            if not resume: import_service.discard_import_job(pending_job['id_job'])
+        else:
+            # Reimportações só aplicam as linhas alteradas; para um arquivo que parece idêntico ao último importado, oferece reprocessar tudo
+            imported = import_service.get_imported_file(method_name, filepath) if hasattr(import_service, "get_imported_file") else None
+            if imported:
+                full = messagebox.askyesnocancel(
+                    "Arquivo Já Importado",
+                    f"Este arquivo parece idêntico ao importado em {imported['data_importacao']}.\n\n"
+                    "Sim: reprocessar todas as linhas.\nNão: importar apenas as alterações, se houver.",
+                    parent=self)
+                if full is None: return
+                if full: import_service.forget_imported_file(method_name, filepath)
         
         progress_win = ProgressWindow(self, title)
         progress_win.start_operation(method_to_call, filepath)
@@ -168,10 +240,10 @@ class SettingsView(ctk.CTkFrame):
         self._execute_generic_import("importar_orgaos_publicos_csv", "Importando Órgãos Públicos...", "Selecione o CSV de Órgãos Públicos", [("Arquivos CSV", "*.csv")])
 
     def importar_dados_cadastrais_csv(self):
-        self._execute_generic_import("importar_dados_cadastrais", "Importando Dados Cadastrais...", "Selecione o CSV de Dados Cadastrais", [("Arquivos CSV", "*.csv")])
+        self._execute_generic_import("importar_dados_cadastrais", "Importando Dados Cadastrais...", "Selecione o CSV (ou o ZIP do TSE) de Dados Cadastrais", TSE_FILE_TYPES)
 
     def import_election_csv(self):
-        self._execute_generic_import("importar_csv_eleicao", "Importando Votação...", "Selecione o CSV de Votação por Seção", [("Arquivos CSV", "*.csv")])
+        self._execute_generic_import("importar_csv_eleicao", "Importando Votação...", "Selecione o CSV (ou o ZIP do TSE) de Votação por Seção", TSE_FILE_TYPES)
 
     def importar_prefeituras_eleitorado_csv(self):
         import_service = self.repos.get("import")
@@ -183,9 +255,50 @@ class SettingsView(ctk.CTkFrame):
         prefeituras_path = filedialog.askopenfilename(title="Selecione o arquivo de Prefeituras", filetypes=[("Arquivos CSV", "*.csv")])
         if not prefeituras_path: return
 
-        messagebox.showinfo("Seleção de Arquivos", "Agora, selecione o arquivo de ELEITORADO (eleitorado_ANO.csv).", parent=self)
-        eleitorado_path = filedialog.askopenfilename(title="Selecione o arquivo do Eleitorado", filetypes=[("Arquivos CSV", "*.csv")])
+        messagebox.showinfo("Seleção de Arquivos", "Agora, selecione o arquivo de ELEITORADO: o perfil_eleitorado do TSE (um ou vários anos) ou o eleitorado_ANO.csv.", parent=self)
+        eleitorado_path = filedialog.askopenfilename(title="Selecione o arquivo do Eleitorado", filetypes=TSE_FILE_TYPES)
+        if not eleitorado_path: return
+        eleitorado_path = self._to_import_source(eleitorado_path)
         if not eleitorado_path: return
 
         progress_win = ProgressWindow(self, "Importando Prefeituras e Eleitorado...")
-        progress_win.start_operation(import_service.importar_prefeituras_eleitorado_csv, prefeituras_path, eleitorado_path)
\ No newline at end of file
+        progress_win.start_operation(import_service.importar_prefeituras_eleitorado_csv, prefeituras_path, eleitorado_path)
+
+    def importar_lote_tse(self):
+        import_service = self.repos.get("import")
+        if not import_service:
+            messagebox.showerror("Erro", "Serviço de importação não encontrado.")
+            return
+
+        usar_pasta = messagebox.askyesnocancel(
+            "Importação em Lote",
+            "Importar todos os arquivos CSV e ZIP de uma pasta (inclusive das subpastas)?\n\n"
+            "Sim: escolher a pasta.\nNão: escolher os arquivos.", parent=self)
+        if usar_pasta is None: return
+        if usar_pasta:
+            folder = filedialog.askdirectory(title="Selecione a pasta com os arquivos do TSE")
+            paths = [folder] if folder else []
+        else:
+            paths = list(filedialog.askopenfilenames(title="Selecione os arquivos do TSE", filetypes=TSE_FILE_TYPES))
+        if not paths: return
+
+        # Dos ZIPs do TSE são lidos os CSVs das mesmas UFs
+        ufs = None
+        if any(zip_source.is_zip_source(f) for f in list_import_files(paths)):
+            ufs = self._ask_zip_ufs()
+            if ufs is None: return
+
+        # O tipo de cada arquivo vem do cabeçalho; mostra o que foi reconhecido antes de começar
+        grupos = import_service.classificar_arquivos(paths, ufs)
+        ignorados = grupos.pop(None, [])
+        if not grupos:
+            messagebox.showwarning("Importação em Lote", "Nenhum arquivo do TSE (candidatos, votação, eleitorado ou prefeituras) foi reconhecido.", parent=self)
+            return
+        resumo = "\n".join(f"- {len(files)} arquivo(s) de {TYPE_LABELS[tipo]}" for tipo, files in grupos.items())
+        if ignorados:
+            resumo += f"\n\n{len(ignorados)} arquivo(s) não reconhecido(s) serão ignorados."
+        if not messagebox.askyesno("Importação em Lote", f"Arquivos encontrados:\n{resumo}\n\nDeseja iniciar a importação?", parent=self):
+            return
+
+        progress_win = ProgressWindow(self, "Importando Arquivos do TSE...")
+        progress_win.start_operation(partial(import_service.importar_lote, ufs=ufs), paths)
\ No newline at end of file
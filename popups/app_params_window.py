@@ -68,11 +68,11 @@ class AppParamsWindow(ctk.CTkToplevel):
         ctk.CTkButton(button_frame, text="Cancelar", fg_color="gray50", hover_color="gray40", command=self.destroy).pack(side="right")
 
     def _load_current_settings(self):
-        misc_repo = self.repos.get("misc")
+        reference_cache = self.repos.get("reference")
         person_repo = self.repos.get("person")
-        if not misc_repo or not person_repo: return
+        if not reference_cache or not person_repo: return
 
-        owner_id = misc_repo.get_app_setting('proprietario_id_pessoa')
+        owner_id = reference_cache.get_app_setting('proprietario_id_pessoa')
         if owner_id:
             self.selected_owner_id = int(owner_id)
             owner_details = person_repo.get_person_details(self.selected_owner_id)
@@ -82,7 +82,7 @@ class AppParamsWindow(ctk.CTkToplevel):
                 self.owner_entry.insert(0, owner_details.nome)
                 self.owner_entry.configure(state="readonly")
         
-        map_theme = misc_repo.get_app_setting('map_theme')
+        map_theme = reference_cache.get_app_setting('map_theme')
         if map_theme in self.map_theme_menu.cget("values"):
             self.map_theme_var.set(map_theme)
         
@@ -110,13 +110,14 @@ class AppParamsWindow(ctk.CTkToplevel):
 
     def _save_settings(self):
         try:
-            misc_repo = self.repos.get("misc")
-            if not misc_repo: return
+            # Gravado pelo cache de referência, que mantém o valor salvo para as próximas leituras
+            reference_cache = self.repos.get("reference")
+            if not reference_cache: return
 
             if self.selected_owner_id:
-                misc_repo.save_app_setting('proprietario_id_pessoa', str(self.selected_owner_id))
+                reference_cache.save_app_setting('proprietario_id_pessoa', str(self.selected_owner_id))
 
-            misc_repo.save_app_setting('map_theme', self.map_theme_var.get())
+            reference_cache.save_app_setting('map_theme', self.map_theme_var.get())
 
             if self.new_logo_path:
                 dest_path = config.CUSTOM_LOGO_PATH